@@ -0,0 +1,311 @@
+# coding=utf-8
+"""Helpers for capturing audio; an "always listening" pipeline which queues up what the user says."""
+
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+import speech_recognition
+
+import trace_lib
+
+LOGGER = logging.getLogger('parsel_tongue')
+
+
+class Utterance(str):
+    """The text of something which was said, along with how confident the recognizer was in it."""
+
+    def __new__(cls, text: str, confidence=None, alternatives=None):
+        """
+        Arguments:
+            text (str): The recognized text.
+            confidence (float): The recognizer's confidence (0-1); None if it doesn't report one.
+            alternatives (list): The recognizer's lower ranked hypotheses (N-best) of what was said, best first.
+        """
+        utterance = super(Utterance, cls).__new__(cls, text)
+        utterance.confidence = confidence
+        utterance.alternatives = list(alternatives or [])
+        return utterance
+
+
+class MicrophoneSource(object):
+    """Live microphone input, which is kept open for the life of the listener."""
+
+    def __init__(self, timeout=3, phrase_time_limit=None, device_index=None):
+        """
+        Arguments:
+            timeout (int): Seconds to wait for a phrase to start before re-checking calibration, etc.
+            phrase_time_limit (int): Optional maximum length of a single phrase in seconds.
+            device_index (int): Optional microphone device; the system default is used otherwise.
+        """
+        self.timeout = timeout
+        self.phrase_time_limit = phrase_time_limit
+        self.device_index = device_index
+        self.exhausted = False
+        self.mic = None
+        self.recognizer = None
+
+    def open(self, recognizer: speech_recognition.Recognizer):
+        """Open the microphone."""
+        self.recognizer = recognizer
+        self.mic = speech_recognition.Microphone(device_index=self.device_index)
+        self.mic.__enter__()
+
+    def calibrate(self, duration=1):
+        """Adjust the energy threshold for the current ambient noise."""
+        self.recognizer.adjust_for_ambient_noise(self.mic, duration=duration)
+
+    def capture(self):
+        """Capture the next phrase; None if nothing was said before the timeout."""
+        try:
+            return self.recognizer.listen(self.mic, timeout=self.timeout, phrase_time_limit=self.phrase_time_limit)
+        except speech_recognition.WaitTimeoutError:
+            return None
+
+    def close(self):
+        """Close the microphone."""
+        if self.mic:
+            self.mic.__exit__(None, None, None)
+            self.mic = None
+
+
+class WavFileSource(object):
+    """A stand-in for the microphone which plays back recorded WAV files; each file is a single utterance."""
+
+    def __init__(self, paths):
+        """
+        Arguments:
+            paths (list|str): The WAV files to play back in order, or a directory of them.
+        """
+        if isinstance(paths, str):
+            paths = sorted(os.path.join(paths, name) for name in os.listdir(paths) if name.endswith('.wav'))
+        self.paths = list(paths)
+        self.exhausted = False
+        self.recognizer = None
+
+    def open(self, recognizer: speech_recognition.Recognizer):
+        """Prepare for play back."""
+        self.recognizer = recognizer
+
+    def calibrate(self, duration=1):
+        """Recordings don't need calibration."""
+        pass
+
+    def capture(self):
+        """Read the next recording; None once all of them have been played."""
+        if not self.paths:
+            self.exhausted = True
+            return None
+        with speech_recognition.AudioFile(self.paths.pop(0)) as source:
+            return self.recognizer.record(source)
+
+    def close(self):
+        """Nothing to close."""
+        pass
+
+
+class Listener(object):
+    """Keeps an audio source open and transcribes everything which is said into a queue of utterances.
+
+    Audio is captured on one thread and transcribed on another, so listening continues while the previous phrase is
+    being recognized.  Ambient noise is calibrated once on start, and again whenever the source has been quiet for
+    calibrate_interval seconds.  An unrecognizable phrase is queued as an empty string, and None is queued once the
+    source is exhausted.
+    """
+
+    def __init__(self, source, recognize=None, wake_word=None, calibrate_interval=60, front_end=None):
+        """
+        Arguments:
+            source (MicrophoneSource|WavFileSource): Where to capture audio from.
+            recognize (callable): Converts speech_recognition.AudioData into text (or an Utterance, with its
+                confidence); Google's recognizer by default.
+            wake_word (str): Optional keyword which must be said before anything is queued, e.g. 'python'.
+                The rest of the phrase is queued; if nothing else was said, the next phrase is queued.
+            calibrate_interval (int): Seconds between ambient noise re-calibrations.
+            front_end (vad_lib.VoiceFrontEnd): Optionally trims the silence from each phrase before it is recognized;
+                phrases without any speech (false starts) are dropped.
+        """
+        self.source = source
+        self.recognizer = speech_recognition.Recognizer()
+        self.recognize = recognize or self.recognizer.recognize_google
+        self.wake_word = (wake_word or '').lower().strip()
+        self.calibrate_interval = calibrate_interval
+        self.front_end = front_end
+        self.utterances = queue.Queue()
+        self.transcribing = False
+        self._audio = queue.Queue()
+        self._awake = False
+        self._last_calibration = 0
+        self._running = threading.Event()
+        self._threads = []
+
+    def calibrate(self):
+        """Calibrate for the ambient noise."""
+        LOGGER.debug('Calibrating for ambient noise.')
+        self.source.calibrate()
+        self._last_calibration = time.time()
+
+    def clear(self):
+        """Discard any utterances which haven't been consumed yet."""
+        while True:
+            try:
+                self.utterances.get_nowait()
+            except queue.Empty:
+                break
+
+    def get(self, timeout=None):
+        """Get the next utterance.
+
+        Arguments:
+            timeout (int): Seconds to wait for the user to say something.  A phrase which is still being transcribed
+                when the timeout is reached is waited for.
+
+        Raises:
+            queue.Empty: Nothing was said within the timeout.
+        """
+        while True:
+            try:
+                return self.utterances.get(timeout=timeout)
+            except queue.Empty:
+                if not (self.transcribing or self._audio.qsize()):
+                    raise
+
+    def start(self):
+        """Open the source and start listening in the background."""
+        if self._running.is_set():
+            return
+        self.source.open(self.recognizer)
+        self.calibrate()
+        self._running.set()
+        for target in (self._capture, self._transcribe):
+            thread = threading.Thread(target=target, name='listener{}'.format(target.__name__), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop listening and close the source."""
+        self._running.clear()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.source.close()
+
+    def _capture(self):
+        """Capture phrases from the source until stopped or it is exhausted; the end is always queued, even if the
+        source fails, so nothing waits for an utterance forever.
+        """
+        try:
+            while self._running.is_set():
+                audio = self.source.capture()
+                if audio is not None and self.front_end:
+                    with trace_lib.span('trim'):
+                        audio = self.front_end.process(audio)
+                    if audio is None:
+                        continue
+                if audio is not None:
+                    self._audio.put(audio)
+                elif self.source.exhausted:
+                    break
+                elif time.time() - self._last_calibration > self.calibrate_interval:
+                    # Only re-calibrate while it is quiet, so no speech is lost.
+                    self.calibrate()
+        except Exception as error:
+            LOGGER.error('Capturing audio failed: {}.'.format(error))
+        finally:
+            self._audio.put(None)
+
+    def _transcribe(self):
+        """Transcribe captured phrases into utterances."""
+        while True:
+            audio = self._audio.get()
+            if audio is None:
+                self.utterances.put(None)
+                break
+            self.transcribing = True
+            try:
+                self._transcribe_phrase(audio)
+            finally:
+                self.transcribing = False
+
+    def _transcribe_phrase(self, audio):
+        """Transcribe a captured phrase, and queue it as an utterance if it was meant for the editor."""
+        try:
+            with trace_lib.span('recognize'):
+                text = self.recognize(audio)
+        except speech_recognition.UnknownValueError:
+            text = ''
+        except Exception as error:  # e.g. speech_recognition.RequestError; the phrase is lost, not the listener.
+            LOGGER.error('Speech recognition failed: {}.'.format(error))
+            text = ''
+        confidence = getattr(text, 'confidence', None)
+        alternatives = getattr(text, 'alternatives', [])
+        text = self._wake(text)
+        if text is not None:
+            if confidence is not None or alternatives:
+                alternatives = [Utterance(self._strip_wake(alternative), getattr(alternative, 'confidence', None))
+                                for alternative in alternatives]
+                text = Utterance(text, confidence, [alternative for alternative in alternatives if alternative])
+            self.utterances.put(text)
+
+    def _strip_wake(self, text: str) -> str:
+        """Strip the wake word, and anything said before it, off of the text."""
+        words = text.lower().split()
+        if self.wake_word in words:
+            return ' '.join(words[words.index(self.wake_word) + 1:])
+        return text
+
+    def _wake(self, text: str):
+        """Apply the wake word; returns None if the text should be ignored."""
+        if not self.wake_word:
+            return text
+        words = text.lower().split()
+        if self.wake_word in words:
+            remainder = ' '.join(words[words.index(self.wake_word) + 1:])
+            if remainder:
+                return remainder
+            LOGGER.debug('Heard the wake word "{}".'.format(self.wake_word))
+            self._awake = True
+            return None
+        if self._awake:
+            self._awake = False
+            return text
+        LOGGER.debug('Ignoring "{}" until the wake word is said.'.format(text))
+        return None
+
+
+class TranscriptSource(object):
+    """A stand-in for the listener which reads utterances from a transcript, one per line; for scripted sessions.
+
+    Blank lines and lines starting with '#' are skipped.  None is returned once the transcript is exhausted.  A line can
+    list the recognizer's alternative hypotheses after the best one, separated by ' | ', e.g. 'crate | create'.
+    """
+
+    def __init__(self, transcript):
+        """
+        Arguments:
+            transcript (str|file): The transcript file, '-' for stdin, or an open file.
+        """
+        if transcript == '-':
+            transcript = sys.stdin
+        elif isinstance(transcript, str):
+            transcript = open(transcript)
+        self.transcript = transcript
+
+    def clear(self):
+        """Nothing is heard while prompts are spoken, so there is nothing to discard."""
+        pass
+
+    def get(self, timeout=None):
+        """Get the next utterance."""
+        for line in self.transcript:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                LOGGER.debug('Scripted input: "{}".'.format(line))
+                hypotheses = [hypothesis.strip() for hypothesis in line.split(' | ')]
+                if len(hypotheses) > 1:
+                    return Utterance(hypotheses[0], alternatives=[Utterance(text) for text in hypotheses[1:]])
+                return line
+        return None
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Microbenchmarks for the NLP, menu matching and template rendering hot paths.
+
+Audio and speech are replaced by a transcript and the silent speech backend, so only the code between hearing the user
+and responding to them is measured.
+
+Usage:
+    python benchmarks.py --save     # Run and save the results as the baseline.
+    python benchmarks.py            # Run and fail if anything regressed from the baseline.
+"""
+
+import argparse
+import atexit
+import io
+import itertools
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import nltk
+
+import audio_lib
+import cache_lib
+import codegen_lib
+import lib
+import match_lib
+
+BASELINE_FILE = os.path.join(lib.REL_DIR, 'benchmark_baseline.json')
+# Benchmarks keyed by name; each is (setup, repeat, number).  The setup returns the callable to time.
+BENCHMARKS = {}
+# Real keywords from the menus, and a larger vocabulary for building menus of many options.
+KEYWORDS = sorted(cache_lib.find_keywords())
+VOCABULARY = KEYWORDS + ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet',
+                         'kilo', 'lima', 'mike', 'november', 'oscar', 'papa', 'quebec', 'romeo', 'sierra', 'tango']
+MENU_SIZES = [5, 50, 500]
+TEMP_DIR = tempfile.mkdtemp(prefix='parsel_tongue_bench_')
+atexit.register(shutil.rmtree, TEMP_DIR, ignore_errors=True)
+UTTERANCES = ['create a new function', 'please delete the variable', 'I would like to change the settings',
+              'save my work', 'add a new line', 'edit the class', 'yes that is correct', 'exit']
+
+
+def benchmark(repeat=20, number=1):
+    """Register a benchmark; the decorated function does any setup and returns the callable to time.
+
+    Arguments:
+        repeat (int): The number of timings to take the median of.
+        number (int): The number of calls per timing.
+    """
+    def decorator(setup):
+        BENCHMARKS[setup.__name__[len('bench_'):]] = (setup, repeat, number)
+        return setup
+    return decorator
+
+
+def _menu(size: int) -> dict:
+    """Create a menu with the given number of options."""
+    words = itertools.cycle(VOCABULARY)
+    return {'Option {}'.format(index): {'action': None, 'keyword': [next(words), next(words)]}
+            for index in range(size)}
+
+
+def _temporary_cache():
+    """Use an empty word cache, so WordNet is hit; the previous temporary cache is closed."""
+    if cache_lib.CACHE is not None and os.path.dirname(cache_lib.CACHE.path) == TEMP_DIR:
+        cache_lib.CACHE.close()
+    descriptor, path = tempfile.mkstemp(suffix='.sqlite', dir=TEMP_DIR)
+    os.close(descriptor)
+    cache_lib.CACHE = cache_lib.WordCache(path)
+
+
+@benchmark(repeat=1)
+def bench_wordnet_load():
+    """The first WordNet lookup in a process loads the corpus."""
+    return lambda: nltk.corpus.wordnet.synsets('create')
+
+
+@benchmark(repeat=5)
+def bench_get_synonymns_cold():
+    """Synonyms of every menu keyword, with an empty cache."""
+    def run():
+        _temporary_cache()
+        for keyword in KEYWORDS:
+            lib.get_synonymns(keyword)
+    return run
+
+
+@benchmark()
+def bench_get_synonymns_warm():
+    """Synonyms of every menu keyword, once they're cached."""
+    for keyword in KEYWORDS:
+        lib.get_synonymns(keyword)
+    return lambda: [lib.get_synonymns(keyword) for keyword in KEYWORDS]
+
+
+@benchmark(repeat=5)
+def bench_generate_keywords_cold():
+    """Keyword stems of every menu keyword, with an empty cache."""
+    def run():
+        _temporary_cache()
+        lib.generate_keywords(KEYWORDS)
+    return run
+
+
+@benchmark()
+def bench_generate_keywords_warm():
+    """Keyword stems of every menu keyword, once they're cached."""
+    lib.generate_keywords(KEYWORDS)
+    return lambda: lib.generate_keywords(KEYWORDS)
+
+
+@benchmark(number=100)
+def bench_parse_text():
+    """Parse a single utterance."""
+    return lambda: lib.parse_text(UTTERANCES[2])
+
+
+@benchmark(number=100)
+def bench_interpret_meaning():
+    """Interpret a single utterance."""
+    return lambda: lib.interpret_meaning(UTTERANCES[0])
+
+
+@benchmark()
+def bench_parse_texts_batch():
+    """Parse a batch of 1000 utterances."""
+    batch = UTTERANCES * 125
+    return lambda: list(lib.parse_texts(batch))
+
+
+def _bench_compile_menu(size):
+    """Compile the matcher for a menu; keyword stems are cached, so this is the cost of building the index."""
+    menu = _menu(size)
+    match_lib.get_matcher(menu)
+    return lambda: match_lib.ChoiceMatcher(menu)
+
+
+def _bench_match(size):
+    """Match every utterance against a compiled menu."""
+    matcher = match_lib.get_matcher(_menu(size))
+    return lambda: [matcher.match(utterance) for utterance in UTTERANCES]
+
+
+def _bench_get_choice(size):
+    """A whole get_choice turn: prompt, help, scripted input, match and confirmation."""
+    menu = _menu(size)
+    match_lib.get_matcher(menu)
+    response = menu['Option {}'.format(size - 1)]['keyword'][0]
+
+    def run():
+        lib.set_input_source(audio_lib.TranscriptSource(io.StringIO(response + '\n')))
+        lib.get_choice('Please choose one of the following:', menu)
+    return run
+
+
+for _size in MENU_SIZES:
+    BENCHMARKS['compile_menu_{}'.format(_size)] = (lambda size=_size: _bench_compile_menu(size), 20, 1)
+    BENCHMARKS['match_menu_{}'.format(_size)] = (lambda size=_size: _bench_match(size), 20, 10)
+    BENCHMARKS['get_choice_menu_{}'.format(_size)] = (lambda size=_size: _bench_get_choice(size), 20, 1)
+
+
+@benchmark(number=1000)
+def bench_render_function():
+    """Render a function spec."""
+    spec = codegen_lib.FunctionSpec('add', ['a', 'b=1'], 'Add numbers.', ['total = a + b', 'return total'])
+    return spec.render
+
+
+@benchmark(repeat=5)
+def bench_render_module():
+    """Render 10000 specs into a module."""
+    specs = [codegen_lib.VariableSpec('var_{}'.format(index), index, 'int') for index in range(10000)]
+    path = os.path.join(TEMP_DIR, 'module.py')
+    return lambda: codegen_lib.render_module(specs, path)
+
+
+def run_benchmarks(names=None) -> dict:
+    """Run the benchmarks; returns the median seconds per call of each one, keyed by name."""
+    results = {}
+    # WordNet is loaded by the first benchmark which needs it, so the load is only measured by wordnet_load.
+    for name in sorted(BENCHMARKS, key=lambda key: key != 'wordnet_load'):
+        if names and name not in names:
+            continue
+        setup, repeat, number = BENCHMARKS[name]
+        funct = setup()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                funct()
+            timings.append((time.perf_counter() - start) / number)
+        results[name] = statistics.median(timings)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Get the names of the benchmarks which are slower than the baseline by more than the tolerance."""
+    return sorted(name for name, seconds in results.items()
+                  if name in baseline and seconds > baseline[name] * (1 + tolerance))
+
+
+def main(argv=None):
+    """Run the benchmarks and compare them against the baseline."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('names', nargs='*', help='Only run these benchmarks, e.g. parse_text.')
+    parser.add_argument('--save', action='store_true', help='Save the results as the new baseline.')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='The baseline results file.')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='How much slower than the baseline is a regression, e.g. 0.5 is 50%% slower.')
+    args = parser.parse_args(argv)
+
+    # No audio, speech or confirmations; and don't touch the real word cache.
+    settings = lib.get_settings()
+    settings.set('voice', 'backend', 'null', persist=False)
+    settings.set('logic', 'validation', 'False', persist=False)
+    lib.CLEAR_SCREEN = False
+    cache = cache_lib.CACHE
+    _temporary_cache()
+    stdout, sys.stdout = sys.stdout, io.StringIO()
+    try:
+        results = run_benchmarks(args.names)
+    finally:
+        sys.stdout = stdout
+        cache_lib.CACHE.close()
+        cache_lib.CACHE = cache
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as rfile:
+            baseline = json.load(rfile)
+    regressions = compare(results, baseline, args.tolerance)
+    for name, seconds in sorted(results.items()):
+        previous = baseline.get(name)
+        change = '{:+.0%}'.format(seconds / previous - 1) if previous else ''
+        flag = '  REGRESSION' if name in regressions else ''
+        print('{:<32} {:>12.1f} us {:>8}{}'.format(name, seconds * 1e6, change, flag))
+    if args.save:
+        with open(args.baseline, 'w') as wfile:
+            json.dump(results, wfile, indent=2, sort_keys=True)
+        print('Saved the baseline to "{}".'.format(args.baseline))
+    elif regressions:
+        print('{} benchmark(s) regressed by more than {:.0%}.'.format(len(regressions), args.tolerance))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# coding=utf-8
+"""Persistent cache of synonyms and keyword stems, so known vocabulary doesn't require loading WordNet."""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import lib
+import match_lib
+
+CACHE = None
+CACHE_LOCK = threading.Lock()
+LOGGER = logging.getLogger('parsel_tongue')
+# The settings which re-open the cache when the [cache] section changes; see reset_cache.
+SUBSCRIBED = []
+
+
+class WordCache(object):
+    """An sqlite backed cache of word -> list of words, keyed by kind (i.e. 'synonyms' or 'stems') and language.
+
+    Entries are also held in memory once read, so each word only hits the disk once per process.  When the number of
+    stored entries exceeds max_entries, the least recently used entries are evicted.  Reads don't write; when entries
+    were last used is only written with the next put (or at close).
+    """
+
+    def __init__(self, path: str, max_entries=50000):
+        """
+        Arguments:
+            path (str): The sqlite database file to store the cache in.
+            max_entries (int): The maximum number of entries to keep on disk.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        # When entries were last read, by key; not yet written to the database.
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS words (kind TEXT, language TEXT, word TEXT, value TEXT, '
+                           'accessed REAL, PRIMARY KEY (kind, language, word))')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS words_accessed ON words (accessed)')
+        self._conn.commit()
+        self._count = self._conn.execute('SELECT COUNT(*) FROM words').fetchone()[0]
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute('DELETE FROM words')
+            self._conn.commit()
+            self._count = 0
+
+    def close(self):
+        """Write when entries were last used, then close the underlying database."""
+        with self._lock:
+            self._write_accessed()
+            self._conn.commit()
+            self._conn.close()
+
+    def reopen(self):
+        """Re-open the database, keeping the entries which are in memory; a forked process mustn't use its parent's
+        connection (or lock).
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def evict(self):
+        """Evict the least recently used entries until the cache is within max_entries."""
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        LOGGER.debug('Evicting {} entries from the word cache.'.format(excess))
+        self._conn.execute('DELETE FROM words WHERE rowid IN (SELECT rowid FROM words ORDER BY accessed LIMIT ?)',
+                           (excess,))
+        self._conn.commit()
+        self._memory.clear()
+        self._count = self.max_entries
+
+    def get(self, kind: str, language: str, word: str):
+        """Get the cached list of words; None if it isn't cached."""
+        key = (kind, language, word)
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM words WHERE kind = ? AND language = ? AND word = ?',
+                                     key).fetchone()
+            if not row:
+                return None
+            self._accessed[key] = time.time()
+        value = json.loads(row[0])
+        self._memory[key] = value
+        return value
+
+    def put(self, kind: str, language: str, word: str, value: list):
+        """Store a list of words."""
+        key = (kind, language, word)
+        with self._lock:
+            self._write_accessed()
+            exists = self._conn.execute('SELECT 1 FROM words WHERE kind = ? AND language = ? AND word = ?',
+                                        key).fetchone()
+            self._conn.execute('INSERT OR REPLACE INTO words VALUES (?, ?, ?, ?, ?)',
+                               key + (json.dumps(value), time.time()))
+            self._conn.commit()
+            self._memory[key] = value
+            if not exists:
+                self._count += 1
+                self.evict()
+
+    def _write_accessed(self):
+        """Write when entries were last read, in one batch; it's committed by the caller."""
+        if self._accessed:
+            self._conn.executemany('UPDATE words SET accessed = ? WHERE kind = ? AND language = ? AND word = ?',
+                                   [(accessed,) + key for key, accessed in self._accessed.items()])
+            self._accessed.clear()
+
+
+def get_cache() -> WordCache:
+    """Get the process-wide word cache, opening it on first use."""
+    global CACHE
+    if CACHE is None:
+        with CACHE_LOCK:
+            if CACHE is None:
+                settings = lib.get_settings()
+                path = os.path.join(lib.REL_DIR, settings.get('cache', 'path'))
+                with lib.profile_stage('word cache'):
+                    CACHE = WordCache(path, max_entries=settings.get_int('cache', 'max_entries', 50000))
+                if settings not in SUBSCRIBED:
+                    settings.subscribe(reset_cache, section='cache')
+                    SUBSCRIBED.append(settings)
+    return CACHE
+
+
+def _reopen_in_child():
+    """Re-open the word cache in a forked process (e.g. a session of service_lib), keeping its warm entries."""
+    global CACHE_LOCK
+    CACHE_LOCK = threading.Lock()
+    if CACHE is not None:
+        CACHE.reopen()
+
+
+def reset_cache(*change):
+    """Close the word cache, so it is re-opened with the current [cache] settings the next time it is needed."""
+    global CACHE
+    with CACHE_LOCK:
+        if CACHE is not None:
+            LOGGER.debug('The [cache] settings changed; the word cache will be re-opened.')
+            # Otherwise when entries were last used (since the last put) is lost, and the connection is leaked.
+            CACHE.close()
+        CACHE = None
+
+
+def find_keywords(paths=None) -> set:
+    """Find all keywords which are statically declared in menus of the given modules."""
+    keywords = {'yes', 'no'}
+    for menu in match_lib.get_declared_menus(paths).values():
+        for config in menu.values():
+            keywords.update(config['keyword'])
+    return keywords
+
+
+def prebuild(paths=None) -> int:
+    """Pre-build the cache with synonyms and stems for every statically declared keyword."""
+    keywords = sorted(find_keywords(paths))
+    LOGGER.info('Pre-building the word cache for {} keywords.'.format(len(keywords)))
+    lib.generate_keywords(keywords)
+    return len(keywords)
+
+
+os.register_at_fork(after_in_child=_reopen_in_child)
+
+if __name__ == '__main__':
+    print('Cached {} keywords in "{}".'.format(prebuild(), get_cache().path))
@@ -1,11 +1,13 @@
 # coding=utf-8
 """Helpers for working with classes."""
 
+import doc_lib
 import lib
+import symbol_lib
 
 # TODO: Auto-add built-ins like __str__, __repr__, etc.
 CLASS = '''
-class {name}({parent}:
+class {name}({parent}):
     """{desc}"""
     {class_attrs}
 
@@ -13,7 +15,7 @@ class {name}({parent}:
         """{attrs_desc}"""
         {attrs}
 
-    def __str__():
+    def __str__(self):
         """String respesentation of the class."""
         return self.__class__.__name__
 
@@ -37,13 +39,28 @@ def create_class():
     pass
 
 
-@lib.not_implemented
-def delete_class():
-    """Delete a class."""
-    pass
+def delete_class(document: doc_lib.Document, name: str) -> doc_lib.Node:
+    """Delete an existing class, once the user has confirmed it.
 
+    Returns:
+        node (doc_lib.Node): The deleted class; None if it wasn't deleted.
+    """
+    if not lib.get_yes_or_no('Are you sure you want to delete the class "{}"?'.format(name)):
+        return None
+    lib.status_update('Deleted "{}".'.format(name))
+    return document.remove(name)
 
-@lib.not_implemented
-def edit_class():
-    """Edit a class."""
-    pass
+
+def edit_class(document: doc_lib.Document, name: str) -> doc_lib.Node:
+    """Edit an existing class; it can only be renamed (in place) until classes can be created.
+
+    Returns:
+        node (doc_lib.Node): The edited class; None if it wasn't changed.
+    """
+    try:
+        node = symbol_lib.rename(document.get(name),
+                                 lib.simple_prompt('What do you want to rename "{}" to?'.format(name)))
+    except ValueError as error:
+        lib.status_update(str(error))
+        return None
+    return node if lib.replace_node(document, name, node) else None
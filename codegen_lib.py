@@ -0,0 +1,162 @@
+# coding=utf-8
+"""Code generation from structured specs of functions, classes and variables, without any voice interaction."""
+
+import argparse
+import json
+
+import class_lib
+import doc_lib
+import file_lib
+import funct_lib
+import var_lib
+
+INDENT = '    '
+
+
+class VariableSpec(object):
+    """A variable, i.e. 'name = value  # type: type'."""
+
+    __slots__ = ('name', 'value', 'type')
+    kind = doc_lib.VARIABLE
+
+    def __init__(self, name: str, value='None', type='None'):
+        self.name = name
+        self.value = value
+        self.type = type
+
+    def render(self) -> str:
+        """Render the variable's source."""
+        return var_lib.TEMPLATE.format(name=self.name, value=self.value, type=self.type)
+
+
+class FunctionSpec(object):
+    """A function; the logic lines are given without indentation."""
+
+    __slots__ = ('name', 'input_vars', 'description', 'logic_lines')
+    kind = doc_lib.FUNCTION
+
+    def __init__(self, name: str, input_vars=(), description='', logic_lines=()):
+        """
+        Arguments:
+            name (str): The name of the function.
+            input_vars (list): The parameters, e.g. ['count=1'].
+            description (str): The docstring.
+            logic_lines (list): The lines of the function body.
+        """
+        self.name = name
+        self.input_vars = list(input_vars)
+        self.description = description
+        self.logic_lines = list(logic_lines)
+
+    def render(self) -> str:
+        """Render the function's source."""
+        return funct_lib.TEMPLATE.format(
+            name=self.name, input_vars=', '.join(self.input_vars), description=self.description,
+            logic_lines=indent(self.logic_lines, 1))
+
+
+class MethodSpec(FunctionSpec):
+    """A method (or property) of a class; self is added to the input variables."""
+
+    __slots__ = ('is_property',)
+
+    def __init__(self, name: str, input_vars=(), description='', logic_lines=(), is_property=False):
+        super(MethodSpec, self).__init__(name, input_vars, description, logic_lines)
+        self.is_property = is_property
+
+    def render(self) -> str:
+        """Render the method's source."""
+        template = class_lib.PROPERTY if self.is_property else class_lib.METHOD
+        return template.format(
+            name=self.name, input_vars=', '.join(self.input_vars), desc=self.description,
+            logic_lines=indent(self.logic_lines, 2).lstrip())
+
+
+class ClassSpec(object):
+    """A class, with its attributes and methods."""
+
+    __slots__ = ('name', 'parent', 'description', 'class_attrs', 'inst_attrs', 'attrs_desc', 'methods')
+    kind = doc_lib.CLASS
+
+    def __init__(self, name: str, parent='object', description='', class_attrs=(), inst_attrs=(), attrs_desc='',
+                 methods=()):
+        """
+        Arguments:
+            name (str): The name of the class.
+            parent (str): The parent class.
+            description (str): The docstring.
+            class_attrs (list): Class attribute lines, e.g. ['count = 0'].
+            inst_attrs (list): The instance attributes which __init__ takes, e.g. ['name'].
+            attrs_desc (str): The docstring of __init__.
+            methods (list): MethodSpecs (or dicts of their fields).
+        """
+        self.name = name
+        self.parent = parent
+        self.description = description
+        self.class_attrs = list(class_attrs)
+        self.inst_attrs = list(inst_attrs)
+        self.attrs_desc = attrs_desc
+        self.methods = [method if isinstance(method, MethodSpec) else MethodSpec(**method) for method in methods]
+
+    def render(self) -> str:
+        """Render the class's source, followed by its methods."""
+        attrs = ['self.{0} = {0}'.format(attr.split('=')[0].strip()) for attr in self.inst_attrs] or ['pass']
+        source = class_lib.CLASS.format(
+            name=self.name, parent=self.parent, desc=self.description,
+            class_attrs=indent(self.class_attrs, 1).lstrip(), inst_attrs=', '.join(self.inst_attrs),
+            attrs_desc=self.attrs_desc, attrs=indent(attrs, 2).lstrip())
+        return source + ''.join(method.render() for method in self.methods)
+
+
+SPECS = {spec.kind: spec for spec in (ClassSpec, FunctionSpec, VariableSpec)}
+
+
+def indent(lines: list, tab_level: int) -> str:
+    """Indent lines of logic to the given level; an empty body is a 'pass'."""
+    return '\n'.join((INDENT * tab_level) + line for line in lines or ['pass'])
+
+
+def load_specs(path: str):
+    """Load specs from a JSONL file, one spec per line, e.g. {"kind": "function", "name": "get_help", ...}."""
+    with open(path) as rfile:
+        for line in rfile:
+            if line.strip():
+                fields = json.loads(line)
+                yield SPECS[fields.pop('kind')](**fields)
+
+
+def render_module(specs, path: str, header='') -> int:
+    """Render specs into a module in a single pass, streaming each one straight to the file.
+
+    The file is written atomically; the new contents are written to a temporary file which then replaces it.
+
+    Arguments:
+        specs (iterable): The specs; any iterable, e.g. the generator from load_specs.
+        path (str): The module to write.
+        header (str): Source which comes before all of the specs, e.g. the module docstring.
+
+    Returns:
+        count (int): The number of specs rendered.
+    """
+    count = 0
+    with file_lib.atomic_write(path) as wfile:
+        wfile.write(header)
+        for spec in specs:
+            wfile.write('\n' + spec.render() if count else spec.render())
+            count += 1
+    return count
+
+
+def main():
+    """Generate a module from a JSONL file of specs."""
+    import python_editor
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('specs', help='The JSONL file of specs, one per line.')
+    parser.add_argument('output', help='The module to write.')
+    args = parser.parse_args()
+    count = render_module(load_specs(args.specs), args.output, header=python_editor.HEADER)
+    print('Rendered {} objects into "{}".'.format(count, args.output))
+
+
+if __name__ == '__main__':
+    main()
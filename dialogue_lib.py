@@ -0,0 +1,163 @@
+# coding=utf-8
+"""An asyncio dialogue engine; speaking, listening, recognition and NLP overlap, and menu actions run off the loop."""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+import time
+
+import lib
+import log_lib
+import match_lib
+import trace_lib
+import validate_lib
+
+ENGINE = None
+ENGINE_LOCK = threading.Lock()
+LOGGER = logging.getLogger('parsel_tongue')
+# Worker threads for the actions, NLP and blocking waits; each level of nested menus keeps a few of them busy.
+WORKERS = 32
+
+
+class DialogueEngine(object):
+    """Runs menus as coroutines on an event loop, in a background thread.
+
+    Speech (voice_lib.Speaker), audio capture and recognition (audio_lib.Listener) already run on threads of their own;
+    the engine awaits them rather than blocking on them.  Listening starts as soon as a prompt is queued instead of once
+    it has been spoken, and what is heard is interpreted (and a menu's matcher compiled) while it is still being
+    spoken, so a turn takes as long as its slowest stage rather than the sum of them; with [voice] barge_in, whatever
+    the user says also cuts off stale status messages.  NLP, clearing the screen and the menu actions (e.g. saving) run
+    in worker threads.  An action which opens a sub-menu or asks a question calls back into the loop from its worker
+    thread; see run.  Menu option dicts are the same as for lib.run_menu.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(WORKERS, thread_name_prefix='dialogue'))
+        self._thread = threading.Thread(target=self.loop.run_forever, name='dialogue', daemon=True)
+        self._thread.start()
+
+    async def listen(self, interpret=True, timeout=3) -> str:
+        """Get the next thing the user says, listening while the prompt is still being spoken.
+
+        Unlike lib.listen_and_transcribe, the prompt is never waited for: listening starts as soon as it is queued,
+        and what is heard is interpreted while the rest of it is spoken.  [voice] barge_in only decides whether what is
+        heard cuts off stale status messages.
+
+        Arguments:
+            interpret (bool): Try to interpret the meaning; don't just pass through the exact text.
+            timeout (int): Timeout in seconds for listening to user input; it doesn't run out while speaking.
+        """
+        source = lib.get_input_source()
+        speaker = lib.get_speaker()
+        barge_in = lib.get_settings().get_bool('voice', 'barge_in')
+        # Anything heard before now was said before the prompt was asked.
+        source.clear()
+        while True:
+            if not lib.INPUT_SOURCE:
+                print('\a')
+            try:
+                with trace_lib.span('listen'):
+                    result = lib.hear(await asyncio.to_thread(source.get, timeout), interrupt=barge_in)
+            except queue.Empty:
+                # Nothing is expected until the prompt has been spoken.
+                if speaker.wait(timeout=0):
+                    lib.status_update('I didn\'t hear anything.  Please try again.')
+                continue
+            if result and interpret:
+                result = await asyncio.to_thread(lib.interpret_meaning, result)
+            if result:
+                return result
+
+    async def menu(self, title: str, options: dict, display=None, **kwargs) -> list:
+        """Run a menu; the same as lib.run_menu, but each menu's matcher (and the yes/no vocabulary) is compiled while
+        its title is spoken, and each choice is listened for while the prompt is still being spoken.
+        """
+        display = display or ''
+        title = lib.open_menu(title)
+        # Get ahead of the first turn; get_choice waits for a matcher which is still being compiled.
+        self._prefetch(match_lib.get_matcher, options)
+        self._prefetch(lib.get_yes_no_vocabulary)
+        results = []
+        with trace_lib.turn(menu=title):
+            while True:
+                started = time.perf_counter()
+                with trace_lib.span('turn') as turn:
+                    if lib.CLEAR_SCREEN:
+                        await asyncio.to_thread(os.system, 'clear')
+                    print(display)
+                    validate_lib.report()
+                    choice = await asyncio.to_thread(lib.get_choice, 'Please choose one of the following:', options)
+                    turn.tag(choice=choice)
+                    action = lib.get_action(options, choice)
+                    if not action:
+                        continue
+                    with trace_lib.span('action', choice=choice):
+                        result = await asyncio.to_thread(action, **kwargs)
+                log_lib.log_turn(title, choice, (time.perf_counter() - started) * 1000, confidence=lib.LAST_CONFIDENCE)
+                results.append(result)
+                if result:
+                    display += str(result) + '\n'
+                question = '{}.  Do you want to do anything else?'.format(title)
+                if not await asyncio.to_thread(lib.get_yes_or_no, question):
+                    lib.status_update('Closing the {}.'.format(title))
+                    break
+        return results
+
+    def run(self, coroutine):
+        """Run a coroutine on the loop and wait for its result; called from any thread but the loop's own.
+
+        SystemExit (e.g. from an action which exits the editor) is passed back to the calling thread, rather than
+        stopping the loop.
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('The dialogue engine can\'t wait for itself; await the coroutine instead.')
+        exited, result = asyncio.run_coroutine_threadsafe(_guard(coroutine), self.loop).result()
+        if exited:
+            raise result
+        return result
+
+    def stop(self):
+        """Stop the event loop."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    def _prefetch(self, funct, *args):
+        """Call funct in a worker thread, ahead of when it is needed; an error is raised again when it's needed."""
+        self.loop.run_in_executor(None, funct, *args).add_done_callback(lambda future: future.exception())
+
+
+async def _guard(coroutine) -> tuple:
+    """Await a coroutine, catching SystemExit; it would otherwise stop the event loop."""
+    try:
+        return False, await coroutine
+    except SystemExit as error:
+        return True, error
+
+
+def get_engine() -> DialogueEngine:
+    """Get the running dialogue engine; None unless it has been started."""
+    return ENGINE
+
+
+def start() -> DialogueEngine:
+    """Start the dialogue engine; lib.run_menu and lib.listen_and_transcribe then run on it."""
+    global ENGINE
+    with ENGINE_LOCK:
+        if ENGINE is None:
+            LOGGER.debug('Starting the asyncio dialogue engine.')
+            ENGINE = DialogueEngine()
+    return ENGINE
+
+
+def stop():
+    """Stop the dialogue engine; lib.run_menu and lib.listen_and_transcribe go back to running serially."""
+    global ENGINE
+    with ENGINE_LOCK:
+        engine, ENGINE = ENGINE, None
+    if engine:
+        engine.stop()
@@ -0,0 +1,182 @@
+# coding=utf-8
+"""An in-memory model of the module being written; named functions, classes and variables."""
+
+import collections
+import logging
+import os
+
+import file_lib
+import symbol_lib
+
+LOGGER = logging.getLogger('parsel_tongue')
+CLASS = 'class'
+FUNCTION = 'function'
+VARIABLE = 'variable'
+
+
+class Node(object):
+    """A named function, class or variable in the document; either rendered source, or a spec to render it from."""
+
+    def __init__(self, kind: str, name: str, source=None, spec=None):
+        """
+        Arguments:
+            kind (str): CLASS, FUNCTION or VARIABLE.
+            name (str): The name of the object, e.g. 'get_help'.
+            source (str): The rendered Python source of the object.
+            spec (codegen_lib.FunctionSpec|ClassSpec|VariableSpec): Renders the source when it is first needed.
+        """
+        self.kind = kind
+        self.name = name
+        self.spec = spec
+        self._source = source
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Create a node from a codegen_lib spec."""
+        return cls(spec.kind, spec.name, spec=spec)
+
+    @property
+    def source(self) -> str:
+        """The rendered Python source of the object."""
+        if self._source is None:
+            self._source = self.spec.render()
+        return self._source
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__, self.kind, self.name)
+
+    def __str__(self):
+        return self.source
+
+    def render(self) -> str:
+        """Get the Python source of the object."""
+        return self.source
+
+
+class Document(object):
+    """The nodes of a module, indexed by name and kept in the order they were created.
+
+    Rendered nodes are cached until the node is replaced, and the document is only written out when something has
+    changed since the last save.  The symbols which the nodes define are indexed as they change; see symbol_lib.  Every
+    change is also recorded in the journal (if there is one), so an unsaved document survives a crash, and each new or
+    changed node is checked by the validator (if there is one).
+    """
+
+    def __init__(self, header='', journal=None, validator=None):
+        """
+        Arguments:
+            header (str): Source which comes before all of the nodes, e.g. the module docstring.
+            journal (journal_lib.Journal): Optionally records every change; see journal_lib.
+            validator (validate_lib.Validator): Optionally checks the syntax of each node in the background.
+        """
+        self.header = header
+        self.journal = journal
+        self.validator = validator
+        self.nodes = collections.OrderedDict()
+        self.dirty = False
+        self.saved_path = None
+        self.symbols = symbol_lib.SymbolTable()
+        self._rendered = {}
+
+    def __contains__(self, name: str):
+        return name in self.nodes
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node: Node):
+        """Add a node; a node with the same name is replaced in place."""
+        if node.name in self.nodes:
+            LOGGER.debug('Replacing {!r}.'.format(self.nodes[node.name]))
+        self.nodes[node.name] = node
+        self._changed(node.name)
+        self.symbols.add_node(node)
+        if self.validator:
+            self.validator.submit(node.name, node.source)
+        if self.journal:
+            self.journal.append('add', kind=node.kind, name=node.name, source=node.source)
+
+    def errors(self) -> dict:
+        """Get the syntax errors of the nodes (once they have all been checked), keyed by name; see validate_lib."""
+        return self.validator.errors() if self.validator else {}
+
+    def get(self, name: str) -> Node:
+        """Get a node by name; None if it doesn't exist."""
+        return self.nodes.get(name)
+
+    def names(self, kind=None) -> list:
+        """Get the names of the nodes, optionally only those of a kind, e.g. FUNCTION."""
+        return [name for name, node in self.nodes.items() if not kind or node.kind == kind]
+
+    def remove(self, name: str) -> Node:
+        """Remove a node by name."""
+        node = self.nodes.pop(name)
+        self._changed(name)
+        self.symbols.remove_node(name)
+        if self.validator:
+            self.validator.forget(name)
+        if self.journal:
+            self.journal.append('remove', name=name)
+        return node
+
+    def render(self) -> str:
+        """Get the Python source of the whole module."""
+        return ''.join(self._chunks())
+
+    def replace(self, name: str, node: Node):
+        """Replace the named node, keeping its position; the new node may have a different name.
+
+        Raises:
+            ValueError: If the new name is already the name of another node; remove that node first to overwrite it.
+        """
+        if node.name == name:
+            self.add(node)
+            return
+        if node.name in self.nodes:
+            raise ValueError('There is already an object called "{}".'.format(node.name))
+        self.nodes = collections.OrderedDict((node.name, node) if key == name else (key, value)
+                                             for key, value in self.nodes.items())
+        self._changed(name)
+        self._changed(node.name)
+        self.symbols.remove_node(name)
+        self.symbols.add_node(node)
+        if self.validator:
+            self.validator.forget(name)
+            self.validator.submit(node.name, node.source)
+        if self.journal:
+            self.journal.append('replace', name=name, kind=node.kind, new_name=node.name, source=node.source)
+
+    def save(self, path: str) -> bool:
+        """Write the module to a file, if anything changed since the last save.
+
+        The file is written atomically; the new contents are written to a temporary file which then replaces it.
+
+        Returns:
+            saved (bool): Whether the file was written.
+        """
+        if not self.dirty and path == self.saved_path and os.path.exists(path):
+            LOGGER.debug('"{}" is already up to date.'.format(path))
+            return False
+        with file_lib.atomic_write(path) as wfile:
+            wfile.writelines(self._chunks())
+        self.dirty = False
+        self.saved_path = path
+        return True
+
+    def _changed(self, name: str):
+        """Mark the document as changed and discard the node's rendered source."""
+        self._rendered.pop(name, None)
+        self.dirty = True
+
+    def _chunks(self):
+        """Generate the rendered header and nodes, re-rendering only the nodes which changed."""
+        yield self.header
+        for index, (name, node) in enumerate(self.nodes.items()):
+            rendered = self._rendered.get(name)
+            if rendered is None:
+                rendered = node.render()
+                self._rendered[name] = rendered
+            yield '\n' + rendered if index else rendered
@@ -0,0 +1,48 @@
+# coding=utf-8
+"""Helpers for writing files safely, e.g. the generated module, the settings and the journal."""
+
+import contextlib
+import os
+import tempfile
+
+# The process's umask; reading it means changing it, which isn't thread-safe, so it is only read once.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, durable=False):
+    """Write a file atomically; the text is written to a temporary file (in the same directory) which then replaces it.
+
+    The file keeps its permissions, or gets the usual ones (i.e. 0666 less the umask) if it is new, rather than those of
+    a temporary file (0600).  If anything fails, the file is left as it was and the temporary file is removed.
+
+    Arguments:
+        path (str): The file to write.
+        durable (bool): Also sync the text to the disk before replacing the file.
+
+    Yields:
+        wfile (file): The temporary file, open for writing text.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    wfile = tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False)
+    try:
+        with wfile:
+            yield wfile
+            if durable:
+                wfile.flush()
+                os.fsync(wfile.fileno())
+        os.chmod(wfile.name, get_mode(path))
+        os.replace(wfile.name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(wfile.name)
+        raise
+
+
+def get_mode(path: str) -> int:
+    """Get the permissions of a file; those of a new file (i.e. 0666 less the umask) if it doesn't exist."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
@@ -1,7 +1,10 @@
 # coding=utf-8
 """Helpers for working with functions."""
 
+import codegen_lib
+import doc_lib
 import lib
+import symbol_lib
 import var_lib
 
 TEMPLATE = '''
@@ -19,26 +22,40 @@ def create_function():
         input_vars = var_lib.create_variables(as_input_vars=True)
     else:
         input_vars = {}
-    parsed_vars = ', '.join(input_vars.values())
     lib.status_update('Great.  Now let\'s add some logic lines.')
-    logic_lines = lib.create_logic_lines()
-    funct = TEMPLATE.format(name=name, input_vars=parsed_vars, description=desc, logic_lines=logic_lines)
-    return funct
-
-
-@lib.not_implemented
-def delete_function(funct):
-    """Delete an existing function."""
-    options = {}
-    # TODO: How do we return things properly from the menu?  Yield?
-    lib.run_menu('Delete a Function', options, display=funct)
-    return funct
-
-
-@lib.not_implemented
-def edit_function(funct):
-    """Edit an existing function."""
-    options = {}
-    # TODO: How do we return things properly from the menu?  Yield?
-    lib.run_menu('Edit a Function', options, display=funct)
-    return funct
+    logic_lines = lib.create_logic_lines(tab_level=0).splitlines()
+    spec = codegen_lib.FunctionSpec(name, input_vars=input_vars.values(), description=desc, logic_lines=logic_lines)
+    return doc_lib.Node.from_spec(spec)
+
+
+def delete_function(document: doc_lib.Document, name: str) -> doc_lib.Node:
+    """Delete an existing function, once the user has confirmed it.
+
+    Returns:
+        node (doc_lib.Node): The deleted function; None if it wasn't deleted.
+    """
+    if not lib.get_yes_or_no('Are you sure you want to delete the function "{}"?'.format(name)):
+        return None
+    lib.status_update('Deleted "{}".'.format(name))
+    return document.remove(name)
+
+
+def edit_function(document: doc_lib.Document, name: str) -> doc_lib.Node:
+    """Edit an existing function; it is either renamed, or re-created in place.
+
+    Returns:
+        node (doc_lib.Node): The edited function; None if it wasn't changed.
+    """
+    choices = {
+        'Rename the function': {'keyword': ['rename', 'name']},
+        'Re-create the function': {'keyword': ['recreate', 'replace', 'rewrite']},
+    }
+    if lib.get_choice('Do you want to rename or re-create "{}"?'.format(name), choices) == 'Rename the function':
+        try:
+            node = symbol_lib.rename(document.get(name), lib.simple_prompt('What do you want to rename it to?'))
+        except ValueError as error:
+            lib.status_update(str(error))
+            return None
+    else:
+        node = create_function()
+    return node if lib.replace_node(document, name, node) else None
@@ -0,0 +1,229 @@
+# coding=utf-8
+"""An append-only journal of the session, so the editor can resume after a crash; see Journal."""
+
+import collections
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import file_lib
+
+LOGGER = logging.getLogger('parsel_tongue')
+# Stops the writer thread.
+_CLOSE = object()
+
+
+class Journal(object):
+    """An append-only journal of every change made to the document (and to the settings) during a session.
+
+    Each change is a JSON record on a line of its own, numbered in sequence.  Records are queued and written by a
+    background thread, which fsyncs each batch of them at most every flush_interval seconds; appending never waits
+    for the disk.  The writer also folds each record into the state of the session, and once compact_after records
+    have been written the state is saved as a snapshot (atomically) and the journal starts again, so a resume only
+    reads the snapshot and the records since.
+
+    A crash loses (at most) the last flush_interval seconds of changes; a record which was only partly written is
+    skipped on resume.
+    """
+
+    def __init__(self, path: str, flush_interval=0.2, compact_after=500):
+        """
+        Arguments:
+            path (str): The journal file; the snapshot is kept next to it, with a '.snapshot' suffix.
+            flush_interval (float): The longest that a record waits in memory before it is written and fsynced.
+            compact_after (int): Fold the journal into a snapshot once it has this many records.
+        """
+        self.path = path
+        self.snapshot_path = path + '.snapshot'
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self.state = new_state()
+        self.sequence = 0
+        self._applied = 0
+        self._count = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+
+    def append(self, op: str, **fields):
+        """Queue a record of a change to be written, e.g. append('remove', name='get_help'); see apply."""
+        with self._lock:
+            self.sequence += 1
+            record = dict(fields, op=op, seq=self.sequence)
+        self._queue.put(record)
+
+    def close(self):
+        """Write any queued records, and stop the writer."""
+        if self._writer:
+            self._queue.put(_CLOSE)
+            self._writer.join()
+            self._writer = None
+            self._file.close()
+            self._file = None
+
+    def compact(self):
+        """Fold the journal into the snapshot; only call this from the writer thread, or while it isn't running."""
+        _write_atomically(self.snapshot_path, json.dumps({'seq': self._applied, 'state': _encode(self.state)}))
+        if self._file:
+            self._file.seek(0)
+            self._file.truncate()
+        else:
+            open(self.path, 'w').close()
+        self._count = 0
+        LOGGER.debug('Compacted the journal "{}" into a snapshot at record {}.'.format(self.path, self._applied))
+
+    def discard(self):
+        """Stop journaling, and delete the journal; e.g. once the session has finished."""
+        self.close()
+        for path in (self.path, self.snapshot_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.state = new_state()
+
+    def flush(self, timeout=None) -> bool:
+        """Wait until every queued record has been written and fsynced; returns False if the timeout was reached."""
+        if not self._writer:
+            return True
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        return flushed.wait(timeout)
+
+    def open(self) -> dict:
+        """Replay the journal of an unfinished session (if there is one), then start journaling.
+
+        Returns:
+            state (dict): The state of the session; see new_state.
+        """
+        self.state, self.sequence = replay(self.path)
+        self._applied = self.sequence
+        # Start again from a snapshot, so a partly written record at the end of the journal is left behind.
+        self.compact()
+        self._file = open(self.path, 'a')
+        self._writer = threading.Thread(target=self._write, name='journal', daemon=True)
+        self._writer.start()
+        return self.state
+
+    def _write(self):
+        """Write queued records in batches; one fsync per batch."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            try:
+                # Gather whatever else is queued in the meantime.
+                while batch[-1] is not _CLOSE and not isinstance(batch[-1], threading.Event):
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            records = [item for item in batch if isinstance(item, dict)]
+            if records:
+                try:
+                    self._file.write(''.join(json.dumps(record) + '\n' for record in records))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError as error:
+                    LOGGER.error('Failed to write to the journal "{}": {}.'.format(self.path, error))
+                for record in records:
+                    apply(self.state, record)
+                self._applied = records[-1]['seq']
+                self._count += len(records)
+                if self._count >= self.compact_after:
+                    try:
+                        self.compact()
+                    except OSError as error:
+                        LOGGER.error('Failed to compact the journal "{}": {}.'.format(self.path, error))
+            if isinstance(batch[-1], threading.Event):
+                batch[-1].set()
+            elif batch[-1] is _CLOSE:
+                break
+
+
+def apply(state: dict, record: dict):
+    """Fold a record into the state of a session.
+
+    Records:
+        add: A node was added (or replaced in place); kind, name and source.
+        remove: A node was removed; name.
+        replace: A node was replaced in place by one with a different name; name, then the new kind, name and source.
+        setting: A setting was changed; section, option and value.
+        set: A value of the editor's own was changed, e.g. the output file; key and value.
+    """
+    op, nodes = record['op'], state['nodes']
+    if op == 'add':
+        nodes[record['name']] = _node(record)
+    elif op == 'remove':
+        nodes.pop(record['name'], None)
+    elif op == 'replace' and record['new_name'] != record['name'] and record['new_name'] in nodes:
+        LOGGER.warning('Skipping a replacement onto an existing name: {}.'.format(record))
+    elif op == 'replace':
+        state['nodes'] = collections.OrderedDict((record['new_name'], _node(record, record['new_name']))
+                                                 if name == record['name'] else (name, node)
+                                                 for name, node in nodes.items())
+    elif op == 'setting':
+        state['settings'].setdefault(record['section'], {})[record['option']] = record['value']
+    elif op == 'set':
+        state['values'][record['key']] = record['value']
+    else:
+        LOGGER.warning('Skipping an unknown journal record: {}.'.format(record))
+
+
+def new_state() -> dict:
+    """Get the state of a new session.
+
+    Returns:
+        state (dict): The nodes of the document as {'name': {'kind': ..., 'name': ..., 'source': ...}} in order, the
+            changed settings as {'section': {'option': value}}, and the editor's own values, e.g. {'outfile': ...}.
+    """
+    return {'nodes': collections.OrderedDict(), 'settings': {}, 'values': {}}
+
+
+def replay(path: str) -> tuple:
+    """Rebuild the state of a session from its snapshot and journal.
+
+    Returns:
+        state (dict): The state of the session; see new_state.
+        sequence (int): The number of the last record.
+    """
+    state, sequence = new_state(), 0
+    snapshot_path = path + '.snapshot'
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path) as rfile:
+            snapshot = json.load(rfile)
+        state, sequence = _decode(snapshot['state']), snapshot['seq']
+    if os.path.exists(path):
+        with open(path) as rfile:
+            for line in rfile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    LOGGER.warning('Skipping a partly written record at the end of the journal "{}".'.format(path))
+                    break
+                # The journal may not have been emptied after the last snapshot, if it crashed in between.
+                if record['seq'] > sequence:
+                    apply(state, record)
+                    sequence = record['seq']
+    return state, sequence
+
+
+def _decode(state: dict) -> dict:
+    """Decode the state of a snapshot."""
+    return dict(state, nodes=collections.OrderedDict((node['name'], node) for node in state['nodes']))
+
+
+def _encode(state: dict) -> dict:
+    """Encode the state for a snapshot; the nodes are a list, to keep their order."""
+    return dict(state, nodes=list(state['nodes'].values()))
+
+
+def _node(record: dict, name=None) -> dict:
+    """Get a node of the state from an add/replace record."""
+    return {'kind': record['kind'], 'name': name or record['name'], 'source': record['source']}
+
+
+def _write_atomically(path: str, text: str):
+    """Write a file atomically (and durably); the text is written to a temporary file which then replaces it."""
+    with file_lib.atomic_write(path, durable=True) as wfile:
+        wfile.write(text)
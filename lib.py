@@ -1,26 +1,330 @@
 # coding=utf-8
 """Common library of helpers for listening, interpreting input, speaking, etc."""
 
+import atexit
+import concurrent.futures
+import contextlib
 import itertools
 import logging
 import os
+import queue
 import re
+import threading
+import time
+
+# Set PARSEL_TONGUE_PROFILE=1 to report the import and initialization cost of each startup stage at exit.
+PROFILE = os.environ.get('PARSEL_TONGUE_PROFILE', '').lower() in ('1', 'true', 'yes')
+STARTUP_PROFILE = {}
+
+
+@contextlib.contextmanager
+def profile_stage(stage: str):
+    """Record how long a startup stage (an import or initialization) takes."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_PROFILE[stage] = STARTUP_PROFILE.get(stage, 0.0) + time.perf_counter() - start
+
+
+with profile_stage('import nltk'):
+    import nltk
+with profile_stage('import pyttsx3'):
+    import pyttsx3
+with profile_stage('import audio_lib'):
+    import audio_lib
+
+import cache_lib
+import dialogue_lib
+import log_lib
+import match_lib
+import nlp_lib
+import recognizer_lib
+import settings_lib
+import trace_lib
+import vad_lib
+import validate_lib
+import voice_lib
 
-import configparser
-import nltk
-import pyttsx3
-import speech_recognition
-
-# TODO: Add support for other languages besides en-US.
 LOGGER = logging.getLogger('parsel_tongue')
 REL_DIR = os.path.dirname(__file__)
 SETTINGS_FILE = os.path.join(REL_DIR, 'settings.ini')
-SETTINGS = configparser.RawConfigParser()
-SETTINGS.read(SETTINGS_FILE)
-STEMMER = nltk.stem.PorterStemmer()
-STOP_WORDS = [word.lower().strip() for word in nltk.corpus.stopwords.words('english')]
-VOICE_ENGINE = pyttsx3.init()
-VOICE_ENGINE.setProperty('voice', SETTINGS['voice']['voice_id'])
+# Whether to clear the screen before showing each menu; disabled for headless/scripted sessions.
+CLEAR_SCREEN = True
+# Where user input comes from when it isn't the microphone, e.g. an audio_lib.TranscriptSource; see set_input_source.
+INPUT_SOURCE = None
+# The recognizer's confidence (0-1) in the last thing which was heard; None if it doesn't report one.
+LAST_CONFIDENCE = None
+# The recognizer's alternative hypotheses (N-best) of the last thing which was heard, best first; re-ranked against the
+# expected vocabulary when the best hypothesis doesn't match it.
+LAST_ALTERNATIVES = []
+# The thread of the first warm up; see warm_up.
+WARM_UP = None
+
+
+class Lazy(object):
+    """A thread-safe singleton which is only created the first time it is needed."""
+
+    def __init__(self, stage: str, factory):
+        """
+        Arguments:
+            stage (str): The name of the startup stage; used for profiling.
+            factory (callable): Creates the value.
+        """
+        self.stage = stage
+        self.factory = factory
+        self.created = False
+        self._lock = threading.Lock()
+        self._value = None
+
+    def get(self):
+        """Get the value, creating it if this is the first use."""
+        if not self.created:
+            with self._lock:
+                if not self.created:
+                    with profile_stage(self.stage):
+                        self._value = self.factory()
+                    self.created = True
+        return self._value
+
+    def reset(self):
+        """Discard the value, so it is re-created on the next use."""
+        with self._lock:
+            self._value = None
+            self.created = False
+
+
+def _start_listener() -> audio_lib.Listener:
+    """Open the microphone and start listening in the background."""
+    settings = get_settings()
+    source = audio_lib.MicrophoneSource()
+    recognizer = recognizer_lib.get_recognizer(settings.get('voice', 'recognizer', 'google'),
+                                               language=settings.get('voice', 'language').replace('_', '-'))
+    front_end = None
+    if settings.get_bool('voice', 'trim_silence', True):
+        front_end = vad_lib.VoiceFrontEnd(target_rate=settings.get_int('voice', 'sample_rate') or None)
+    listener = audio_lib.Listener(source, recognize=recognizer.recognize,
+                                  wake_word=settings.get('voice', 'wake_word'),
+                                  calibrate_interval=settings.get_int('voice', 'calibrate_interval', 60),
+                                  front_end=front_end)
+
+    def switch_language(section, option, value):
+        """Recognize the new language as soon as it is switched to."""
+        if option == 'language' and value:
+            recognizer.language = value.replace('_', '-')
+
+    settings.subscribe(switch_language, section='voice')
+    listener.start()
+    return listener
+
+
+def _start_speaker() -> voice_lib.Speaker:
+    """Start speaking queued messages through the configured backend."""
+    backends = {
+        'pyttsx3': lambda: voice_lib.Pyttsx3Backend(get_voice_engine),
+        'null': voice_lib.NullBackend,
+    }
+    speaker = voice_lib.Speaker(backends[get_settings().get('voice', 'backend', 'pyttsx3')]())
+    # Don't cut off the last thing said, e.g. 'Good bye.'
+    atexit.register(speaker.wait, timeout=10)
+    return speaker
+
+
+def _init_voice_engine():
+    """Start the text to speech engine with the configured voice."""
+    engine = pyttsx3.init()
+    engine.setProperty('voice', get_settings().get('voice', 'voice_id'))
+    return engine
+
+
+def _load_pipeline(language: str) -> nlp_lib.Pipeline:
+    """Load the NLP resources of a language."""
+    with profile_stage('{} pipeline'.format(language)):
+        return nlp_lib.Pipeline(language)
+
+
+def _load_pipelines() -> nlp_lib.PipelinePool:
+    """Create the pool of language pipelines; see get_pipeline."""
+    return nlp_lib.PipelinePool(get_settings().get_int('voice', 'max_languages', 2), _load_pipeline)
+
+
+def _load_settings() -> settings_lib.Settings:
+    """Parse the settings file."""
+    settings = settings_lib.Settings(SETTINGS_FILE)
+    settings.subscribe(_switch_language, section='voice')
+    return settings
+
+
+def _load_yes_no() -> dict:
+    """Load the words which mean 'yes' and 'no' (in the current language)."""
+    return {answer: frozenset(get_synonymns(answer) or []) | {answer} for answer in ('yes', 'no')}
+
+
+def _switch_language(section: str, option: str, value):
+    """Re-load the yes/no vocabulary when the language changes; the language pipelines are pooled, not re-loaded."""
+    if option == 'language':
+        LOGGER.info('Switching the language to "{}".'.format(value))
+        _YES_NO.reset()
+
+
+def _reset_in_child():
+    """Re-create the singletons which run on threads of their own (i.e. the speaker and the listener) the next time they
+    are needed in a forked process, e.g. a session of service_lib; a forked process doesn't have its parent's threads.
+    """
+    for singleton in (_LISTENER, _SPEAKER, _VOICE_ENGINE):
+        singleton._lock = threading.Lock()
+        singleton.reset()
+    # The parent's warm up thread won't finish loading the shared NLP resources here.
+    match_lib.RESOURCES_LOADED = threading.Event()
+    match_lib.RESOURCES_LOADED.set()
+
+
+_LISTENER = Lazy('listener', _start_listener)
+_PIPELINES = Lazy('language pipelines', _load_pipelines)
+_SETTINGS = Lazy('settings', _load_settings)
+_SPEAKER = Lazy('speaker', _start_speaker)
+_VOICE_ENGINE = Lazy('voice engine', _init_voice_engine)
+_YES_NO = Lazy('yes/no vocabulary', _load_yes_no)
+os.register_at_fork(after_in_child=_reset_in_child)
+# The old module level constants are still available as attributes, e.g. lib.STEMMER; see __getattr__.
+_LAZY_ATTRIBUTES = {'SETTINGS': _SETTINGS, 'VOICE_ENGINE': _VOICE_ENGINE}
+# Those of the current language.
+_LANGUAGE_ATTRIBUTES = {'STEMMER': 'stemmer', 'STOP_WORDS': 'stop_words'}
+
+
+def __getattr__(name: str):
+    """Create the lazily initialized module attributes on first access."""
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name].get()
+    if name in _LANGUAGE_ATTRIBUTES:
+        return getattr(get_pipeline(), _LANGUAGE_ATTRIBUTES[name])
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+def get_input_source():
+    """Get where user input comes from; the always listening microphone, unless another source has been set."""
+    return INPUT_SOURCE or get_listener()
+
+
+def get_listener() -> audio_lib.Listener:
+    """Get the always listening microphone; opened and calibrated on first use."""
+    return _LISTENER.get()
+
+
+def get_language() -> str:
+    """Get the current language, e.g. 'en_US'; the [voice] language."""
+    return get_settings().get('voice', 'language', 'en_US')
+
+
+def get_normalizer(language=None) -> nlp_lib.Normalizer:
+    """Get the shared normalizer for user input in a language (the current language by default)."""
+    return get_pipeline(language).normalizer
+
+
+def get_pipeline(language=None) -> nlp_lib.Pipeline:
+    """Get the NLP resources of a language (the current language by default); loaded on first use, then pooled.
+
+    Arguments:
+        language (str): The language code, e.g. 'en_US' or 'fr_FR'.
+    """
+    return _PIPELINES.get().get(nlp_lib.get_language_name(language or get_language()))
+
+
+def get_speaker() -> voice_lib.Speaker:
+    """Get the speaker which vocalizes status updates and prompts; started on first use."""
+    return _SPEAKER.get()
+
+
+def get_stemmer(language=None) -> nltk.stem.api.StemmerI:
+    """Get the shared stemmer of a language (the current language by default)."""
+    return get_pipeline(language).stemmer
+
+
+def get_stop_words(language=None) -> frozenset:
+    """Get the stop words of a language (the current language by default)."""
+    return get_pipeline(language).stop_words
+
+
+def get_voice_engine():
+    """Get the text to speech engine; started on first use."""
+    return _VOICE_ENGINE.get()
+
+
+def report_startup_profile() -> str:
+    """Report the cost of each startup stage which has run so far."""
+    lines = ['Startup profile:']
+    for stage, duration in sorted(STARTUP_PROFILE.items(), key=lambda item: -item[1]):
+        lines.append('{:>10.1f} ms  {}'.format(duration * 1000, stage))
+    lines.append('{:>10.1f} ms  total'.format(sum(STARTUP_PROFILE.values()) * 1000))
+    report = '\n'.join(lines)
+    LOGGER.info(report)
+    return report
+
+
+def warm_up(paths=None, workers=4) -> threading.Thread:
+    """Compile the matcher of every statically declared menu in the background, so no menu stalls on its first turn.
+
+    The shared NLP resources (the stop words, the yes/no vocabulary and WordNet, if any keywords aren't in the word
+    cache yet) are loaded first, as loading the corpora isn't thread-safe; then the menus are compiled in a thread pool.
+    A menu which is needed before it has been compiled is waited for; see match_lib.get_matcher.
+
+    Arguments:
+        paths (list): The modules to find menus in; match_lib.MENU_MODULES by default.
+        workers (int): The number of menus to compile at once.
+
+    Returns:
+        thread (threading.Thread): The background thread; it has finished once every menu is compiled.  Only the first
+            call warms up, so later ones (e.g. in a session forked by service_lib, which is already warm) get the
+            thread of the first.
+    """
+    global WARM_UP
+    if WARM_UP:
+        return WARM_UP
+    WARM_UP = threading.Thread(target=_warm_up, args=(paths, workers), name='warm_up', daemon=True)
+    match_lib.RESOURCES_LOADED.clear()
+    WARM_UP.start()
+    return WARM_UP
+
+
+def _warm_up(paths: list, workers: int):
+    """Load the shared NLP resources, then compile the matcher of every statically declared menu."""
+    start = time.perf_counter()
+    try:
+        menus = match_lib.get_declared_menus(paths)
+        with profile_stage('warm up'):
+            try:
+                get_pipeline()
+                _YES_NO.get()
+                cache = cache_lib.get_cache()
+                language = get_language()
+                keywords = {keyword for menu in menus.values() for config in menu.values()
+                            for keyword in config['keyword']}
+                if any(cache.get('stems', language, keyword) is None for keyword in keywords):
+                    LOGGER.info('Loading WordNet for {} uncached keywords.'.format(len(keywords)))
+                    # Without WordNet, there are no synonyms (see nlp_lib.Pipeline.synonyms); the menus still compile.
+                    get_pipeline(language).synonyms('start')
+            finally:
+                match_lib.RESOURCES_LOADED.set()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='warm_up') as pool:
+                futures = {pool.submit(_warm_up_menu, menu): name for name, menu in menus.items()}
+                for count, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    LOGGER.debug('Warmed up the "{}" menu in {:.1f} ms ({}/{}).'.format(
+                        futures[future], future.result() * 1000, count, len(futures)))
+    except Exception as error:  # The menus still work without warming up; they're just slower the first time.
+        LOGGER.error('Failed to warm up the menus: {}.'.format(error))
+        return
+    LOGGER.info('Warmed up {} menus in {:.1f} ms.'.format(len(menus), (time.perf_counter() - start) * 1000))
+
+
+def _warm_up_menu(menu: dict) -> float:
+    """Compile the matcher of a menu; returns how long it took in seconds."""
+    start = time.perf_counter()
+    match_lib.get_matcher(menu)
+    return time.perf_counter() - start
+
+
+if PROFILE:
+    atexit.register(lambda: print(report_startup_profile()))
 
 
 def _delete_line():
@@ -56,53 +360,113 @@ def create_logic_lines(tab_level=1) -> str:
     return lines
 
 
-def generate_keywords(action_words: list) -> dict:
+def generate_keywords(action_words: list, language=None) -> dict:
     """For the given action words, e.g. 'delete', create a list of words of equivalent meaning."""
+    language = language or get_language()
+    cache = cache_lib.get_cache()
     keywords = {}
     for a_word in action_words:
-        # Get synonyms, if none exist, then just use the original word.
-        s_words = get_synonymns(a_word) or [a_word]
-        # Generate stems of the synonyms.
-        keywords[a_word] = [STEMMER.stem(s_word) for s_word in s_words]
+        stems = cache.get('stems', language, a_word)
+        if stems is None:
+            # Get synonyms, if none exist, then just use the original word.
+            synonyms = get_synonymns(a_word, language=language)
+            # Generate stems of the synonyms.
+            stems = sorted(set(get_normalizer(language).stem(s_word) for s_word in synonyms or [a_word]))
+            # Without a source of synonyms (e.g. WordNet isn't downloaded), they're looked up again next time.
+            if synonyms is not None:
+                cache.put('stems', language, a_word, stems)
+        keywords[a_word] = stems
     return keywords
 
 
+def choose_candidate(candidates: list) -> str:
+    """Ask which of the closely matched choices the user meant, best first; an empty string if it was none of them."""
+    for candidate in candidates:
+        if get_yes_or_no('Did you mean "{}"?'.format(candidate.choice)):
+            return candidate.choice
+    status_update('Okay, please try again.')
+    return ''
+
+
+def replace_node(document, name: str, node) -> bool:
+    """Replace a node of a document in place; another node which already has the new name is only overwritten once
+    the user confirms it.
+
+    Arguments:
+        document (doc_lib.Document): The document.
+        name (str): The name of the node to replace.
+        node (doc_lib.Node): The new node.
+    Returns:
+        replaced (bool): Whether the node was replaced.
+    """
+    if node.name != name and node.name in document:
+        if not get_yes_or_no('There is already an object called "{}".  Do you want to overwrite it?'.format(node.name)):
+            status_update('"{}" wasn\'t changed.'.format(name))
+            return False
+        document.remove(node.name)
+    document.replace(name, node)
+    return True
+
+
 def get_choice(prompt: str, choices: dict) -> str:
-    """Get the user's input until it matches one of the available choices."""
-    # Remove duplicates and lower/strip them for easier matching.
-    result = ''
-
-    # Generate a list of synonymous word stems of the given keyword.
-    for choice, config in choices.items():
-        keywords = config['keyword']
-        if isinstance(keywords, str):
-            keywords = [keywords]
-        choices[choice]['stems'] = generate_keywords(keywords)
-
-    # Keep trying until there is a result which matches the available choices.
-    while not result:
-        choices_text = sorted(choices.keys())
+    """Get the user's input until it matches one of the available choices.
+
+    Every choice is scored against the response; the best one is taken when it is clearly ahead of the rest (by the
+    [logic] match_margin), otherwise the user is asked which of the closest choices they meant.  The choice is then
+    confirmed if validation requires it; see needs_confirmation.
+    """
+    # The synonymous word stems of each keyword are compiled once per menu definition and re-used.
+    matcher = match_lib.get_matcher(choices)
+    margin = get_settings().get_float('logic', 'match_margin', 0.25)
+    max_retries = get_settings().get_int('logic', 'max_retries', 3)
+
+    for attempt in range(max_retries + 1):
+        result, confidence, confirmed = _match_choice(prompt, matcher, margin)
+        status_update('You selected "{}".'.format(result))
+        # The last attempt is taken as it is, rather than asking over and over again.
+        if confirmed or attempt == max_retries or not needs_confirmation(confidence):
+            break
+        if get_yes_or_no('Is that correct?'):
+            break
+    return result
+
+
+def _match_choice(prompt: str, matcher: 'match_lib.ChoiceMatcher', margin: float) -> tuple:
+    """Get the user's input until it matches one of the choices of a matcher.
+
+    Returns:
+        result (str): The matched choice.
+        confidence (float): The confidence in the match, including the recognizer's; None if the recognizer didn't
+            report one.
+        confirmed (bool): Whether the user has already confirmed the choice.
+    """
+    while True:
+        choices_text = matcher.choices
         user_response = get_user_input(prompt, choices_text)
+        recognized = LAST_CONFIDENCE
         # Get the user response by index, instead of by text matching.
         if user_response.isdigit():
-            result = choices_text[int(user_response) - 1]
+            if 1 <= int(user_response) <= len(choices_text):
+                return choices_text[int(user_response) - 1], recognized, False
+            status_update('There is no option {}.  Please try again.'.format(user_response))
+            continue
+        with trace_lib.span('match') as span:
+            index, ranked = match_lib.rank_hypotheses(matcher, [user_response] + LAST_ALTERNATIVES, margin)
+            span.tag(choice=ranked[0].choice if ranked else '', hypothesis=index)
+        if index:
+            LOGGER.debug('Matched the alternative hypothesis "{}".'.format(LAST_ALTERNATIVES[index - 1]))
+            # The recognizer preferred something else, so the choice is confirmed (unless validation is off) unless the
+            # recognizer reported that it was confident in the alternative itself.
+            recognized = getattr(LAST_ALTERNATIVES[index - 1], 'confidence', None) or 0.0
+        LOGGER.debug('Ranked choices: {}.'.format(ranked))
+        if not ranked:
+            status_update('I wasn\'t able to match any of the available options. Please try again.')
+        elif match_lib.get_margin(ranked) >= margin:
+            return ranked[0].choice, None if recognized is None else ranked[0].confidence * recognized, False
         else:
-            for stemmed_word in parse_text(user_response).split():
-                for choice, config in choices.items():
-                    for root_word, stems  in config['stems'].items():
-                        if stemmed_word in stems:
-                            result = choice
-                            break
-                    if result:
-                        break
-                if result:
-                    break
-            if not result:
-                status_update('I wasn\'t able to match any of the available options. Please try again.')
-    status_update('You selected "{}".'.format(result))
-    if SETTINGS['logic']['validation'] == 'True' and not get_yes_or_no('Is that correct?'):
-        result = get_choice(prompt, choices)
-    return result
+            result = choose_candidate(match_lib.get_candidates(ranked, margin))
+            if result:
+                return result, 1.0, True
 
 
 def get_help(options: list):
@@ -117,18 +481,23 @@ def get_help(options: list):
     return opts
 
 
-def get_settings():
-    """Get global settings."""
-    settings = configparser.RawConfigParser()
-    settings.read(SETTINGS_FILE)
-    return settings
+def get_settings() -> settings_lib.Settings:
+    """Get the settings shared by the whole process; parsed on first use."""
+    return _SETTINGS.get()
 
 
-def get_synonymns(text: str) -> list:
-    """Get words which are synonymous with another word."""
-    synonyms = nltk.corpus.wordnet.synsets(text)
-    possible_matches = set(itertools.chain.from_iterable([item.lemma_names() for item in synonyms]))
-    return list(possible_matches)
+def get_synonymns(text: str, language=None) -> list:
+    """Get words (of a language; the current language by default) which are synonymous with another word; None if they
+    can't be looked up right now (see nlp_lib.Pipeline.synonyms), in which case nothing is cached.
+    """
+    language = language or get_language()
+    cache = cache_lib.get_cache()
+    possible_matches = cache.get('synonyms', language, text)
+    if possible_matches is None:
+        possible_matches = get_pipeline(language).synonyms(text)
+        if possible_matches is not None:
+            cache.put('synonyms', language, text, possible_matches)
+    return possible_matches
 
 
 def get_user_input(prompt='Please make a selection now.', choices=None, interpret=True, convert_spaces=False) -> str:
@@ -144,7 +513,7 @@ def get_user_input(prompt='Please make a selection now.', choices=None, interpre
     Return:
         text (str): The text interpretation of the verbal input.
     """
-    status_update(prompt)
+    status_update(prompt, priority=voice_lib.PRIORITY_PROMPT)
     if choices:
         get_help(choices)
     raw_text = listen_and_transcribe(interpret=interpret)
@@ -154,21 +523,37 @@ def get_user_input(prompt='Please make a selection now.', choices=None, interpre
     return text
 
 
-def get_yes_or_no(prompt='Please say "yes" or "no".') -> bool:
-    """Prompt the user for a 'yes' or 'no' response."""
-    response = get_user_input(prompt, interpret=False)
-    LOGGER.debug('Raw response: "{}".'.format(response))
-    like_yes = get_synonymns('yes')
-    like_no = get_synonymns('no')
-    if response in like_yes:
-        response = 'yes'
-    elif response in like_no:
-        response = 'no'
-    else:
+def get_yes_or_no(prompt='Please say "yes" or "no".', default=False) -> bool:
+    """Prompt the user for a 'yes' or 'no' response.
+
+    Arguments:
+        prompt (str): The question to ask.
+        default (bool): The answer taken after the [logic] max_retries unclear responses; if None, keep asking (e.g.
+            when either answer can't be undone).
+
+    Returns:
+        (bool): Whether the user said 'yes'.
+    """
+    max_retries = get_settings().get_int('logic', 'max_retries', 3)
+    attempts = itertools.count() if default is None else range(max_retries + 1)
+    for _ in attempts:
+        response = get_user_input(prompt, interpret=False)
+        LOGGER.debug('Raw response: "{}".'.format(response))
+        # The recognizer's alternatives are only tried once the best hypothesis doesn't mean either.
+        for hypothesis in [response] + [alternative.lower().strip() for alternative in LAST_ALTERNATIVES]:
+            for answer, words in get_yes_no_vocabulary().items():
+                if hypothesis in words:
+                    LOGGER.debug('The parsed response was: "{}".'.format(answer))
+                    return answer == 'yes'
         status_update('I didn\'t understand what you said.')
-        response = str(get_yes_or_no())
-    LOGGER.debug('The parsed response was: "{}".'.format(response))
-    return 'yes' in response
+        prompt = 'Please say "yes" or "no".'
+    status_update('I\'ll take that as a "{}".'.format('yes' if default else 'no'))
+    return default
+
+
+def get_yes_no_vocabulary() -> dict:
+    """Get the words which mean 'yes' and 'no' in the current language, e.g. {'yes': {'yes', 'yeah', ...}, ...}."""
+    return _YES_NO.get()
 
 
 def get_text_input(interpret=True, **kwargs) -> str:
@@ -180,7 +565,7 @@ def get_text_input(interpret=True, **kwargs) -> str:
 
 
 def listen_and_transcribe(interpret=True, timeout=3) -> str:
-    """Listen to mic audio and convert to text.
+    """Get the next thing the user says from the always listening microphone, and convert it to text.
 
     Arguments:
         interpret (bool): Try to interpret the meaning; don't just pass through the exact text.
@@ -189,60 +574,80 @@ def listen_and_transcribe(interpret=True, timeout=3) -> str:
     Returns:
         result (str): The interpreted text from the audio input.
     """
-    # TODO: Replace this with something that is "always listening" for keywords.
-    rec = speech_recognition.Recognizer()
-    with speech_recognition.Microphone() as mic:
-        rec.adjust_for_ambient_noise(mic)
-        while True:
-            try:
-                # TODO: Have some sort of indicator here that it is now listening!
-                print('\a')
-                audio_data = rec.listen(mic, timeout=timeout)
-                result = rec.recognize_google(audio_data)
-            except speech_recognition.WaitTimeoutError:
-                status_update('I didn\'t hear anything.  Please try again.')
-                continue
-            except speech_recognition.UnknownValueError:
-                status_update('I didn\'t understand what was said.  Please try again.')
-                continue
-            if interpret and result:
-                result = interpret_meaning(result)
-            if result:
-                break
+    engine = dialogue_lib.get_engine()
+    if engine:
+        return engine.run(engine.listen(interpret=interpret, timeout=timeout))
+    source = get_input_source()
+    barge_in = get_settings().get_bool('voice', 'barge_in')
+    if not barge_in:
+        get_speaker().wait()
+    # Anything heard before now was said before the prompt was asked (or was the prompt itself).
+    source.clear()
+    while True:
+        if not INPUT_SOURCE:
+            # TODO: Have some sort of indicator here that it is now listening!
+            print('\a')
+        try:
+            with trace_lib.span('listen'):
+                result = hear(source.get(timeout=timeout), interrupt=barge_in)
+        except queue.Empty:
+            status_update('I didn\'t hear anything.  Please try again.')
+            continue
+        if result and interpret:
+            result = interpret_meaning(result)
+        if result:
+            break
     return result
 
 
-def interpret_meaning(text: str) -> str:
+def hear(result, interrupt=False) -> str:
+    """Take something the input source heard, which starts a new turn; see listen_and_transcribe.
+
+    Arguments:
+        result (str|audio_lib.Utterance): What was heard; None once the source has no more input.
+        interrupt (bool): Cut off stale status messages which are being spoken (barge-in).
+
+    Returns:
+        result (str|audio_lib.Utterance): What was heard; empty if it wasn't understood.
+    """
+    global LAST_ALTERNATIVES, LAST_CONFIDENCE
+    if result is None:
+        raise EOFError('The input source has no more input.')
+    LAST_CONFIDENCE = getattr(result, 'confidence', None)
+    LAST_ALTERNATIVES = getattr(result, 'alternatives', [])
+    get_speaker().heard(interrupt=interrupt)
+    if not result:
+        status_update('I didn\'t understand what was said.  Please try again.')
+    return result
+
+
+def interpret_meaning(text: str, ngrams=1) -> str:
     """Try to interpret the 'meaning' of what was said.  Translate it into a known term if applicable."""
-    # Break up the "sentence" into individual tokens.
-    # TODO: Add support for n-gram interpretations.
-    tokens = nltk.word_tokenize(text)
-    # Remove any stop words which don't really help the context.
-    tokens = [token for token in tokens if token.lower() not in STOP_WORDS]
-    # Simplify words down to their roots/stems; in this case Porter Stemming so we have an actual word.
-    stems = [STEMMER.stem(token) for token in tokens]
-    if not stems:
+    with trace_lib.span('interpret'):
+        result = parse_text(text, ngrams=ngrams)
+    if not result:
         status_update('I wasn\'t able to figure out what you meant.')
-        result = ''
-    else:
-        result = ' '.join(stems)
     return result
 
 
-def parse_text(text: str) -> str:
-    """Parse user input text via NLP."""
-    # Break up the "sentence" into individual tokens.
-    # TODO: Add support for n-gram interpretations.
-    tokens = nltk.word_tokenize(text)
-    # Remove any stop words which don't really help the context.
-    tokens = [token for token in tokens if token.lower() not in STOP_WORDS]
-    # Simplify words down to their roots/stems; in this case Porter Stemming so we have an actual word.
-    stems = [STEMMER.stem(token) for token in tokens]
-    if not stems:
-        result = ''
-    else:
-        result = ' '.join(stems)
-    return result
+def parse_text(text: str, ngrams=1, language=None) -> str:
+    """Parse user input text via NLP.
+
+    Arguments:
+        text (str): The user input.
+        ngrams (int): Also include n-grams of consecutive stems up to this length, e.g. 'new_function'.
+        language (str): The language of the text; the current language by default.
+
+    Returns:
+        result (str): The space separated stems, without stop words.
+    """
+    return ' '.join(get_normalizer(language).normalize(text, ngrams=ngrams))
+
+
+def parse_texts(texts, ngrams=1, language=None):
+    """Parse a batch (a list or generator) of user input texts; yields the result of each one like parse_text."""
+    for terms in get_normalizer(language).normalize_all(texts, ngrams=ngrams):
+        yield ' '.join(terms)
 
 
 def not_implemented(funct):
@@ -264,29 +669,33 @@ def run_menu(title: str, options: dict, display=None, **kwargs) -> list:
     Returns:
         results (str): The result of the action taken, based upon the user's input.
     """
+    engine = dialogue_lib.get_engine()
+    if engine:
+        return engine.run(engine.menu(title, options, display=display, **kwargs))
     if not display:
         display = ''
-    if not title.endswith('Menu'):
-        title += ' Menu'
-    LOGGER.debug('Starting the {} menu.'.format(title))
-    status_update('{}.'.format(title))
+    title = open_menu(title)
     results = []
-    while True:
-        os.system('clear')  # Clear out any previous text.
-        print(display)
-        choice = get_choice('Please choose one of the following:', options)
-        action = options[choice]['action']
-        if not action:
-            LOGGER.warning('User choice "{}" had no matches.'.format(choice))
-            status_update('The choice you selected does not exist.')
-            continue
-        else:
-            # Run the action:
-            status_update('Okay.')
-            result = action(**kwargs)
+    with trace_lib.turn(menu=title):
+        while True:
+            started = time.perf_counter()
+            with trace_lib.span('turn') as turn:
+                if CLEAR_SCREEN:
+                    os.system('clear')  # Clear out any previous text.
+                print(display)
+                # Syntax errors found in the generated code since the last turn.
+                validate_lib.report()
+                choice = get_choice('Please choose one of the following:', options)
+                turn.tag(choice=choice)
+                action = get_action(options, choice)
+                if not action:
+                    continue
+                with trace_lib.span('action', choice=choice):
+                    result = action(**kwargs)
+            log_lib.log_turn(title, choice, (time.perf_counter() - started) * 1000, confidence=LAST_CONFIDENCE)
             results.append(result)
             if result:
-                display += result + '\n'
+                display += str(result) + '\n'
             # Determine if anything else is needed.
             if get_yes_or_no('{}.  Do you want to do anything else?'.format(title)):
                 continue
@@ -296,29 +705,77 @@ def run_menu(title: str, options: dict, display=None, **kwargs) -> list:
     return results
 
 
+def open_menu(title: str) -> str:
+    """Announce a menu; returns its full title, e.g. 'Main Menu'."""
+    if not title.endswith('Menu'):
+        title += ' Menu'
+    LOGGER.debug('Starting the {} menu.'.format(title))
+    status_update('{}.'.format(title))
+    return title
+
+
+def get_action(options: dict, choice: str):
+    """Get the action of a menu choice, announcing it; None (after saying so) if the choice has no action."""
+    action = options[choice]['action']
+    if not action:
+        LOGGER.warning('User choice "{}" had no matches.'.format(choice))
+        status_update('The choice you selected does not exist.')
+        return None
+    status_update('Okay.')
+    return action
+
+
+def set_input_source(source=None):
+    """Get user input from another source instead of the microphone, e.g. an audio_lib.TranscriptSource.
+
+    Arguments:
+        source (audio_lib.TranscriptSource): The source; None to go back to the microphone.
+    """
+    global INPUT_SOURCE
+    INPUT_SOURCE = source
+
+
+def needs_confirmation(confidence=None) -> bool:
+    """Whether to ask the user to confirm what they said (or chose), per the [logic] validation setting.
+
+    Validation is either always (True), never (False) or adaptive; only when the confidence is unknown or is below the
+    [logic] confidence_threshold.
+
+    Arguments:
+        confidence (float): The confidence (0-1) in what was heard and/or matched; None if it isn't known.
+    """
+    validation = get_settings().get('logic', 'validation', 'True').lower()
+    if validation != 'adaptive':
+        return validation == 'true'
+    return confidence is None or confidence < get_settings().get_float('logic', 'confidence_threshold', 0.8)
+
+
 def simple_prompt(prompt: str, interpret=False) -> str:
     """Get the requested description."""
-    response = get_user_input(prompt, interpret=interpret)
-    status_update('You said: "{}".'.format(response))
-    if SETTINGS['logic']['validation'] == 'True' and not get_yes_or_no('Is that correct?'):
-        response = simple_prompt(prompt, interpret)
+    max_retries = get_settings().get_int('logic', 'max_retries', 3)
+    for attempt in range(max_retries + 1):
+        response = get_user_input(prompt, interpret=interpret)
+        status_update('You said: "{}".'.format(response))
+        # The last attempt is taken as it is, rather than asking over and over again.
+        if attempt == max_retries or not needs_confirmation(LAST_CONFIDENCE) or get_yes_or_no('Is that correct?'):
+            break
     return response
 
 
-def speak_text(text: str) -> None:
-    """Speak text back to the user.
+def speak_text(text: str, priority=voice_lib.PRIORITY_STATUS) -> None:
+    """Speak text back to the user; this is queued up, it doesn't wait for the speech to finish.
 
     Arguments:
         text (str): Text to vocalize.
+        priority (int): voice_lib.PRIORITY_STATUS or PRIORITY_PROMPT; stale status messages may be skipped.
     """
-    VOICE_ENGINE.say(text)
-    VOICE_ENGINE.runAndWait()
+    get_speaker().say(text, priority=priority)
 
 
-def status_update(msg: str):
+def status_update(msg: str, priority=voice_lib.PRIORITY_STATUS):
     """Provide a verbal and visual status update."""
     LOGGER.debug(msg)
     print(msg)
-    speak_text(msg)
+    speak_text(msg, priority=priority)
 
 
@@ -0,0 +1,101 @@
+# coding=utf-8
+"""Logging off the hot path; records are queued and written (and rotated) by a background thread."""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import threading
+
+FORMAT = '%(asctime)s |%(levelname)s| %(module)s.%(funcName)s -> %(message)s'
+# Puts the records of every logger on the queue of the listener.
+HANDLER = None
+LISTENER = None
+LISTENER_LOCK = threading.Lock()
+LOGGER = logging.getLogger('parsel_tongue')
+# Whether to log a structured record of each turn; see log_turn.
+TURNS = False
+# Whether stop is run at exit; see start.
+_STOP_REGISTERED = False
+
+
+def configure(settings, processes=False) -> logging.handlers.QueueListener:
+    """Start logging per the [logging] settings; the level follows changes to the settings.  See start for processes."""
+    global TURNS
+    TURNS = settings.get_bool('logging', 'turns', True)
+    listener = start(settings.get('logging', 'path', 'parsel_tongue.log'),
+                     level=settings.get('logging', 'level', 'INFO'),
+                     max_bytes=settings.get_int('logging', 'max_bytes', 10485760),
+                     backup_count=settings.get_int('logging', 'backup_count', 5),
+                     fmt=settings.get('logging', 'format', FORMAT), processes=processes)
+    settings.subscribe(_update, section='logging')
+    return listener
+
+
+def log_turn(menu: str, choice: str, milliseconds: float, **fields):
+    """Log a structured (JSON) record of a dialogue turn, e.g. its menu, choice and duration, if enabled."""
+    if TURNS:
+        record = dict(fields, menu=menu, choice=choice, ms=round(milliseconds, 1))
+        LOGGER.info('Turn: {}'.format(json.dumps(record, sort_keys=True, default=str)))
+
+
+def start(path: str, level='INFO', max_bytes=10485760, backup_count=5, fmt=FORMAT,
+          processes=False) -> logging.handlers.QueueListener:
+    """Log to a rotating file from a background thread.
+
+    Every logger (i.e. the root logger) only puts its records on a queue, so logging never waits for the disk.  Any
+    handlers which were already on the root logger (e.g. from logging_config.ini) are replaced.
+
+    Arguments:
+        path (str): The log file.
+        level (str): The lowest level to write, e.g. 'DEBUG'.
+        max_bytes (int): Rotate the file once it would grow past this size; 0 never rotates it.
+        backup_count (int): The number of rotated files to keep, e.g. parsel_tongue.log.1.
+        fmt (str): The format of each line.
+        processes (bool): Also write the records of (forked) child processes, e.g. the sessions of service_lib, so
+            only this process ever writes to (and rotates) the file.
+    """
+    global HANDLER, LISTENER, _STOP_REGISTERED
+    stop()
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+    handler.setFormatter(logging.Formatter(fmt))
+    records = multiprocessing.get_context('fork').Queue() if processes else queue.SimpleQueue()
+    root = logging.getLogger()
+    for previous in list(root.handlers):
+        root.removeHandler(previous)
+        previous.close()
+    # Records below the level are dropped by the logger itself, before they are queued.
+    root.setLevel(level.upper())
+    with LISTENER_LOCK:
+        HANDLER = logging.handlers.QueueHandler(records)
+        LISTENER = logging.handlers.QueueListener(records, handler)
+        LISTENER.start()
+        root.addHandler(HANDLER)
+        if not _STOP_REGISTERED:
+            atexit.register(stop)
+            _STOP_REGISTERED = True
+    return LISTENER
+
+
+def stop():
+    """Stop queueing records, write those which are queued, then stop the background thread."""
+    global HANDLER, LISTENER
+    with LISTENER_LOCK:
+        if HANDLER:
+            logging.getLogger().removeHandler(HANDLER)
+        listener, HANDLER, LISTENER = LISTENER, None, None
+    if listener:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _update(section: str, option: str, value):
+    """Follow changes to the [logging] settings, e.g. the level, which don't need the file to be re-opened."""
+    global TURNS
+    if option == 'level':
+        logging.getLogger().setLevel(str(value).upper())
+    elif option == 'turns':
+        TURNS = str(value).lower() == 'true'
@@ -0,0 +1,232 @@
+# coding=utf-8
+"""Helpers for matching user responses against menu choices."""
+
+import ast
+import collections
+import os
+import threading
+
+import numpy
+
+import lib
+import nlp_lib
+
+# A lock per menu definition, held while its matcher is being built.
+BUILDING = {}
+# The weight of a word from the text of a choice, relative to one of its keywords (or their synonyms).
+CHOICE_TEXT_WEIGHT = 0.5
+# Compiled matchers, keyed by the menu definition they were built from.
+MATCHERS = {}
+MATCHERS_LOCK = threading.Lock()
+Match = collections.namedtuple('Match', ['choice', 'score', 'confidence'])
+# The longest n-grams of a choice's text to match, e.g. 2 for 'output_file'.
+MAX_NGRAMS = 2
+# Cleared while lib.warm_up loads the shared NLP resources (e.g. WordNet), as loading them isn't thread-safe; matchers
+# aren't built until it's set again.
+RESOURCES_LOADED = threading.Event()
+RESOURCES_LOADED.set()
+# Modules which statically declare menus.
+MENU_MODULES = ['class_lib.py', 'funct_lib.py', 'lib.py', 'python_editor.py', 'var_lib.py']
+
+
+class ChoiceMatcher(object):
+    """A compiled, scoring matcher for a single menu definition.
+
+    The keyword expansion (synonyms + stemming) happens once, when the matcher is built, into a matrix of term weights
+    with a row per choice and a column per term.  The terms of a choice are the stems of its keywords and their
+    synonyms, plus the stems and n-grams of the choice text itself, e.g. 'output_file'.  Terms which are shared by
+    several choices are weighted down, so overlapping vocabulary (e.g. 'change') counts for less than a distinctive
+    word.  Every choice is then scored at once against a response by summing the weights of the terms which were said.
+    A matcher is built for a single language, as the stems (and synonyms) of each language are different.
+    """
+
+    def __init__(self, choices: dict, language=None):
+        """
+        Arguments:
+            choices (dict): Menu options, i.e. {'Create a new function': {'keyword': 'function', ...}}.
+            language (str): The language of the responses, e.g. 'en_US'; the current language by default.
+        """
+        self.language = language or lib.get_language()
+        self.choices = sorted(choices.keys())
+        # Rows are kept in the declared order, so ties go to the first declared choice.
+        self.declared = list(choices.keys())
+        self.stems = {}
+        weights = []
+        for choice, config in choices.items():
+            self.stems[choice] = lib.generate_keywords(get_keywords(config), language=self.language)
+            # Phrases are more specific than single words.
+            terms = {term: 1.0 if nlp_lib.NGRAM_SEPARATOR in term else CHOICE_TEXT_WEIGHT
+                     for term in lib.parse_text(choice, ngrams=MAX_NGRAMS, language=self.language).split()}
+            terms.update((stem, 1.0) for stems in self.stems[choice].values() for stem in stems)
+            weights.append(terms)
+        self.terms = {term: column for column, term in enumerate(sorted(set().union(*weights)))}
+        # N-grams of the response are only worth generating up to the longest phrase which can be matched, including
+        # multi-word synonyms from WordNet (e.g. 'make_up'), which use the same separator.
+        self.ngrams = max([term.count(nlp_lib.NGRAM_SEPARATOR) + 1 for term in self.terms] or [1])
+        self.matrix = numpy.zeros((len(self.declared), len(self.terms)))
+        for row, terms in enumerate(weights):
+            for term, weight in terms.items():
+                self.matrix[row, self.terms[term]] = weight
+        # Smoothed inverse document frequency; a term of every choice still counts, just not as much.
+        frequency = numpy.count_nonzero(self.matrix, axis=0)
+        self.matrix *= numpy.log((1.0 + len(self.declared)) / (1.0 + frequency)) + 1.0
+        # The score of each choice's strongest term, i.e. of naming it by a distinctive keyword.
+        self.best = self.matrix.max(axis=1, initial=0.0)
+
+    def match(self, text: str) -> str:
+        """Get the best choice for the given (raw) user response; an empty string if nothing matches."""
+        ranked = self.rank(text)
+        return ranked[0].choice if ranked else ''
+
+    def rank(self, text: str) -> list:
+        """Rank the choices which match the given (raw) user response, best first.
+
+        Returns:
+            ranked (list): Match tuples of (choice, score, confidence); the confidence is the choice's share of the
+                total score, scaled down when the score is less than that of the choice's strongest term (e.g. only a
+                word shared with other choices was said).  Choices which don't match at all are left out.
+        """
+        scores = self.score(lib.parse_text(text, ngrams=self.ngrams, language=self.language).split())
+        total = scores.sum()
+        if not total:
+            return []
+        ranked = []
+        for row in numpy.argsort(-scores, kind='stable'):
+            if not scores[row]:
+                break
+            strength = min(1.0, scores[row] / self.best[row])
+            ranked.append(Match(self.declared[row], float(scores[row]), float(scores[row] / total * strength)))
+        return ranked
+
+    def score(self, terms: list):
+        """Score every choice against the terms of a response; returns an array in the declared order of the choices."""
+        columns = sorted({self.terms[term] for term in terms if term in self.terms})
+        return self.matrix[:, columns].sum(axis=1)
+
+
+def find_menus(path: str) -> dict:
+    """Find the statically declared menus in a module, without importing it.
+
+    A menu is a dict literal where every value is itself a dict literal with a 'keyword'.
+
+    Arguments:
+        path (str): The path to the module's source.
+
+    Returns:
+        menus (dict): The menus keyed by the function they are declared in, e.g.
+            {'create_menu': {'Create a new function': ['function'], ...}}
+    """
+    with open(path) as rfile:
+        tree = ast.parse(rfile.read(), filename=path)
+    menus = {}
+    for funct in ast.walk(tree):
+        if not isinstance(funct, ast.FunctionDef):
+            continue
+        for node in ast.walk(funct):
+            if isinstance(node, ast.Dict) and node.values and all(_is_option(value) for value in node.values):
+                menus[funct.name] = {ast.literal_eval(key): _option_keywords(value)
+                                     for key, value in zip(node.keys, node.values)}
+    return menus
+
+
+def _is_option(node) -> bool:
+    """Whether an AST node is a dict literal declaring a menu option."""
+    return isinstance(node, ast.Dict) and any(isinstance(key, ast.Constant) and key.value == 'keyword'
+                                              for key in node.keys)
+
+
+def _option_keywords(node: ast.Dict) -> list:
+    """Get the literal keyword(s) of a menu option's AST node."""
+    for key, value in zip(node.keys, node.values):
+        if isinstance(key, ast.Constant) and key.value == 'keyword':
+            return get_keywords({'keyword': ast.literal_eval(value)})
+    return []
+
+
+def get_candidates(ranked: list, margin: float) -> list:
+    """Get the ranked matches which are too close to the best one to tell apart, including the best one itself."""
+    return [match for match in ranked if match.score >= ranked[0].score * (1 - margin)]
+
+
+def get_declared_menus(paths=None) -> dict:
+    """Get the menus statically declared in the given modules, as menu options which can be matched against.
+
+    Returns:
+        menus (dict): The menus keyed by the function they are declared in, e.g.
+            {'create_menu': {'Create a new function': {'keyword': ['function']}, ...}}
+    """
+    menus = {}
+    for path in paths or MENU_MODULES:
+        for name, menu in find_menus(os.path.join(lib.REL_DIR, path)).items():
+            menus[name] = {choice: {'keyword': keywords} for choice, keywords in menu.items()}
+    return menus
+
+
+def get_keywords(config: dict) -> list:
+    """Get the keyword(s) of a menu option as a list."""
+    keywords = config['keyword']
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    return list(keywords)
+
+
+def get_margin(ranked: list) -> float:
+    """Get how far ahead the best match is of the runner-up, relative to its score; 1.0 when it is the only match."""
+    if len(ranked) < 2:
+        return 1.0 if ranked else 0.0
+    return (ranked[0].score - ranked[1].score) / ranked[0].score
+
+
+def get_matcher(choices: dict, language=None) -> ChoiceMatcher:
+    """Get the compiled matcher for the given menu options in a language (the current language by default), building
+    it on first use.
+
+    A matcher which is already being built on another thread (i.e. by lib.warm_up) is waited for, not built again, as
+    are the shared NLP resources while lib.warm_up is loading them.
+    """
+    language = language or lib.get_language()
+    key = (language, menu_key(choices))
+    matcher = MATCHERS.get(key)
+    if matcher:
+        return matcher
+    RESOURCES_LOADED.wait()
+    with MATCHERS_LOCK:
+        lock = BUILDING.setdefault(key, threading.Lock())
+    with lock:
+        matcher = MATCHERS.get(key)
+        if not matcher:
+            lib.LOGGER.debug('Compiling a matcher for: {}.'.format(sorted(choices.keys())))
+            matcher = ChoiceMatcher(choices, language)
+            MATCHERS[key] = matcher
+    return matcher
+
+
+def menu_key(choices: dict) -> tuple:
+    """Get a hashable key for a menu definition; only the choice text and keywords affect matching."""
+    return tuple((choice, tuple(get_keywords(config))) for choice, config in choices.items())
+
+
+def rank_hypotheses(matcher: ChoiceMatcher, hypotheses: list, margin: float) -> tuple:
+    """Re-rank the recognizer's hypotheses (N-best) of what was said against the vocabulary of a menu.
+
+    The recognizer ranks its hypotheses without knowing which words are expected, so a near-miss (e.g. 'crate a new
+    function') is often the best hypothesis while the right words are in one of the alternatives.  The first hypothesis
+    which clearly matches a choice (by the margin) is taken; otherwise the first one which matches anything at all.
+
+    Arguments:
+        matcher (ChoiceMatcher): The active menu's matcher.
+        hypotheses (list): The (raw) hypotheses, best first.
+        margin (float): How far ahead of the runner-up the best choice must be; see get_margin.
+
+    Returns:
+        index (int): The index of the chosen hypothesis.
+        ranked (list): The choices ranked against it; empty if none of the hypotheses match anything.
+    """
+    fallback = (0, [])
+    for index, hypothesis in enumerate(hypotheses):
+        ranked = matcher.rank(hypothesis)
+        if ranked and get_margin(ranked) >= margin:
+            return index, ranked
+        if ranked and not fallback[1]:
+            fallback = (index, ranked)
+    return fallback
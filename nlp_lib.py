@@ -0,0 +1,192 @@
+# coding=utf-8
+"""Natural language processing helpers; normalizing user input into stems (and n-grams of stems), in any language."""
+
+import collections
+import functools
+import itertools
+import logging
+import threading
+
+import nltk
+
+# The NLTK name of each supported language (i.e. with stop words and a Snowball stemmer), by its ISO 639-1 code.
+LANGUAGES = {
+    'ar': 'arabic', 'da': 'danish', 'de': 'german', 'en': 'english', 'es': 'spanish', 'fi': 'finnish', 'fr': 'french',
+    'hu': 'hungarian', 'it': 'italian', 'nb': 'norwegian', 'nl': 'dutch', 'no': 'norwegian', 'pt': 'portuguese',
+    'ro': 'romanian', 'ru': 'russian', 'sv': 'swedish',
+}
+LOGGER = logging.getLogger('parsel_tongue')
+# Joins the stems of an n-gram into a single term, e.g. 'new_function'.
+NGRAM_SEPARATOR = '_'
+# The Open Multilingual Wordnet code of each language which has one; the other languages don't have synonyms.
+WORDNET_LANGUAGES = {
+    'arabic': 'arb', 'danish': 'dan', 'dutch': 'nld', 'english': 'eng', 'finnish': 'fin', 'french': 'fra',
+    'italian': 'ita', 'norwegian': 'nob', 'portuguese': 'por', 'spanish': 'spa', 'swedish': 'swe',
+}
+
+
+class Normalizer(object):
+    """Breaks text into tokens, removes stop words, then simplifies each word down to its stem.
+
+    Stems are memoized, since the same small vocabulary is spoken over and over.  Each utterance is treated as a single
+    sentence, so unlike nltk.word_tokenize there is no sentence splitting (i.e. no Punkt model) involved.
+    """
+
+    def __init__(self, stemmer, stop_words, stem_cache_size=16384):
+        """
+        Arguments:
+            stemmer (nltk.stem.StemmerI): Simplifies words to their stems, e.g. nltk.stem.PorterStemmer.
+            stop_words (iterable): Words which don't really help the context, e.g. 'the'.
+            stem_cache_size (int): The number of stems to memoize.
+        """
+        self.stop_words = frozenset(word.lower().strip() for word in stop_words)
+        self.stem = functools.lru_cache(maxsize=stem_cache_size)(stemmer.stem)
+        self._tokenize = nltk.tokenize.NLTKWordTokenizer().tokenize
+
+    def normalize(self, text: str, ngrams=1) -> list:
+        """Normalize a single utterance.
+
+        Arguments:
+            text (str): The utterance, e.g. 'Create a new function'.
+            ngrams (int): Also include the n-grams of consecutive stems, up to this length.
+
+        Returns:
+            terms (list): The stems, followed by any n-grams, e.g. ['creat', 'new', 'function', 'creat_new', ...].
+        """
+        stems = [self.stem(token) for token in self.tokens(text)]
+        if ngrams > 1:
+            stems.extend(get_ngrams(stems, ngrams))
+        return stems
+
+    def normalize_all(self, texts, ngrams=1):
+        """Normalize a batch (a list or generator) of utterances; yields the terms of each one in order."""
+        for text in texts:
+            yield self.normalize(text, ngrams=ngrams)
+
+    def tokens(self, text: str) -> list:
+        """Break up the text into tokens, without the stop words."""
+        return [token for token in self._tokenize(text) if token.lower() not in self.stop_words]
+
+
+class Pipeline(object):
+    """The NLP resources of a single language; its stop words, stemmer (and a normalizer built from them) and synonyms.
+
+    English keeps the Porter stemmer, so the stems which are already in the word cache stay valid; every other language
+    uses its Snowball stemmer.  Synonyms come from WordNet, via the Open Multilingual Wordnet for languages other than
+    English, which also translates English words (e.g. the menu keywords) into the language.
+    """
+
+    def __init__(self, language: str, stem_cache_size=16384):
+        """
+        Arguments:
+            language (str): The NLTK name of the language, e.g. 'english'; see get_language_name.
+            stem_cache_size (int): The number of stems to memoize.
+        """
+        self.language = language
+        if language == 'english':
+            self.stemmer = nltk.stem.PorterStemmer()
+        else:
+            self.stemmer = nltk.stem.SnowballStemmer(language)
+        self.stop_words = frozenset(word.lower().strip() for word in nltk.corpus.stopwords.words(language))
+        self.normalizer = Normalizer(self.stemmer, self.stop_words, stem_cache_size=stem_cache_size)
+        self.wordnet_language = WORDNET_LANGUAGES.get(language)
+        # Whether it was already logged that WordNet is missing; see synonyms.
+        self._missing_wordnet = False
+
+    def synonyms(self, word: str):
+        """Get the words of the language which are synonymous with a word of the language (or an English word).
+
+        Returns:
+            synonyms (list): The synonyms; None if they can't be looked up right now, as WordNet (or, for languages
+                other than English, omw-1.4) hasn't been downloaded, e.g. with python -m nltk.downloader wordnet
+                omw-1.4.  A language without an Open Multilingual Wordnet has no synonyms at all, i.e. [].
+        """
+        if not self.wordnet_language:
+            return []
+        try:
+            synsets = set(nltk.corpus.wordnet.synsets(word))
+            if self.wordnet_language != 'eng':
+                synsets.update(nltk.corpus.wordnet.synsets(word, lang=self.wordnet_language))
+        except (LookupError, nltk.corpus.reader.wordnet.WordNetError) as error:
+            if not self._missing_wordnet:
+                LOGGER.warning('There are no synonyms in {}: {}'.format(self.language, error))
+                self._missing_wordnet = True
+            return None
+        return sorted(set(itertools.chain.from_iterable(synset.lemma_names(self.wordnet_language)
+                                                        for synset in synsets)))
+
+
+class PipelinePool(object):
+    """A bounded pool of language pipelines; each one is loaded on first use and kept until it is the least recently
+    used of more than size languages.
+
+    Switching back and forth between the languages in the pool never reloads them.  Only one pipeline is loaded at a
+    time, as NLTK's lazy corpus loaders aren't thread-safe, but a loaded pipeline is never waited on.
+    """
+
+    def __init__(self, size=2, factory=Pipeline):
+        """
+        Arguments:
+            size (int): The most languages to keep loaded at once.
+            factory (callable): Loads the pipeline of a language, given its NLTK name.
+        """
+        self.size = max(1, size)
+        self.factory = factory
+        self._loading = threading.Lock()
+        self._lock = threading.Lock()
+        self._pipelines = collections.OrderedDict()
+
+    def __contains__(self, language: str) -> bool:
+        return language in self._pipelines
+
+    def __len__(self):
+        return len(self._pipelines)
+
+    def get(self, language: str) -> Pipeline:
+        """Get the pipeline of a language (by its NLTK name), loading it if it isn't in the pool."""
+        pipeline = self._touch(language)
+        if pipeline is not None:
+            return pipeline
+        with self._loading:
+            pipeline = self._touch(language)
+            if pipeline is not None:
+                return pipeline
+            LOGGER.debug('Loading the {} language pipeline.'.format(language))
+            pipeline = self.factory(language)
+            with self._lock:
+                self._pipelines[language] = pipeline
+                while len(self._pipelines) > self.size:
+                    evicted, _ = self._pipelines.popitem(last=False)
+                    LOGGER.debug('Unloaded the {} language pipeline.'.format(evicted))
+        return pipeline
+
+    def _touch(self, language: str):
+        """Get a pipeline which is already loaded, marking it as the most recently used; None if it isn't loaded."""
+        with self._lock:
+            pipeline = self._pipelines.get(language)
+            if pipeline is not None:
+                self._pipelines.move_to_end(language)
+            return pipeline
+
+
+def get_language_name(language: str) -> str:
+    """Get the NLTK name of a language from its code, e.g. 'en_US', 'en-GB' or 'en' -> 'english'.
+
+    Raises:
+        ValueError: The language isn't supported.
+    """
+    code = language.replace('-', '_').split('_')[0].lower()
+    if language.lower() in LANGUAGES.values():
+        return language.lower()
+    if code not in LANGUAGES:
+        raise ValueError('Unsupported language "{}"; use one of: {}.'.format(language, ', '.join(sorted(LANGUAGES))))
+    return LANGUAGES[code]
+
+
+def get_ngrams(stems: list, max_length: int) -> list:
+    """Get the n-grams of consecutive stems, from bigrams up to max_length, e.g. ['creat_new', 'new_function']."""
+    ngrams = []
+    for length in range(2, max_length + 1):
+        for start in range(len(stems) - length + 1):
+            ngrams.append(NGRAM_SEPARATOR.join(stems[start:start + length]))
+    return ngrams
@@ -2,26 +2,40 @@
 # coding=utf-8
 """Python Editor dynamic menu."""
 
+import argparse
+import atexit
 import sys
 
+import audio_lib
 import class_lib
+import dialogue_lib
+import doc_lib
 import funct_lib
+import journal_lib
 import lib
+import log_lib
+import nlp_lib
+import service_lib
+import trace_lib
+import validate_lib
 import var_lib
 
 # TODO: Easy map (pathway) through the logic...
 # TODO: More Conversational dialogue
 # TODO: Better current status/output in each menu.
 # TODO: status_updates as transient things that get overwritten.
-CONTENTS = []
 HEADER = '''#!/usr/bin/env python
 # coding=utf-8
 
 """This is a placeholder module docstring."""
 
 '''
+DOCUMENT = doc_lib.Document(HEADER)
+# The journal of the session, so it can be resumed after a crash; see start_journal.
+JOURNAL = None
 OUTFILE = './no_name.py'
-SETTINGS = lib.get_settings()
+# The variables (including parameters and attributes) of each scope of the document, e.g. {'add': {'total': ...}}.
+VARIABLES = DOCUMENT.symbols.variables
 
 
 @lib.not_implemented
@@ -38,7 +52,23 @@ def create_menu():
         'Create a new variable': {'action': var_lib.create_variable, 'keyword': 'variable'},
     }
     results = lib.run_menu('Create', menu_opts)
-    CONTENTS.extend(results)
+    for node in results:
+        if node:
+            DOCUMENT.add(node)
+
+
+def change_language():
+    """Change the language which is spoken and listened for; saved to the settings file."""
+    settings = lib.get_settings()
+    choices = {}
+    for language in settings.get('voice', 'language_options', '').split(','):
+        language = language.strip()
+        if language:
+            name = nlp_lib.get_language_name(language)
+            choices['{} ({})'.format(name.title(), language)] = {'keyword': name, 'language': language}
+    choice = lib.get_choice('Which language do you want to use?', choices)
+    settings.set('voice', 'language', choices[choice]['language'])
+    lib.status_update('The language is now {}.'.format(choice))
 
 
 def change_outfile():
@@ -46,32 +76,96 @@ def change_outfile():
     filename = lib.get_user_input('What would you like to name the output file?')
     global OUTFILE
     OUTFILE = filename + '.py'
+    if JOURNAL:
+        JOURNAL.append('set', key='outfile', value=OUTFILE)
+
+
+def choose_object(prompt: str) -> str:
+    """Get the name of an existing object (function/class/variable) in the document, by its spoken name; None if there
+    are none, or it wasn't found.
+
+    The name is looked up in the symbol table (see symbol_lib), so e.g. "get help" finds 'get_help'.  Anything short of
+    a single exact match is confirmed first, closest first.
+    """
+    if not DOCUMENT:
+        lib.status_update('There aren\'t any objects yet.')
+        return None
+    max_retries = lib.get_settings().get_int('logic', 'max_retries', 3)
+    for attempt in range(max_retries + 1):
+        spoken = lib.get_user_input(prompt, choices=DOCUMENT.names(), interpret=False)
+        matches = {}
+        for hypothesis in [spoken] + lib.LAST_ALTERNATIVES:
+            for match in DOCUMENT.symbols.lookup(hypothesis):
+                if match.symbol.name in DOCUMENT and match.distance < matches.get(match.symbol.name, float('inf')):
+                    matches[match.symbol.name] = match.distance
+        ranked = sorted(matches, key=matches.get)
+        exact = [name for name in ranked if not matches[name]]
+        if len(exact) == 1:
+            return exact[0]
+        for name in ranked[:3]:
+            if lib.get_yes_or_no('Did you mean the {} "{}"?'.format(DOCUMENT.get(name).kind, name)):
+                return name
+        lib.status_update('I couldn\'t find an object called "{}".'.format(spoken))
+    return None
 
 
-@lib.not_implemented
 def edit_menu():
-    """Run the 'edit' menu."""
-    pass
+    """Run the 'edit' menu; see the edit_ function of each kind of object."""
+    name = choose_object('Which object do you want to edit?')
+    if not name:
+        return
+    editors = {
+        doc_lib.CLASS: class_lib.edit_class,
+        doc_lib.FUNCTION: funct_lib.edit_function,
+        doc_lib.VARIABLE: var_lib.edit_variable,
+    }
+    editors[DOCUMENT.get(name).kind](DOCUMENT, name)
 
 
-@lib.not_implemented
 def delete_menu():
-    """Run the 'delete' menu."""
-    pass
+    """Run the 'delete' menu; see the delete_ function of each kind of object."""
+    name = choose_object('Which object do you want to delete?')
+    if not name:
+        return
+    deleters = {
+        doc_lib.CLASS: class_lib.delete_class,
+        doc_lib.FUNCTION: funct_lib.delete_function,
+        doc_lib.VARIABLE: var_lib.delete_variable,
+    }
+    deleters[DOCUMENT.get(name).kind](DOCUMENT, name)
 
 
-def save():
-    """Save the current project and its functions/classes/variables, etc."""
+def report_errors() -> dict:
+    """Report the syntax errors in the generated code (once every object has been checked); see validate_lib."""
+    errors = DOCUMENT.errors()
+    for name, error in errors.items():
+        lib.status_update('"{}" has a syntax error: {}.'.format(name, error))
+    return errors
+
+
+def save() -> bool:
+    """Save the current project and its functions/classes/variables, etc.; returns whether the file is up to date."""
+    if report_errors():
+        lib.status_update('Not saving, as the generated code has errors.  Please edit or delete the invalid objects.')
+        return False
     lib.status_update('Saving progress.')
-    with open(OUTFILE, 'w+') as wfile:
-        # TODO: More intelligence here, so we don't overwrite stuff.
-        wfile.writelines(HEADER + '\n'.join(CONTENTS))
+    if not DOCUMENT.save(OUTFILE):
+        lib.status_update('Nothing has changed since the last save.')
+    return True
 
 
 def save_and_exit():
     """Run the 'save and exit' menu."""
-    if lib.get_yes_or_no('Do you want to save before you exit?'):
-        save()
+    # Unsaved work is lost once the journal is discarded, so there's no default answer.
+    if lib.get_yes_or_no('Do you want to save before you exit?', default=None):
+        if report_errors():
+            lib.status_update('Not exiting, so the errors can be fixed first.')
+            return
+        if not save():
+            return
+    # The session is finished, so there is nothing to resume.
+    if JOURNAL:
+        JOURNAL.discard()
     lib.status_update('Good bye.')
     sys.exit(0)
 
@@ -81,27 +175,113 @@ def settings_menu():
     menu_opts = {
         'Change the output file': {'action': change_outfile, 'keyword': 'file'},
         'Change the logging level': {'action': change_log_level, 'keyword': 'log'},
-        'Enable/Disable validation': {'action': toggle_validation, 'keyword': 'validation'},
+        'Change the validation': {'action': change_validation, 'keyword': 'validation'},
+        'Change the language': {'action': change_language, 'keyword': 'language'},
         # TODO: Modify the header.
         # TODO: Modify the imported modules.
         # TODO: Change the voice.
-        # TODO: Change the language.
         # TODO: Toggle on/off always display choices.
     }
-    # TODO: Update the existing settings.ini file with the new setting.
     lib.run_menu('Settings', menu_opts)
 
 
-def toggle_validation():
-    """Enable/Disable validation prompts."""
-    if SETTINGS['logic']['validation'] == 'True':
-        SETTINGS['logic']['validation'] = 'False'
-    else:
-        SETTINGS['logic']['validation'] = 'True'
+def start_journal(resume=True) -> int:
+    """Start journaling the session next to the output file, after resuming the unfinished session there (if any).
+
+    Changes to the document and to the settings are journaled; see journal_lib.
 
+    Arguments:
+        resume (bool): Resume an unfinished session; otherwise its journal is discarded.
 
-def main():
-    """Run the main menu."""
+    Returns:
+        count (int): The number of objects which were resumed.
+    """
+    global JOURNAL, OUTFILE
+    settings = lib.get_settings()
+    JOURNAL = journal_lib.Journal(OUTFILE + '.journal',
+                                  flush_interval=settings.get_float('journal', 'flush_interval', 0.2),
+                                  compact_after=settings.get_int('journal', 'compact_after', 500))
+    if not resume:
+        JOURNAL.discard()
+    state = JOURNAL.open()
+    atexit.register(JOURNAL.close)
+    for node in state['nodes'].values():
+        DOCUMENT.add(doc_lib.Node(node['kind'], node['name'], node['source']))
+    OUTFILE = state['values'].get('outfile', OUTFILE)
+    for section, options in state['settings'].items():
+        for option, value in options.items():
+            if settings.get(section, option) != value:
+                settings.set(section, option, value, persist=False)
+    # Only journal the changes made from now on.
+    DOCUMENT.journal = JOURNAL
+    settings.subscribe(lambda section, option, value: JOURNAL.append('setting', section=section, option=option,
+                                                                     value=value))
+    if state['nodes']:
+        lib.status_update('Resumed {} objects from the last session.'.format(len(state['nodes'])))
+    return len(state['nodes'])
+
+
+def change_validation():
+    """Change when answers are confirmed (always, never or adaptive; see lib.needs_confirmation); saved to the settings
+    file.
+    """
+    choices = {
+        'Always confirm answers': {'keyword': 'always', 'validation': 'True'},
+        'Never confirm answers': {'keyword': 'never', 'validation': 'False'},
+        'Only confirm unclear answers': {'keyword': ['unclear', 'adaptive'], 'validation': 'adaptive'},
+    }
+    choice = lib.get_choice('When do you want answers to be confirmed?', choices)
+    lib.get_settings().set('logic', 'validation', choices[choice]['validation'])
+    lib.status_update('Validation is now: {}.'.format(choice))
+
+
+def _var_exists(function_name: str, var_name: str) -> bool:
+    """Whether a variable (or parameter) exists in the scope of a function (or class)."""
+    return var_name in VARIABLES.get(function_name, {})
+
+
+def main(argv=None):
+    """Run the main menu, or serve sessions of it; see service_lib.
+
+    Arguments:
+        argv (list): Command line arguments; see parse_args.
+    """
+    args = parse_args(argv)
+    settings = lib.get_settings()
+    if args.serve is not None:
+        log_lib.configure(settings, processes=True)
+        service_lib.serve(args.serve)
+        return
+    log_lib.configure(settings)
+    run(args)
+
+
+def run(args: argparse.Namespace):
+    """Run a session of the main menu.
+
+    Arguments:
+        args (argparse.Namespace): The parsed command line arguments; see parse_args.
+    """
+    if args.outfile:
+        global OUTFILE
+        OUTFILE = args.outfile
+    if args.script:
+        lib.set_input_source(audio_lib.TranscriptSource(args.script))
+    settings = lib.get_settings()
+    if args.silent or args.script:
+        settings.set('voice', 'backend', 'null', persist=False)
+    if args.no_clear or args.script:
+        lib.CLEAR_SCREEN = False
+    if (args.engine or settings.get('dialogue', 'engine', 'sync')) == 'async':
+        dialogue_lib.start()
+    if args.trace or settings.get_bool('trace', 'enabled'):
+        trace_lib.configure(path=settings.get('trace', 'path'), summary=settings.get_bool('trace', 'summary', True))
+    if settings.get_bool('codegen', 'check_syntax', True):
+        DOCUMENT.validator = validate_lib.start()
+    if settings.get_bool('journal', 'enabled', True):
+        start_journal(resume=not args.new_session)
+    # Pick up changes made to settings.ini while the editor is running.
+    settings.watch()
     menu_opts = {
         'Create a new object': {'action': create_menu, 'keyword': ['create', 'new']},
         'Edit an object': {'action': edit_menu, 'keyword': 'edit'},
@@ -110,7 +290,33 @@ def main():
         'Save': {'action': save, 'keyword': 'save'},
         'Exit': {'action': save_and_exit, 'keyword': 'exit'},
     }
-    lib.run_menu('Main', menu_opts)
+    # Compile every menu in the background, while the welcome is being spoken.
+    lib.warm_up()
+    lib.status_update('Welcome to Parsel Tongue.  Talk like a human, code like a Python.')
+    try:
+        lib.run_menu('Main', menu_opts)
+    except EOFError:
+        lib.LOGGER.error('The input ended before the session was finished.')
+        lib.status_update('The input ended before the session was finished.')
+        sys.exit(1)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description='Talk like a human, code like a Python.')
+    parser.add_argument('--script', help='Run headless from a transcript file ("-" for stdin) with one utterance per '
+                                         'line, instead of the microphone.  Implies --silent and --no-clear.')
+    parser.add_argument('--silent', action='store_true', help='Don\'t speak; only print.')
+    parser.add_argument('--no-clear', action='store_true', help='Don\'t clear the screen between menus.')
+    parser.add_argument('--outfile', help='The file to save the generated code to.')
+    parser.add_argument('--new-session', action='store_true',
+                        help='Start a new session, instead of resuming the unfinished session of the output file.')
+    parser.add_argument('--engine', choices=['sync', 'async'],
+                        help='How to run the menus; async overlaps listening with speaking.  See [dialogue] engine.')
+    parser.add_argument('--trace', action='store_true', help='Trace the latency of each stage of every turn.')
+    parser.add_argument('--serve', nargs='?', const='', metavar='HOST:PORT',
+                        help='Serve sessions to clients over HTTP, instead of running one here; see [service].')
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,205 @@
+# coding=utf-8
+"""Speech recognition backends, and batch transcription of recorded prompts."""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+
+import speech_recognition
+
+import audio_lib
+import lib
+import match_lib
+
+LOGGER = logging.getLogger('parsel_tongue')
+# The recognizer used by each batch worker process; see _init_worker.
+_WORKER_RECOGNIZER = None
+
+
+class GoogleRecognizer(object):
+    """Google's web speech API; requires a network round-trip per utterance."""
+
+    def __init__(self, language='en-US'):
+        """
+        Arguments:
+            language (str): The language to recognize, e.g. 'en-US'.
+        """
+        self.language = language
+        self.recognizer = speech_recognition.Recognizer()
+
+    def recognize(self, audio: speech_recognition.AudioData) -> audio_lib.Utterance:
+        """Convert the audio to text, along with the confidence in the best transcript and the alternatives (N-best)."""
+        response = self.recognizer.recognize_google(audio, language=self.language, show_all=True)
+        hypotheses = [audio_lib.Utterance(alternative['transcript'], alternative.get('confidence'))
+                      for alternative in (response or {}).get('alternative', []) if alternative.get('transcript')]
+        if not hypotheses:
+            raise speech_recognition.UnknownValueError()
+        return audio_lib.Utterance(hypotheses[0], hypotheses[0].confidence, hypotheses[1:])
+
+
+class SphinxRecognizer(GoogleRecognizer):
+    """CMU Sphinx; runs locally/offline.  Requires the optional pocketsphinx package."""
+
+    def recognize(self, audio: speech_recognition.AudioData) -> str:
+        """Convert the audio to text."""
+        return self.recognizer.recognize_sphinx(audio, language=self.language)
+
+
+class StubRecognizer(object):
+    """A deterministic recognizer for tests; returns a known transcript for each known recording."""
+
+    def __init__(self, transcripts=None, language='en-US'):
+        """
+        Arguments:
+            transcripts (dict): Transcripts keyed by the digest of the audio; see audio_digest.  A transcript can also
+                be a list of hypotheses (N-best), best first.
+            language (str): Unused; for compatibility with the other recognizers.
+        """
+        self.transcripts = transcripts or {}
+        self.language = language
+
+    @classmethod
+    def from_directory(cls, directory: str, **kwargs):
+        """Load the transcript of each WAV file from a text file next to it, e.g. 'create.wav' -> 'create.txt'.
+
+        Each line of a transcript is a hypothesis of what was said, best first.
+        """
+        transcripts = {}
+        for path in _wav_files(directory):
+            text_file = os.path.splitext(path)[0] + '.txt'
+            if os.path.exists(text_file):
+                with open(text_file) as rfile:
+                    transcripts[audio_digest(_read_wav(path))] = rfile.read().strip().splitlines()
+        return cls(transcripts, **kwargs)
+
+    def recognize(self, audio: speech_recognition.AudioData) -> str:
+        """Look up the transcript of the audio."""
+        hypotheses = self.transcripts.get(audio_digest(audio))
+        if isinstance(hypotheses, str):
+            hypotheses = [hypotheses]
+        if not hypotheses:
+            raise speech_recognition.UnknownValueError()
+        if len(hypotheses) > 1:
+            alternatives = [audio_lib.Utterance(text) for text in hypotheses[1:]]
+            return audio_lib.Utterance(hypotheses[0], alternatives=alternatives)
+        return hypotheses[0]
+
+
+RECOGNIZERS = {
+    'google': GoogleRecognizer,
+    'sphinx': SphinxRecognizer,
+    'stub': StubRecognizer,
+}
+
+
+def audio_digest(audio: speech_recognition.AudioData) -> str:
+    """Get a digest which identifies a recording."""
+    return hashlib.sha1(audio.get_raw_data()).hexdigest()
+
+
+def get_recognizer(backend: str, **kwargs):
+    """Create a recognizer.
+
+    Arguments:
+        backend (str): One of RECOGNIZERS, i.e. 'google' or 'sphinx' (offline).
+        kwargs: Passed on to the recognizer, e.g. language='en-US'.
+    """
+    if backend not in RECOGNIZERS:
+        raise ValueError('Unknown recognizer "{}"; use one of: {}.'.format(backend, ', '.join(sorted(RECOGNIZERS))))
+    return RECOGNIZERS[backend](**kwargs)
+
+
+def transcribe_directory(directory: str, output: str, backend='sphinx', menu=None, processes=None, **kwargs) -> int:
+    """Transcribe a directory of recorded WAV prompts through a process pool, into a JSONL file.
+
+    Each line of the output is a record of: the file, the raw text, the interpreted text, and (optionally) the matched
+    menu choice.
+
+    Arguments:
+        directory (str): The directory of WAV files.
+        output (str): The JSONL file to write.
+        backend (str): The recognizer to use; see RECOGNIZERS.
+        menu (dict): Optional menu options to match each transcript against.
+        processes (int): The number of worker processes; by default one per CPU.
+        kwargs: Passed on to the recognizer.
+
+    Returns:
+        count (int): The number of files transcribed.
+    """
+    paths = _wav_files(directory)
+    if backend == 'stub' and 'transcripts' not in kwargs:
+        kwargs['transcripts'] = StubRecognizer.from_directory(directory).transcripts
+    LOGGER.info('Transcribing {} recordings with the "{}" recognizer.'.format(len(paths), backend))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                                initargs=(backend, kwargs)) as executor:
+        records = executor.map(_transcribe_file, paths, [menu] * len(paths), chunksize=8)
+        with open(output, 'w') as wfile:
+            for record in records:
+                wfile.write(json.dumps(record) + '\n')
+    return len(paths)
+
+
+def _init_worker(backend: str, kwargs: dict):
+    """Create the recognizer for a batch worker process; workers never speak."""
+    global _WORKER_RECOGNIZER
+    _WORKER_RECOGNIZER = get_recognizer(backend, **kwargs)
+    lib.get_settings().set('voice', 'backend', 'null', persist=False)
+
+
+def _read_wav(path: str) -> speech_recognition.AudioData:
+    """Read a WAV file."""
+    with speech_recognition.AudioFile(path) as source:
+        return speech_recognition.Recognizer().record(source)
+
+
+def _transcribe_file(path: str, menu=None) -> dict:
+    """Transcribe a single recording with the worker's recognizer."""
+    record = {'file': os.path.basename(path), 'text': '', 'interpreted': '', 'choice': None, 'error': None}
+    hypotheses = []
+    try:
+        text = _WORKER_RECOGNIZER.recognize(_read_wav(path))
+        hypotheses = [text] + getattr(text, 'alternatives', [])
+        record['text'] = str(text)
+    except speech_recognition.UnknownValueError:
+        record['error'] = 'not understood'
+    except speech_recognition.RequestError as error:
+        record['error'] = str(error)
+    except (EOFError, OSError, ValueError) as error:  # e.g. a truncated or unsupported file; the others still count.
+        LOGGER.error('Failed to read "{}": {}.'.format(path, error))
+        record['error'] = 'unreadable: {}'.format(error)
+    if record['text']:
+        record['interpreted'] = lib.interpret_meaning(record['text'])
+        if menu:
+            # Match against the alternatives too, the same as lib.get_choice.
+            _, ranked = match_lib.rank_hypotheses(match_lib.get_matcher(menu), hypotheses, 0)
+            record['choice'] = ranked[0].choice if ranked else None
+    return record
+
+
+def _wav_files(directory: str) -> list:
+    """Get the WAV files in a directory, in order."""
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.wav'))
+
+
+def main():
+    """Transcribe a directory of recorded prompts from the command line."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('directory', help='The directory of WAV files to transcribe.')
+    parser.add_argument('output', help='The JSONL file to write the results to.')
+    parser.add_argument('--backend', default='sphinx', choices=sorted(RECOGNIZERS),
+                        help='The recognizer to use; "stub" reads a .txt transcript next to each WAV file.')
+    parser.add_argument('--menu', choices=sorted(match_lib.get_declared_menus()),
+                        help='A menu to match each transcript against.')
+    parser.add_argument('--processes', type=int, help='The number of worker processes.')
+    args = parser.parse_args()
+    menu = match_lib.get_declared_menus()[args.menu] if args.menu else None
+    count = transcribe_directory(args.directory, args.output, backend=args.backend, menu=menu,
+                                 processes=args.processes)
+    print('Transcribed {} recordings into "{}".'.format(count, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+# coding=utf-8
+"""A local HTTP service which runs many editor sessions at once, for clients which send utterances and get back the
+prompts and the generated code; see serve.
+"""
+
+import http.server
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+import audio_lib
+import lib
+import python_editor
+
+LOGGER = logging.getLogger('parsel_tongue')
+# e.g. /sessions or /sessions/<id>
+PATH = re.compile(r'^/sessions(?:/([0-9a-f]+))?/?$')
+
+
+class ServiceError(Exception):
+    """A request which the service can't serve; status is the HTTP status to respond with."""
+
+    def __init__(self, status: int, message: str):
+        super(ServiceError, self).__init__(message)
+        self.status = status
+
+
+class Session(object):
+    """A session of the editor, which runs in a worker process of its own.
+
+    The editor keeps its state (the document, the output file, the journal, what was last heard, ...) in module
+    globals, so each session is a forked copy of the service; the sessions can't see each other's state, but they all
+    start with the NLP resources which the service loaded (and warmed up) before forking them.
+    """
+
+    def __init__(self, outfile: str, new_session=False, timeout=60):
+        """
+        Arguments:
+            outfile (str): The file to save the generated code to; its journal is resumed, unless new_session.
+            new_session (bool): Start a new session, rather than resuming an unfinished one of the output file.
+            timeout (float): The longest to wait for the session to answer an utterance.
+        """
+        self.id = uuid.uuid4().hex
+        self.outfile = outfile
+        self.timeout = timeout
+        self.finished = False
+        self.last_active = time.monotonic()
+        self.reply = {}
+        self._lock = threading.Lock()
+        context = multiprocessing.get_context('fork')
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_run_session, args=(child_conn, outfile, new_session),
+                                       name='session-{}'.format(self.id[:8]), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def close(self) -> dict:
+        """End the session (its journal is kept, so it can be resumed), and wait for it to exit."""
+        reply = dict(self.reply, session=self.id) if self.finished else self.say(None)
+        self.process.join(self.timeout)
+        return reply
+
+    def say(self, utterance) -> dict:
+        """Send the session an utterance (or None to end it), and wait for its reply; see _SessionSource.
+
+        Arguments:
+            utterance (dict): The text, and optionally the recognizer's confidence and alternatives.
+
+        Returns:
+            reply (dict): The output (prompts and status updates) since the last utterance, the generated code, and
+                whether the session has finished.
+        """
+        with self._lock:
+            if self.finished:
+                raise ServiceError(410, 'The session has finished.')
+            try:
+                self._conn.send(utterance)
+            except OSError:
+                pass  # The session stopped; see _receive.
+            return self._receive()
+
+    def start(self) -> dict:
+        """Wait for the session's first reply, i.e. the welcome and the main menu."""
+        with self._lock:
+            return self._receive()
+
+    def _receive(self) -> dict:
+        """Wait for the session's reply."""
+        self.last_active = time.monotonic()
+        try:
+            if not self._conn.poll(self.timeout):
+                raise ServiceError(504, 'The session didn\'t answer in time.')
+            self.reply = self._conn.recv()
+        except (EOFError, OSError):
+            self.reply = dict(self.reply, finished=True, output='The session stopped unexpectedly.\n')
+        self.finished = self.reply['finished']
+        self.last_active = time.monotonic()
+        return dict(self.reply, session=self.id)
+
+
+class SessionPool(object):
+    """The running sessions, at most max_sessions at once; sessions which are idle for too long are ended."""
+
+    def __init__(self, directory: str, max_sessions=8, idle_timeout=1800, timeout=60):
+        """
+        Arguments:
+            directory (str): Where the sessions save their generated code (and journals).
+            max_sessions (int): The most sessions to run at once.
+            idle_timeout (float): End a session once it hasn't heard anything for this many seconds.
+            timeout (float): The longest to wait for a session to answer an utterance.
+        """
+        self.directory = directory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def close(self, session_id=None) -> dict:
+        """End a session (by default, all of them); see Session.close."""
+        with self._lock:
+            if session_id is None:
+                sessions, self.sessions = list(self.sessions.values()), {}
+            elif session_id in self.sessions:
+                sessions = [self.sessions.pop(session_id)]
+            else:
+                raise ServiceError(404, 'There isn\'t a session "{}".'.format(session_id))
+        replies = [session.close() for session in sessions]
+        return replies[0] if session_id else {}
+
+    def create(self, name='no_name', new_session=False) -> dict:
+        """Start a session, which saves to name.py in the directory; see Session."""
+        outfile = os.path.join(self.directory, '{}.py'.format(re.sub(r'\W', '_', os.path.basename(str(name)))))
+        with self._lock:
+            if len(self.sessions) >= self.max_sessions:
+                raise ServiceError(503, 'There are already {} sessions running.'.format(len(self.sessions)))
+            if any(session.outfile == outfile for session in self.sessions.values()):
+                raise ServiceError(409, 'Another session is already writing "{}".'.format(os.path.basename(outfile)))
+            session = Session(outfile, new_session=new_session, timeout=self.timeout)
+            self.sessions[session.id] = session
+        LOGGER.info('Started the session {} of "{}".'.format(session.id, outfile))
+        return self._finish_if_done(session, session.start())
+
+    def get(self, session_id: str) -> Session:
+        """Get a running session."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ServiceError(404, 'There isn\'t a session "{}".'.format(session_id))
+        return session
+
+    def reap(self):
+        """End the sessions which have been idle for longer than the idle_timeout."""
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_active > self.idle_timeout and not session._lock.locked():
+                LOGGER.info('Ending the idle session {}.'.format(session_id))
+                try:
+                    self.close(session_id)
+                except ServiceError:
+                    pass
+
+    def say(self, session_id: str, utterance: dict) -> dict:
+        """Send a session an utterance; see Session.say."""
+        session = self.get(session_id)
+        return self._finish_if_done(session, session.say(utterance))
+
+    def _finish_if_done(self, session: Session, reply: dict) -> dict:
+        """Forget a session once it has finished, e.g. the user said 'exit'."""
+        if reply['finished']:
+            with self._lock:
+                self.sessions.pop(session.id, None)
+            session.process.join(self.timeout)
+        return reply
+
+
+class _Output(object):
+    """Stands in for stdout in a session's process; collects everything printed until it is sent to the client."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def drain(self) -> str:
+        """Get (and forget) everything printed since the last drain."""
+        text, self._chunks = ''.join(self._chunks), []
+        return text
+
+    def flush(self):
+        """Nothing to flush; the output is sent with each reply."""
+        pass
+
+    def write(self, text: str) -> int:
+        """Collect printed text."""
+        self._chunks.append(text)
+        return len(text)
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the JSON API of a SessionPool.
+
+        POST /sessions {"name": "module", "new_session": false}: Start a session; replies with the main menu.
+        POST /sessions/<id> {"text": "create", "confidence": 0.9, "alternatives": ["crate"]}: Say something.
+        GET /sessions: The ids of the running sessions.
+        GET /sessions/<id>: The last reply of a session.
+        DELETE /sessions/<id>: End a session; its journal is kept, so it can be resumed.
+
+    Every reply is {"session": id, "output": prompts and status updates, "code": the generated code, "finished": bool}.
+    """
+
+    pool = None
+
+    def do_DELETE(self):
+        self._respond(lambda session_id, body: self.pool.close(session_id), session=True)
+
+    def do_GET(self):
+        def get(session_id, body):
+            if not session_id:
+                return {'sessions': sorted(self.pool.sessions)}
+            return dict(self.pool.get(session_id).reply, session=session_id)
+        self._respond(get)
+
+    def do_POST(self):
+        def post(session_id, body):
+            if not session_id:
+                return self.pool.create(body.get('name', 'no_name'), bool(body.get('new_session')))
+            if not isinstance(body.get('text'), str):
+                raise ServiceError(400, 'Say something, e.g. {"text": "create"}.')
+            return self.pool.say(session_id, body)
+        self._respond(post)
+
+    def log_message(self, format, *args):
+        LOGGER.debug('{} - {}'.format(self.address_string(), format % args))
+
+    def _respond(self, handler, session=False):
+        """Parse the request, run the handler and respond with its result (or error) as JSON."""
+        status = 200
+        try:
+            match = PATH.match(self.path)
+            if not match or (session and not match.group(1)):
+                raise ServiceError(404, 'Not found; see {}.'.format(__name__))
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or '{}') if length else {}
+            except ValueError:
+                raise ServiceError(400, 'The request isn\'t valid JSON.')
+            if not isinstance(body, dict):
+                raise ServiceError(400, 'The request should be a JSON object.')
+            result = handler(match.group(1), body)
+            if self.command == 'POST' and not match.group(1):
+                status = 201
+        except ServiceError as error:
+            status, result = error.status, {'error': str(error)}
+        except Exception as error:
+            LOGGER.exception('Failed to serve {} {}.'.format(self.command, self.path))
+            status, result = 500, {'error': str(error)}
+        data = json.dumps(result).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _SessionSource(object):
+    """The input source of a session's process; each utterance comes from the service, which is first sent everything
+    printed since the last one (i.e. the prompt) and the generated code so far.
+    """
+
+    def __init__(self, conn, output: _Output):
+        self.conn = conn
+        self.output = output
+
+    def clear(self):
+        """Nothing is heard while prompts are spoken, so there is nothing to discard."""
+        pass
+
+    def get(self, timeout=None):
+        """Reply to the last utterance, and wait (however long it takes) for the next; None once the session ends."""
+        self.conn.send(_get_reply(self.output, finished=False))
+        try:
+            utterance = self.conn.recv()
+        except EOFError:
+            return None
+        if utterance is None:
+            return None
+        alternatives = [audio_lib.Utterance(text) for text in utterance.get('alternatives') or []]
+        return audio_lib.Utterance(utterance['text'], confidence=utterance.get('confidence'),
+                                   alternatives=alternatives)
+
+
+def create_server(address: tuple, pool: SessionPool) -> http.server.ThreadingHTTPServer:
+    """Create an HTTP server of a pool of sessions; each request is served on a thread of its own."""
+    handler = type('RequestHandler', (_RequestHandler,), {'pool': pool})
+    server = http.server.ThreadingHTTPServer(address, handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(address=''):
+    """Serve editor sessions over HTTP, until interrupted; see _RequestHandler for the API.
+
+    The shared NLP resources (the stop words, stemmer, synonyms and compiled menus) are loaded once, before any session
+    is started, and every session is forked with them already warm.
+
+    Arguments:
+        address (str): 'host:port' to listen on; the [service] host and port by default.
+    """
+    settings = lib.get_settings()
+    host, _, port = address.rpartition(':') if ':' in address else ('', '', address)
+    host = host or settings.get('service', 'host', '127.0.0.1')
+    port = int(port or settings.get_int('service', 'port', 8765))
+    settings.set('voice', 'backend', 'null', persist=False)
+    with lib.profile_stage('warm up'):
+        lib.get_pipeline()
+        lib.warm_up().join()
+    pool = SessionPool(os.path.join(lib.REL_DIR, settings.get('service', 'directory', 'sessions')),
+                       max_sessions=settings.get_int('service', 'max_sessions', 8),
+                       idle_timeout=settings.get_float('service', 'idle_timeout', 1800),
+                       timeout=settings.get_float('service', 'timeout', 60))
+    server = create_server((host, port), pool)
+    reaper = threading.Thread(target=_reap, args=(pool, server), name='reaper', daemon=True)
+    reaper.start()
+    lib.status_update('Serving sessions on http://{}:{}/sessions.'.format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+
+
+def _get_reply(output: _Output, finished: bool) -> dict:
+    """Get a session's reply; the output since the last reply, and the generated code."""
+    return {'output': output.drain(), 'code': python_editor.DOCUMENT.render(), 'finished': finished}
+
+
+def _reap(pool: SessionPool, server: http.server.HTTPServer, interval=60):
+    """End idle sessions, every interval seconds."""
+    while server.socket.fileno() != -1:
+        time.sleep(interval)
+        pool.reap()
+
+
+def _run_session(conn, outfile: str, new_session: bool):
+    """Run a session of the editor in a (forked) worker process; see Session."""
+    output = _Output()
+    sys.stdout = output
+    lib.set_input_source(_SessionSource(conn, output))
+    # A session's settings (e.g. its language) are its own, and are only kept in its journal.
+    lib.get_settings().local = True
+    args = ['--silent', '--no-clear', '--engine', 'sync', '--outfile', outfile]
+    try:
+        python_editor.run(python_editor.parse_args(args + (['--new-session'] if new_session else [])))
+    except SystemExit:
+        pass
+    except Exception:
+        LOGGER.exception('The session of "{}" failed.'.format(outfile))
+        lib.status_update('Sorry, something went wrong; the session can be resumed from its journal.')
+    finally:
+        # A forked process doesn't run the exit handlers, e.g. the one which writes the rest of the journal.
+        if python_editor.JOURNAL:
+            python_editor.JOURNAL.close()
+        try:
+            conn.send(_get_reply(output, finished=True))
+        except (BrokenPipeError, OSError):
+            pass
+        conn.close()
@@ -0,0 +1,245 @@
+# coding=utf-8
+"""The process-wide settings; parsed once, with typed accessors, write-back to settings.ini and change notification."""
+
+import configparser
+import logging
+import os
+import re
+import threading
+
+import file_lib
+
+LOGGER = logging.getLogger('parsel_tongue')
+OPTION_LINE = re.compile(r'\s*([^:=\s#;][^:=]*?)\s*[:=]')
+SECTION_LINE = re.compile(r'\s*\[([^\]]+)\]')
+
+
+class Section(object):
+    """A view of a single section of the settings, e.g. settings['voice']['backend']."""
+
+    def __init__(self, settings, name: str):
+        self.settings = settings
+        self.name = name
+
+    def __getitem__(self, option: str) -> str:
+        value = self.settings.get(self.name, option)
+        if value is None:
+            raise KeyError(option)
+        return value
+
+    def __setitem__(self, option: str, value):
+        """Change the setting for the rest of the process; it isn't written back to the file."""
+        self.settings.set(self.name, option, value, persist=False)
+
+    def get(self, option: str, fallback=None) -> str:
+        """Get a setting as a string."""
+        return self.settings.get(self.name, option, fallback)
+
+
+class Settings(object):
+    """Settings which are parsed once and shared by the whole process.
+
+    Typed values are cached until something changes, so reading a setting is a dictionary lookup.  A change is either
+    written back to the file (atomically, keeping its comments) or only lasts for the rest of the process, e.g. the
+    silent backend of --silent.  Subscribers are notified of every change, including changes made to the file by
+    something else; see watch.
+    """
+
+    def __init__(self, path: str):
+        """
+        Arguments:
+            path (str): The settings file, i.e. settings.ini.
+        """
+        self.path = path
+        # Whether every change only lasts for the rest of the process (e.g. a session of service_lib, whose changes
+        # mustn't leak into the other sessions), rather than being written back to the file.
+        self.local = False
+        self.mtime = None
+        self._cache = {}
+        self._lock = threading.RLock()
+        self._overrides = {}
+        self._parser = configparser.RawConfigParser()
+        self._stopped = threading.Event()
+        self._subscribers = []
+        self._watcher = None
+        self.reload()
+
+    def __getitem__(self, section: str) -> Section:
+        return Section(self, section)
+
+    def get(self, section: str, option: str, fallback=None) -> str:
+        """Get a setting as a string."""
+        return self._typed(section, option, fallback, str)
+
+    def get_bool(self, section: str, option: str, fallback=False) -> bool:
+        """Get a setting as a boolean, e.g. 'True', 'yes' or '1'."""
+        return self._typed(section, option, fallback, _to_bool)
+
+    def get_float(self, section: str, option: str, fallback=None) -> float:
+        """Get a setting as a float."""
+        return self._typed(section, option, fallback, float)
+
+    def get_int(self, section: str, option: str, fallback=None) -> int:
+        """Get a setting as an integer."""
+        return self._typed(section, option, fallback, int)
+
+    def reload(self) -> list:
+        """Re-read the file if it was modified since it was last read, and notify the subscribers of any changes.
+
+        Returns:
+            changes (list): The changed settings, as (section, option, value) tuples; the value is None if removed.
+        """
+        mtime = os.stat(self.path).st_mtime_ns if os.path.exists(self.path) else None
+        with self._lock:
+            if mtime is not None and mtime == self.mtime:
+                return []
+            parser = configparser.RawConfigParser()
+            parser.read(self.path)
+            before, after = _flatten(self._parser), _flatten(parser)
+            changes = [(section, option, after.get((section, option)))
+                       for section, option in sorted(set(before) | set(after))
+                       if before.get((section, option)) != after.get((section, option))]
+            self._parser = parser
+            self.mtime = mtime
+            self._cache = {}
+        if changes and before:
+            LOGGER.info('"{}" was changed: {}.'.format(self.path, ', '.join(
+                '[{}] {}'.format(section, option) for section, option, _ in changes)))
+            self._notify(changes)
+        return changes
+
+    def set(self, section: str, option: str, value, persist=True):
+        """Change a setting, and notify the subscribers.
+
+        Arguments:
+            section (str): The section, e.g. 'logic'.
+            option (str): The option, e.g. 'validation'.
+            value: The new value; it is stored as a string.
+            persist (bool): Write it back to the file; otherwise (or if the settings are local) the change only lasts
+                for the rest of the process.
+        """
+        value = str(value)
+        with self._lock:
+            if persist and not self.local:
+                self._overrides.pop((section, option), None)
+                if not self._parser.has_section(section):
+                    self._parser.add_section(section)
+                self._parser.set(section, option, value)
+                self._write_back(section, option, value)
+            else:
+                self._overrides[(section, option)] = value
+            self._cache = {}
+        self._notify([(section, option, value)])
+
+    def stop(self):
+        """Stop watching the file for changes."""
+        self._stopped.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
+
+    def subscribe(self, callback, section=None):
+        """Call callback(section, option, value) whenever a setting changes.
+
+        Arguments:
+            callback (callable): Called with each change; from the watcher thread if the file was changed externally.
+            section (str): Only notify of changes to this section.
+        """
+        with self._lock:
+            self._subscribers.append((section, callback))
+
+    def watch(self, interval=2.0):
+        """Poll the file for changes made by something else (e.g. an editor), on a background thread.  Local settings
+        aren't watched, so a session isn't changed under it.
+
+        Arguments:
+            interval (float): Seconds between checks of the file's modification time.
+        """
+        if self._watcher or self.local:
+            return
+        self._stopped.clear()
+        self._watcher = threading.Thread(target=self._poll, args=(interval,), name='settings', daemon=True)
+        self._watcher.start()
+
+    def _notify(self, changes: list):
+        """Notify the subscribers of changes."""
+        for section_filter, callback in list(self._subscribers):
+            for section, option, value in changes:
+                if section_filter in (None, section):
+                    try:
+                        callback(section, option, value)
+                    except Exception as error:  # One broken subscriber shouldn't stop the others.
+                        LOGGER.error('Failed to notify {} of a settings change: {}.'.format(callback, error))
+
+    def _poll(self, interval: float):
+        """Reload the file whenever it is modified, until stopped."""
+        while not self._stopped.wait(interval):
+            try:
+                self.reload()
+            except (configparser.Error, OSError) as error:
+                LOGGER.error('Failed to reload "{}": {}.'.format(self.path, error))
+
+    def _typed(self, section: str, option: str, fallback, convert):
+        """Get a setting converted to a type, from the cache if it hasn't changed since it was last read."""
+        key = (section, option, fallback, convert)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with self._lock:
+            value = self._overrides.get((section, option))
+            if value is None:
+                value = self._parser.get(section, option, fallback=None)
+            # A blank value is only meaningful as a string, e.g. no wake word.
+            if value is None or (not value and convert is not str):
+                value = fallback
+            else:
+                value = convert(value)
+            self._cache[key] = value
+        return value
+
+    def _write_back(self, section: str, option: str, value: str):
+        """Write a setting to the file, in place; everything else (e.g. the comments) is left as it is."""
+        lines = []
+        if os.path.exists(self.path):
+            with open(self.path) as rfile:
+                lines = rfile.read().splitlines()
+        setting = '{}: {}'.format(option, value)
+        current = insert_at = replaced = None
+        for index, line in enumerate(lines):
+            header = SECTION_LINE.match(line)
+            if header:
+                if current == section:
+                    break
+                current = header.group(1).strip()
+                if current == section:
+                    insert_at = index + 1
+                continue
+            name = OPTION_LINE.match(line)
+            if current == section and name:
+                if name.group(1).lower() == option.lower():
+                    lines[index] = setting
+                    replaced = True
+                    break
+                insert_at = index + 1
+        if insert_at is None:
+            lines.extend(['', '[{}]'.format(section)])
+            insert_at = len(lines)
+        if not replaced:
+            lines.insert(insert_at, setting)
+        with file_lib.atomic_write(self.path) as wfile:
+            wfile.write('\n'.join(lines) + '\n')
+        self.mtime = os.stat(self.path).st_mtime_ns
+        LOGGER.debug('Saved [{}] {} to "{}".'.format(section, option, self.path))
+
+
+def _flatten(parser: configparser.RawConfigParser) -> dict:
+    """Get every setting of a parser, keyed by (section, option)."""
+    return {(section, option): value for section in parser.sections() for option, value in parser.items(section)}
+
+
+def _to_bool(value: str) -> bool:
+    """Convert a setting to a boolean the same way configparser does."""
+    if value.lower() not in configparser.RawConfigParser.BOOLEAN_STATES:
+        raise ValueError('Not a boolean: "{}".'.format(value))
+    return configparser.RawConfigParser.BOOLEAN_STATES[value.lower()]
@@ -0,0 +1,322 @@
+# coding=utf-8
+"""A scoped symbol table of the generated code, with a fuzzy index for looking up symbols by their spoken names."""
+
+import ast
+import collections
+import keyword
+import logging
+import re
+
+ATTRIBUTE = 'attribute'
+# The kinds of symbols; classes, functions and variables are the same as doc_lib's kinds of nodes.
+CLASS = 'class'
+FUNCTION = 'function'
+# Splits an identifier into words, e.g. 'getHTTPResponse_code' -> 'get', 'HTTP', 'Response', 'code'.
+IDENTIFIER_WORDS = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+LOGGER = logging.getLogger('parsel_tongue')
+Match = collections.namedtuple('Match', ['symbol', 'distance'])
+METHOD = 'method'
+# The module's own scope.
+MODULE = ''
+PARAMETER = 'parameter'
+# Letters which sound alike share a code, as in Soundex; vowels (and h, w and y) aren't coded.
+PHONETIC_CODES = {letter: str(code) for code, letters in enumerate(['bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r'], 1)
+                  for letter in letters}
+# Spellings which sound like another, e.g. 'phone' -> 'fone'.
+PHONETIC_SPELLINGS = [(re.compile(pattern), replacement) for pattern, replacement in [
+    (r'ph', 'f'), (r'gh', ''), (r'^kn', 'n'), (r'^wr', 'r'), (r'ck', 'k'), (r'c(?=[eiy])', 's'), (r'x', 'ks')]]
+Symbol = collections.namedtuple('Symbol', ['name', 'kind', 'scope', 'parameters'])
+VARIABLE = 'variable'
+# Kinds of symbols which are variables of their scope.
+VARIABLE_KINDS = (VARIABLE, PARAMETER, ATTRIBUTE)
+
+
+class Trie(object):
+    """A prefix tree of keys, each with a set of values; supports exact and fuzzy (edit distance) searches."""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, key: str, value):
+        """Add a value under a key."""
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(None, set()).add(value)
+
+    def get(self, key: str) -> set:
+        """Get the values under a key."""
+        node = self.root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return set(node.get(None, ()))
+
+    def remove(self, key: str, value):
+        """Remove a value from under a key; branches which are left empty are pruned."""
+        path = [self.root]
+        for char in key:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].get(None, set()).discard(value)
+        if not path[-1].get(None, True):
+            del path[-1][None]
+        for index in range(len(key), 0, -1):
+            if path[index]:
+                break
+            del path[index - 1][key[index - 1]]
+
+    def search(self, key: str, max_distance: int) -> list:
+        """Find the keys within an edit (Levenshtein) distance of a key.
+
+        Each branch of the tree is followed only while it can still be within the distance, so only a small part of
+        a large tree is visited.
+
+        Returns:
+            matches (list): (distance, value) tuples, closest first.
+        """
+        matches = []
+        first_row = list(range(len(key) + 1))
+        stack = [(child, char, first_row) for char, child in self.root.items() if char is not None]
+        while stack:
+            node, char, previous = stack.pop()
+            row = [previous[0] + 1]
+            for column in range(1, len(key) + 1):
+                row.append(min(row[column - 1] + 1, previous[column] + 1,
+                               previous[column - 1] + (key[column - 1] != char)))
+            if row[-1] <= max_distance and None in node:
+                matches.extend((row[-1], value) for value in node[None])
+            if min(row) <= max_distance:
+                stack.extend((child, next_char, row) for next_char, child in node.items() if next_char is not None)
+        return sorted(matches, key=lambda match: match[0])
+
+
+class SymbolTable(object):
+    """The symbols defined by the generated code (functions, classes, variables, and their parameters, methods and
+    attributes), in nested scopes, e.g. the parameters of 'add' are in the 'add' scope.
+
+    Every symbol is indexed by its spoken form (e.g. 'get help' for 'get_help') in a trie, and by how it sounds, so a
+    spoken name is found without scanning every symbol, even if it was misheard a little; see lookup.
+    """
+
+    def __init__(self):
+        self.scopes = collections.defaultdict(collections.OrderedDict)
+        # The variables (including parameters and attributes) of each scope, e.g. {'add': {'count': Symbol(...)}}.
+        self.variables = collections.defaultdict(dict)
+        # The symbols which each document node defines, as (scope, name).
+        self._nodes = {}
+        self._phonetic = collections.defaultdict(set)
+        self._trie = Trie()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.scopes.get(MODULE, ())
+
+    def __len__(self):
+        return sum(len(symbols) for symbols in self.scopes.values())
+
+    def add(self, symbol: Symbol):
+        """Add a symbol, replacing any symbol of the same name in its scope."""
+        self.remove(symbol.name, symbol.scope, nested=False)
+        self.scopes[symbol.scope][symbol.name] = symbol
+        if symbol.kind in VARIABLE_KINDS:
+            self.variables[symbol.scope][symbol.name] = symbol
+        self._trie.add(spoken_key(symbol.name), (symbol.scope, symbol.name))
+        self._phonetic[phonetic_key(symbol.name)].add((symbol.scope, symbol.name))
+
+    def add_node(self, node):
+        """Add the symbols defined by a document node (replacing those of a node of the same name)."""
+        self.remove_node(node.name)
+        symbols = get_symbols(node)
+        for symbol in symbols:
+            self.add(symbol)
+        self._nodes[node.name] = [(symbol.scope, symbol.name) for symbol in symbols]
+
+    def get(self, name: str, scope=MODULE) -> Symbol:
+        """Get a symbol by name; None if it isn't defined in the scope."""
+        return self.scopes.get(scope, {}).get(name)
+
+    def lookup(self, spoken: str, scope=MODULE, kinds=None, limit=5) -> list:
+        """Find the symbols which a spoken name refers to, e.g. 'get help' -> 'get_help', best first.
+
+        Exact matches come first (distance 0), then names which sound the same (e.g. 'right' for 'write'; distance
+        0.5), then names which are spelled a little differently (e.g. 'get helps'; distance 1 or more).
+
+        Arguments:
+            spoken (str): The name as it was heard.
+            scope (str): Only symbols which are visible from this scope (i.e. in it, or in an enclosing scope).
+            kinds (list): Only symbols of these kinds, e.g. [FUNCTION].
+            limit (int): The most matches to return.
+
+        Returns:
+            matches (list): Match tuples of (symbol, distance).
+        """
+        key = spoken_key(spoken)
+        if not key:
+            return []
+        visible = set(get_enclosing_scopes(scope))
+        candidates = [(0, entry) for entry in self._trie.get(key)]
+        candidates += [(0.5, entry) for entry in self._phonetic.get(phonetic_key(spoken), ())]
+        # The longer the name, the more of it may have been misheard.
+        candidates += self._trie.search(key, max_distance=1 + len(key) // 6)
+        matches, seen = [], set()
+        for distance, (symbol_scope, name) in sorted(candidates, key=lambda candidate: candidate[0]):
+            symbol = self.get(name, symbol_scope)
+            if (symbol_scope, name) in seen or symbol_scope not in visible or (kinds and symbol.kind not in kinds):
+                continue
+            seen.add((symbol_scope, name))
+            matches.append(Match(symbol, distance))
+            if len(matches) == limit:
+                break
+        return matches
+
+    def remove(self, name: str, scope=MODULE, nested=True):
+        """Remove a symbol, and (optionally) the symbols of its own scope(s), e.g. a function's parameters."""
+        symbol = self.scopes.get(scope, {}).pop(name, None)
+        if symbol is None:
+            return
+        self.variables.get(scope, {}).pop(name, None)
+        self._trie.remove(spoken_key(name), (scope, name))
+        self._phonetic[phonetic_key(name)].discard((scope, name))
+        if nested:
+            prefix = get_nested_scope(scope, name)
+            for nested_scope in [key for key in self.scopes if key == prefix or key.startswith(prefix + '.')]:
+                for nested_name in list(self.scopes[nested_scope]):
+                    self.remove(nested_name, nested_scope, nested=False)
+                del self.scopes[nested_scope]
+                self.variables.pop(nested_scope, None)
+
+    def remove_node(self, name: str):
+        """Remove the symbols defined by a document node."""
+        for scope, symbol_name in self._nodes.pop(name, ()):
+            self.remove(symbol_name, scope)
+
+
+def get_enclosing_scopes(scope: str) -> list:
+    """Get a scope and those which enclose it, innermost first, e.g. 'Thing.get' -> ['Thing.get', 'Thing', '']."""
+    scopes = [scope]
+    while scope:
+        scope = scope.rpartition('.')[0]
+        scopes.append(scope)
+    return scopes
+
+
+def get_nested_scope(scope: str, name: str) -> str:
+    """Get the scope of the symbols defined inside of a symbol, e.g. ('Thing', 'get') -> 'Thing.get'."""
+    return '{}.{}'.format(scope, name) if scope else name
+
+
+def get_symbols(node) -> list:
+    """Get the symbols which a document node defines, from its source.
+
+    A node whose source doesn't parse (see validate_lib) only defines its own name.
+    """
+    try:
+        tree = ast.parse(node.source)
+    except (SyntaxError, ValueError):
+        LOGGER.debug('Only indexing the name of {!r}, as its source doesn\'t parse.'.format(node))
+        return [Symbol(node.name, node.kind, MODULE, ())]
+    symbols = []
+    for statement in tree.body:
+        symbols.extend(_get_statement_symbols(statement, MODULE))
+    return symbols or [Symbol(node.name, node.kind, MODULE, ())]
+
+
+def phonetic_key(text: str) -> str:
+    """Get a code for how a name sounds, e.g. 'write_file' and 'right file' are both '631234'."""
+    codes = []
+    for word in get_words(text):
+        for pattern, replacement in PHONETIC_SPELLINGS:
+            word = pattern.sub(replacement, word)
+        previous = None
+        for char in word:
+            code = PHONETIC_CODES.get(char, char if char.isdigit() else None)
+            if code and code != previous:
+                codes.append(code)
+            previous = code
+    return ''.join(codes)
+
+
+def get_words(text: str) -> list:
+    """Get the lower case words of a name, whether it is spoken or an identifier, e.g. 'getHelp' -> ['get', 'help']."""
+    return [word.lower() for word in IDENTIFIER_WORDS.findall(text)]
+
+
+def get_identifier(text: str, kind=VARIABLE) -> str:
+    """Get the identifier for a (spoken) name, e.g. 'get help' -> 'get_help', or 'GetHelp' for a class.
+
+    Raises:
+        ValueError: If the name can't be made into an identifier, e.g. it's a keyword.
+    """
+    words = get_words(text)
+    name = ''.join(word.capitalize() for word in words) if kind == CLASS else '_'.join(words)
+    if not name.isidentifier() or keyword.iskeyword(name):
+        raise ValueError('"{}" can\'t be used as a name.'.format(text))
+    return name
+
+
+def rename(node, name: str):
+    """Get a copy of a document node with the object it defines renamed; only its definition is renamed, e.g. the 'def'
+    line of a function, not any references to it.  The new name may be spoken, e.g. 'get help'; see get_identifier.
+    """
+    name = get_identifier(name, node.kind)
+    lines = node.source.splitlines(True)
+    pattern = re.compile(r'\b{}\b'.format(re.escape(node.name)))
+    try:
+        definitions = [statement.lineno for statement in ast.parse(node.source).body
+                       if node.name in [symbol.name for symbol in _get_statement_symbols(statement, MODULE)]]
+    except (SyntaxError, ValueError):
+        definitions = []
+    # Without a parsed definition, the first mention of the name is taken as it.
+    index = definitions[0] - 1 if definitions else next(
+        (index for index, line in enumerate(lines) if pattern.search(line)), None)
+    if index is not None:
+        lines[index] = pattern.sub(lambda _: name, lines[index], count=1)
+    return type(node)(node.kind, name, ''.join(lines))
+
+
+def spoken_key(text: str) -> str:
+    """Get the key of a name which is the same whether it is spoken or an identifier, e.g. 'Get help' -> 'gethelp'."""
+    return ''.join(get_words(text))
+
+
+def _get_parameters(function: ast.FunctionDef) -> tuple:
+    """Get the names of the parameters of a function, without self/cls."""
+    arguments = function.args
+    names = [arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs]
+    names += [arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg]
+    return tuple(name for name in names if name not in ('self', 'cls'))
+
+
+def _get_statement_symbols(statement, scope: str) -> list:
+    """Get the symbols which a statement defines in a scope, including those nested inside of it."""
+    symbols = []
+    if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        parameters = _get_parameters(statement)
+        kind = METHOD if scope else FUNCTION
+        symbols.append(Symbol(statement.name, kind, scope, parameters))
+        nested = get_nested_scope(scope, statement.name)
+        symbols.extend(Symbol(name, PARAMETER, nested, ()) for name in parameters)
+        for child in statement.body:
+            symbols.extend(_get_statement_symbols(child, nested))
+            # Instance attributes, e.g. 'self.name = name' in a method.
+            if scope and isinstance(child, ast.Assign):
+                symbols.extend(Symbol(target.attr, ATTRIBUTE, scope, ()) for target in child.targets
+                               if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and
+                               target.value.id == 'self')
+    elif isinstance(statement, ast.ClassDef):
+        symbols.append(Symbol(statement.name, CLASS, scope, ()))
+        for child in statement.body:
+            symbols.extend(_get_statement_symbols(child, get_nested_scope(scope, statement.name)))
+    elif isinstance(statement, (ast.Assign, ast.AnnAssign)):
+        targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+        kind = VARIABLE if not scope or _is_function_scope(scope) else ATTRIBUTE
+        symbols.extend(Symbol(target.id, kind, scope, ()) for target in targets if isinstance(target, ast.Name))
+    return symbols
+
+
+def _is_function_scope(scope: str) -> bool:
+    """Whether a (non-module) scope is a function's own; the scopes of classes are capitalized by convention."""
+    return not scope.rpartition('.')[2][:1].isupper()
@@ -0,0 +1,105 @@
+# coding=utf-8
+"""Unit tests for audio_lib."""
+
+import io
+import wave
+
+import pytest
+
+import audio_lib
+import vad_lib
+
+
+def write_wav(path, seconds=0.2, rate=16000):
+    """Write a silent, mono, 16-bit WAV file."""
+    with wave.open(str(path), 'wb') as wfile:
+        wfile.setnchannels(1)
+        wfile.setsampwidth(2)
+        wfile.setframerate(rate)
+        wfile.writeframes(b'\x00\x00' * int(seconds * rate))
+    return str(path)
+
+
+@pytest.fixture
+def recordings(tmpdir):
+    """A directory of recorded utterances."""
+    for index in range(3):
+        write_wav(tmpdir.join('{}.wav'.format(index)))
+    return str(tmpdir)
+
+
+def listen(recordings, texts, **kwargs):
+    """Play back the recordings through a listener, transcribing them as the given texts."""
+    texts = iter(texts)
+    listener = audio_lib.Listener(audio_lib.WavFileSource(recordings), recognize=lambda audio: next(texts), **kwargs)
+    listener.start()
+    results = []
+    while True:
+        utterance = listener.get(timeout=5)
+        if utterance is None:
+            break
+        results.append(utterance)
+    listener.stop()
+    return results
+
+
+def test_listener(recordings):
+    """Every recording is queued as an utterance, in order."""
+    assert listen(recordings, ['create', 'a new', 'function']) == ['create', 'a new', 'function']
+
+
+def test_listener_wake_word(recordings):
+    """Only what is said after the wake word is queued."""
+    assert listen(recordings, ['python create', 'ignored', 'something'], wake_word='python') == ['create']
+    assert listen(recordings, ['ignored', 'python', 'something'], wake_word='python') == ['something']
+
+
+def test_listener_confidence(recordings):
+    """The recognizer's confidence is kept with each utterance, even when the wake word is stripped off."""
+    texts = [audio_lib.Utterance('python create', 0.9), 'ignored', audio_lib.Utterance('new', 0.4)]
+    results = listen(recordings, texts, wake_word='python')
+    assert results == ['create']
+    assert results[0].confidence == 0.9
+
+
+def test_listener_front_end(recordings):
+    """Recordings without any speech are dropped by the front end, rather than being recognized."""
+    assert listen(recordings, [], front_end=vad_lib.VoiceFrontEnd()) == []
+
+
+def test_listener_alternatives(recordings):
+    """The recognizer's alternatives are kept, and the wake word is stripped off of them too."""
+    texts = [audio_lib.Utterance('python crate', 0.6, [audio_lib.Utterance('python create'), 'create']), 'x', 'y']
+    results = listen(recordings, texts, wake_word='python')
+    assert results == ['crate']
+    assert results[0].alternatives == ['create', 'create']
+
+
+def test_listener_failures(recordings, monkeypatch):
+    """A phrase which fails to be recognized is heard as nothing, and a failing source still ends the utterances."""
+    def recognize(audio, texts=iter(['create', None, 'function'])):
+        text = next(texts)
+        if text is None:
+            raise ValueError('Bad audio.')
+        return text
+
+    listener = audio_lib.Listener(audio_lib.WavFileSource(recordings), recognize=recognize)
+    listener.start()
+    assert [listener.get(timeout=5) for _ in range(4)] == ['create', '', 'function', None]
+    assert not listener.transcribing
+    listener.stop()
+    source = audio_lib.WavFileSource(recordings)
+    monkeypatch.setattr(source, 'capture', lambda: 1 / 0)
+    listener = audio_lib.Listener(source, recognize=str)
+    listener.start()
+    assert listener.get(timeout=5) is None
+    listener.stop()
+
+
+def test_transcript_alternatives():
+    """A transcript line can list alternative hypotheses after the best one."""
+    source = audio_lib.TranscriptSource(io.StringIO('crate a function | create a function\nsave\n'))
+    first = source.get()
+    assert first == 'crate a function'
+    assert first.alternatives == ['create a function']
+    assert not hasattr(source.get(), 'alternatives')
@@ -0,0 +1,71 @@
+# coding=utf-8
+"""Unit tests for cache_lib."""
+
+import sqlite3
+
+import pytest
+
+import cache_lib
+
+
+@pytest.fixture
+def cache(tmpdir):
+    """An empty word cache."""
+    word_cache = cache_lib.WordCache(str(tmpdir.join('words.sqlite')), max_entries=2)
+    yield word_cache
+    word_cache.close()
+
+
+def test_get_put(cache):
+    """Entries are keyed by kind, language and word, and persist across instances."""
+    assert cache.get('synonyms', 'en_US', 'yes') is None
+    cache.put('synonyms', 'en_US', 'yes', ['yes', 'yeah'])
+    assert cache.get('synonyms', 'en_US', 'yes') == ['yes', 'yeah']
+    assert cache.get('synonyms', 'es_ES', 'yes') is None
+    reopened = cache_lib.WordCache(cache.path)
+    assert reopened.get('synonyms', 'en_US', 'yes') == ['yes', 'yeah']
+    reopened.close()
+
+
+def test_evict(cache):
+    """The least recently used entries are evicted once max_entries is exceeded."""
+    for word in ['a', 'b', 'c']:
+        cache.put('stems', 'en_US', word, [word])
+    assert len(cache) == 2
+    assert cache.get('stems', 'en_US', 'a') is None
+    assert cache.get('stems', 'en_US', 'c') == ['c']
+
+
+def test_accessed_batched(cache):
+    """Reads don't write to the database; when entries were last used is written with the next put."""
+    for word in ['a', 'b']:
+        cache.put('stems', 'en_US', word, [word])
+    reader = cache_lib.WordCache(cache.path, max_entries=2)
+    changes = reader._conn.total_changes
+    assert reader.get('stems', 'en_US', 'a') == ['a']
+    assert reader._conn.total_changes == changes
+    reader.put('stems', 'en_US', 'c', ['c'])
+    reader.close()
+    reopened = cache_lib.WordCache(cache.path)
+    assert reopened.get('stems', 'en_US', 'b') is None
+    assert reopened.get('stems', 'en_US', 'a') == ['a']
+    reopened.close()
+
+
+def test_find_keywords():
+    """Keywords are found in all statically declared menus."""
+    keywords = cache_lib.find_keywords()
+    assert {'yes', 'no', 'function', 'validation', 'dictionary', 'delete'} <= keywords
+
+
+def test_reset_cache(cache, monkeypatch):
+    """Resetting the cache writes when entries were last used, and closes it."""
+    cache.put('stems', 'en_US', 'a', ['a'])
+    reader = cache_lib.WordCache(cache.path)
+    assert reader.get('stems', 'en_US', 'a') == ['a']
+    monkeypatch.setattr(cache_lib, 'CACHE', reader)
+    cache_lib.reset_cache()
+    assert cache_lib.CACHE is None
+    assert not reader._accessed
+    with pytest.raises(sqlite3.ProgrammingError):
+        reader._conn.execute('SELECT 1')
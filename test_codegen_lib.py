@@ -0,0 +1,38 @@
+# coding=utf-8
+"""Unit tests for codegen_lib."""
+
+import json
+
+import codegen_lib
+
+
+def test_function_spec():
+    """Test rendering a function; logic lines are indented, and an empty body is a 'pass'."""
+    spec = codegen_lib.FunctionSpec('add', ['a', 'b=1'], 'Add numbers.', ['total = a + b', 'return total'])
+    assert spec.render() == ('\ndef add(a, b=1):\n    """Add numbers."""\n    total = a + b\n    return total\n    ')
+    assert 'pass' in codegen_lib.FunctionSpec('noop').render()
+
+
+def test_render_module(tmpdir):
+    """Specs are streamed from a JSONL file into a module in a single pass."""
+    specs = tmpdir.join('specs.jsonl')
+    with open(str(specs), 'w') as wfile:
+        for index in range(1000):
+            wfile.write(json.dumps({'kind': 'variable', 'name': 'var_{}'.format(index), 'value': index,
+                                    'type': 'int'}) + '\n')
+        wfile.write(json.dumps({'kind': 'function', 'name': 'get_help', 'logic_lines': ['return None']}) + '\n')
+    output = str(tmpdir.join('module.py'))
+    assert codegen_lib.render_module(codegen_lib.load_specs(str(specs)), output, header='"""Docstring."""\n\n') == 1001
+    with open(output) as rfile:
+        source = rfile.read()
+    assert source.startswith('"""Docstring."""\n\nvar_0 = 0  # type: int\nvar_1 = 1  # type: int\n')
+    assert 'def get_help():' in source
+
+
+def test_class_spec():
+    """A class (with its methods) renders as valid Python."""
+    spec = codegen_lib.ClassSpec('Thing', description='A thing.', inst_attrs=['name'],
+                                 methods=[{'name': 'describe', 'logic_lines': ['return self.name']}])
+    source = spec.render()
+    assert 'class Thing(object):' in source
+    compile(source, 'thing.py', 'exec')
@@ -0,0 +1,89 @@
+# coding=utf-8
+"""Unit tests for dialogue_lib."""
+
+import io
+import sys
+import threading
+
+import pytest
+
+import audio_lib
+import dialogue_lib
+import lib
+import settings_lib
+import voice_lib
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """A running dialogue engine, with scripted input and no speech or confirmations."""
+    monkeypatch.setattr(lib, '_SPEAKER', lib.Lazy('speaker', lambda: voice_lib.Speaker(voice_lib.NullBackend())))
+    monkeypatch.setattr(lib, '_YES_NO', lib.Lazy('yes/no vocabulary', lambda: {'yes': {'yes'}, 'no': {'no'}}))
+    monkeypatch.setattr(lib, 'get_choice', lambda prompt, choices: lib.get_user_input(prompt, interpret=False))
+    monkeypatch.setattr(lib, 'CLEAR_SCREEN', False)
+    yield dialogue_lib.start()
+    dialogue_lib.stop()
+    lib.set_input_source(None)
+
+
+def script(transcript):
+    """Script the user's input."""
+    lib.set_input_source(audio_lib.TranscriptSource(io.StringIO(transcript)))
+
+
+def test_run_menu(engine):
+    """Menus run on the engine's loop, actions run in worker threads and sub-menus nest through the loop."""
+    threads = []
+
+    def sub_menu():
+        threads.append(threading.current_thread())
+        return lib.run_menu('Sub', {'inner': {'action': lambda: 'inner result', 'keyword': 'inner'}})
+
+    script('outer\ninner\nno\nno\n')
+    results = lib.run_menu('Main', {'outer': {'action': sub_menu, 'keyword': 'outer'}})
+    assert results == [['inner result']]
+    assert threads[0] is not threading.current_thread()
+    assert threads[0] is not engine._thread
+
+
+def test_run_menu_exit(engine):
+    """An action which exits stops the session in the calling thread, and the engine keeps running."""
+    script('exit\n')
+    with pytest.raises(SystemExit):
+        lib.run_menu('Main', {'exit': {'action': lambda: sys.exit(3), 'keyword': 'exit'}})
+    script('')
+    with pytest.raises(EOFError):
+        lib.listen_and_transcribe()
+
+
+def test_barge_in(engine, monkeypatch, tmpdir):
+    """What is heard only cuts off the prompt with barge-in, the same as without the engine."""
+    interrupts = []
+    monkeypatch.setattr(lib.get_speaker(), 'heard', lambda interrupt=False: interrupts.append(interrupt))
+    path = tmpdir.join('settings.ini')
+    for barge_in in (False, True):
+        path.write('[voice]\nbarge_in: {}\n'.format(barge_in))
+        settings = settings_lib.Settings(str(path))
+        monkeypatch.setattr(lib, 'get_settings', lambda: settings)
+        script('hello\n')
+        assert lib.listen_and_transcribe(interpret=False) == 'hello'
+    assert interrupts == [False, True]
+
+
+def test_listen_while_speaking(engine, monkeypatch):
+    """The answer is heard and interpreted while the prompt is still being spoken."""
+    spoken, speaking = threading.Event(), threading.Event()
+
+    class SlowBackend(voice_lib.NullBackend):
+        def say(self, text):
+            speaking.set()
+            spoken.wait(5)
+
+    monkeypatch.setattr(lib, '_SPEAKER', lib.Lazy('speaker', lambda: voice_lib.Speaker(SlowBackend())))
+    script('hello\n')
+    lib.status_update('Please say something.')
+    speaking.wait(5)
+    assert lib.listen_and_transcribe(interpret=False) == 'hello'
+    assert not lib.get_speaker().wait(timeout=0)
+    spoken.set()
+    assert lib.get_speaker().wait(timeout=5)
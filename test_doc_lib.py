@@ -0,0 +1,67 @@
+# coding=utf-8
+"""Unit tests for doc_lib."""
+
+import os
+
+import pytest
+
+import doc_lib
+import validate_lib
+
+
+@pytest.fixture
+def document():
+    """A document with a couple of nodes."""
+    doc = doc_lib.Document('"""Docstring."""\n\n')
+    doc.add(doc_lib.Node(doc_lib.VARIABLE, 'count', 'count = 1  # type: int'))
+    doc.add(doc_lib.Node(doc_lib.FUNCTION, 'get_help', '\ndef get_help():\n    pass\n'))
+    return doc
+
+
+def test_render(document):
+    """Nodes are rendered in order after the header."""
+    assert document.render() == '"""Docstring."""\n\ncount = 1  # type: int\n\ndef get_help():\n    pass\n'
+
+
+def test_replace_and_remove(document):
+    """Nodes are replaced in place, and removed, by name."""
+    document.replace('count', doc_lib.Node(doc_lib.VARIABLE, 'total', 'total = 2  # type: int'))
+    assert document.names() == ['total', 'get_help']
+    assert document.names(doc_lib.FUNCTION) == ['get_help']
+    document.remove('get_help')
+    assert 'get_help' not in document
+    assert document.render() == '"""Docstring."""\n\ntotal = 2  # type: int'
+
+
+def test_replace_collision(document):
+    """A node can't be renamed onto the name of another node."""
+    with pytest.raises(ValueError):
+        document.replace('count', doc_lib.Node(doc_lib.VARIABLE, 'get_help', 'get_help = 2  # type: int'))
+    assert document.names() == ['count', 'get_help']
+    assert document.get('get_help').kind == doc_lib.FUNCTION
+
+
+def test_save(document, tmpdir):
+    """The document is written atomically, and only when it changed since the last save."""
+    path = str(tmpdir.join('module.py'))
+    assert document.save(path)
+    assert not document.save(path)
+    with open(path) as rfile:
+        assert rfile.read() == document.render()
+    document.remove('count')
+    assert document.save(path)
+    assert os.listdir(str(tmpdir)) == ['module.py']
+
+
+def test_validation(document):
+    """New and replaced nodes are checked; removed nodes no longer count."""
+    validator = validate_lib.Validator()
+    document.validator = validator
+    document.add(doc_lib.Node(doc_lib.VARIABLE, 'name', 'name = hello world  # type: str'))
+    assert list(document.errors()) == ['name']
+    document.replace('name', doc_lib.Node(doc_lib.VARIABLE, 'greeting', 'greeting = "hello world"  # type: str'))
+    assert document.errors() == {}
+    document.add(doc_lib.Node(doc_lib.VARIABLE, 'name', 'name = hello world  # type: str'))
+    document.remove('name')
+    assert document.errors() == {}
+    validator.stop()
@@ -1,67 +1,106 @@
 # coding=utf-8
-"""Unit tests for editor."""
+"""Unit tests for the edit/delete flows of python_editor."""
 
 import pytest
 
-import editor
-
-
-@pytest.mark.parametrize('keyword', ['line', 'function', 'variable'])
-@pytest.mark.parametrize('text', sorted(editor.SYNONYMS.keys()), ids=sorted(editor.SYNONYMS.keys()))
-def test_get_action_from_text_syn(text, keyword):
-    """Test getting actions based upon input text when they are keywords in editor.SYNONYMS."""
-    result = editor._get_action_from_text(text, keyword=keyword)
-    name = result.__name__ if result else None
-    if not name:
-        # Some of these will return None, because there is function for things like 'yes'.
-        pass
-    else:
-        assert hasattr(editor, name)
-
-
-@pytest.fixture(autouse=True)
-def mock_get_user_input(monkeypatch):
-    """Patch the listener to return text instead of requiring user verbal input."""
-    monkeypatch.setattr(editor.listener, 'get_user_input', lambda text, **kwargs: text)
-
-
-@pytest.fixture(autouse=True)
-def mock_status_update(monkeypatch):
-    """Patch _status_update so it just returns text instead of printing/saying it out loud."""
-    monkeypatch.setattr(editor, '_status_update', lambda text: text)
-
-
-@pytest.mark.parametrize('text, expected', [['ye', True], ['yes', True], ['ya', True], ['yeah', True], ['sure', True],
-                                            ['ok', True], ['okay', True], ['nope', False], ['no', False]])
-def test_get_yes_or_no(text, expected):
-    """Test getting a yes or no response."""
-    result = editor._get_yes_or_no(text)
-    assert result == expected
-
-
-@pytest.mark.parametrize('options, expected', [[['a', 'b', 'c'], {'1) a', '2) b', '3) c'}]])
-def test_get_help(options, expected):
-    """Test _get_help."""
-    result = editor._get_help({item: None for item in sorted(options)})
-    assert result == sorted(expected)
-
-
-@pytest.skip('Not yet implemented.')
-def test_run_menu():
-    """Test running a menu."""
-    pass
-
-
-def test_var_exists():
+import doc_lib
+import lib
+import python_editor
+import settings_lib
+
+
+@pytest.fixture
+def document(monkeypatch):
+    """A document with a function and a variable, and scripted answers to the editor's prompts."""
+    doc = doc_lib.Document()
+    doc.add(doc_lib.Node(doc_lib.FUNCTION, 'get_help', '\ndef get_help(options):\n    pass\n'))
+    doc.add(doc_lib.Node(doc_lib.VARIABLE, 'count', 'count = 1  # type: int'))
+    monkeypatch.setattr(python_editor, 'DOCUMENT', doc)
+    monkeypatch.setattr(python_editor, 'VARIABLES', doc.symbols.variables)
+    monkeypatch.setattr(lib, 'LAST_ALTERNATIVES', [])
+    monkeypatch.setattr(lib, 'status_update', lambda text, **kwargs: text)
+    return doc
+
+
+def script(monkeypatch, answers, yes_or_no=()):
+    """Answer the prompts (and the yes/no questions) in order."""
+    answers, yes_or_no = iter(answers), iter(yes_or_no)
+    monkeypatch.setattr(lib, 'get_user_input', lambda prompt, **kwargs: next(answers))
+    monkeypatch.setattr(lib, 'simple_prompt', lambda prompt, **kwargs: next(answers))
+    monkeypatch.setattr(lib, 'get_yes_or_no', lambda prompt='', **kwargs: next(yes_or_no))
+
+
+def test_choose_object(document, monkeypatch):
+    """Objects are chosen by their spoken names; anything but an exact match is confirmed first."""
+    script(monkeypatch, ['get help', 'get helps', 'nothing like it'] + ['nothing'] * 3, yes_or_no=[True])
+    assert python_editor.choose_object('Which?') == 'get_help'
+    assert python_editor.choose_object('Which?') == 'get_help'
+    assert python_editor.choose_object('Which?') is None
+
+
+def test_delete_menu(document, monkeypatch):
+    """A deleted function is removed along with its symbols."""
+    script(monkeypatch, ['get help'], yes_or_no=[True])
+    python_editor.delete_menu()
+    assert document.names() == ['count']
+    assert not python_editor._var_exists('get_help', 'options')
+
+
+def test_edit_menu(document, monkeypatch):
+    """A renamed variable keeps its place and value."""
+    script(monkeypatch, ['count', 'total'])
+    monkeypatch.setattr(lib, 'get_choice', lambda prompt, choices: 'Rename the variable')
+    python_editor.edit_menu()
+    assert document.names() == ['get_help', 'total']
+    assert document.get('total').source == 'total = 1  # type: int'
+    assert document.symbols.lookup('total')[0].symbol.kind == doc_lib.VARIABLE
+
+
+def test_edit_menu_collision(document, monkeypatch):
+    """Renaming onto an existing name only overwrites the other object once that's confirmed."""
+    script(monkeypatch, ['count', 'get help', 'count', 'get help'], yes_or_no=[False, True])
+    monkeypatch.setattr(lib, 'get_choice', lambda prompt, choices: 'Rename the variable')
+    python_editor.edit_menu()
+    assert document.names() == ['get_help', 'count']
+    python_editor.edit_menu()
+    assert document.names() == ['get_help']
+    assert document.get('get_help').source == 'get_help = 1  # type: int'
+    assert [match.symbol.kind for match in document.symbols.lookup('get_help')] == [doc_lib.VARIABLE]
+
+
+def test_save_and_exit(document, monkeypatch):
+    """The journal is only discarded once the work is saved, or the user explicitly doesn't want it."""
+    discarded = []
+    monkeypatch.setattr(python_editor, 'JOURNAL', type('Journal', (), {'discard': lambda self: discarded.append(1)})())
+    monkeypatch.setattr(python_editor, 'save', lambda: False)
+    script(monkeypatch, [], yes_or_no=[True, False])
+    python_editor.save_and_exit()
+    assert not discarded
+    with pytest.raises(SystemExit):
+        python_editor.save_and_exit()
+    assert discarded
+
+
+def test_change_validation(document, monkeypatch, tmpdir):
+    """Validation can be set to any of its modes, including adaptive."""
+    settings = settings_lib.Settings(str(tmpdir.join('settings.ini')))
+    monkeypatch.setattr(lib, 'get_settings', lambda: settings)
+    for choice, expected in [['Only confirm unclear answers', 'adaptive'], ['Never confirm answers', 'False'],
+                             ['Always confirm answers', 'True']]:
+        monkeypatch.setattr(lib, 'get_choice', lambda prompt, choices: choice)
+        python_editor.change_validation()
+        assert settings.get('logic', 'validation') == expected
+
+
+def test_var_exists(document):
     """Unit tests for _var_exists."""
+    assert python_editor._var_exists('get_help', 'options') is True
     # 1) function_name, not in VARIABLES.
-    editor.VARIABLES = {}
-    assert editor._var_exists('my_function', 'my_variable') is False
+    python_editor.VARIABLES = {}
+    assert python_editor._var_exists('my_function', 'my_variable') is False
     # 2) var_name not in VARIABLES[function_name].
-    editor.VARIABLES = {'my_function': {'other_variable': {}}}
-    assert editor._var_exists('my_function', 'my_variable') is False
+    python_editor.VARIABLES = {'my_function': {'other_variable': {}}}
+    assert python_editor._var_exists('my_function', 'my_variable') is False
     # 3) The function and variable do exist.
-    editor.VARIABLES = {'my_function': {'my_variable': {}}}
-    assert editor._var_exists('my_function', 'my_variable') is True
-
-# TODO: Need tests for: new_function, new_variable, new_line (edit/delete/display/save).
+    python_editor.VARIABLES = {'my_function': {'my_variable': {}}}
+    assert python_editor._var_exists('my_function', 'my_variable') is True
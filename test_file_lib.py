@@ -0,0 +1,34 @@
+# coding=utf-8
+"""Unit tests for file_lib."""
+
+import os
+
+import pytest
+
+import file_lib
+
+
+def test_atomic_write(tmpdir):
+    """A new file gets the usual permissions, and a replaced file keeps its own."""
+    path = str(tmpdir.join('module.py'))
+    with file_lib.atomic_write(path) as wfile:
+        wfile.write('count = 1\n')
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~file_lib.UMASK
+    os.chmod(path, 0o640)
+    with file_lib.atomic_write(path, durable=True) as wfile:
+        wfile.write('count = 2\n')
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    with open(path) as rfile:
+        assert rfile.read() == 'count = 2\n'
+
+
+def test_atomic_write_failure(tmpdir):
+    """A failed write leaves the file as it was, and no temporary file behind."""
+    path = tmpdir.join('module.py')
+    path.write('count = 1\n')
+    with pytest.raises(ValueError):
+        with file_lib.atomic_write(str(path)) as wfile:
+            wfile.write('count = ')
+            raise ValueError('Failed to render.')
+    assert path.read() == 'count = 1\n'
+    assert os.listdir(str(tmpdir)) == ['module.py']
@@ -0,0 +1,101 @@
+# coding=utf-8
+"""Unit tests for journal_lib."""
+
+import os
+
+import pytest
+
+import journal_lib
+
+
+@pytest.fixture
+def path(tmpdir):
+    """The path of a journal."""
+    return str(tmpdir.join('module.py.journal'))
+
+
+def record_session(journal):
+    """Record a few changes to a session."""
+    journal.append('add', kind='function', name='add', source='def add(): pass\n')
+    journal.append('add', kind='variable', name='count', source='count = 1\n')
+    journal.append('replace', name='add', kind='function', new_name='subtract', source='def subtract(): pass\n')
+    journal.append('add', kind='class', name='Thing', source='class Thing: pass\n')
+    journal.append('remove', name='count')
+    journal.append('setting', section='logic', option='validation', value='False')
+    journal.append('set', key='outfile', value='module.py')
+
+
+def test_replay(path):
+    """The state of a session is rebuilt from its journal, in order."""
+    journal = journal_lib.Journal(path)
+    assert journal.open() == journal_lib.new_state()
+    record_session(journal)
+    assert journal.flush(timeout=5)
+    state, sequence = journal_lib.replay(path)
+    assert sequence == 7
+    assert list(state['nodes']) == ['subtract', 'Thing']
+    assert state['nodes']['subtract']['source'] == 'def subtract(): pass\n'
+    assert state['settings'] == {'logic': {'validation': 'False'}}
+    assert state['values'] == {'outfile': 'module.py'}
+    journal.close()
+    # Resuming carries on from where the session left off.
+    journal = journal_lib.Journal(path)
+    assert list(journal.open()['nodes']) == ['subtract', 'Thing']
+    journal.append('remove', name='Thing')
+    journal.close()
+    assert list(journal_lib.replay(path)[0]['nodes']) == ['subtract']
+
+
+def test_replace_collision():
+    """A replacement onto the name of another node is skipped, rather than losing a node."""
+    state = journal_lib.new_state()
+    journal_lib.apply(state, {'op': 'add', 'kind': 'function', 'name': 'add', 'source': 'def add(): pass\n'})
+    journal_lib.apply(state, {'op': 'add', 'kind': 'variable', 'name': 'count', 'source': 'count = 1\n'})
+    journal_lib.apply(state, {'op': 'replace', 'name': 'count', 'kind': 'variable', 'new_name': 'add',
+                              'source': 'add = 1\n'})
+    assert list(state['nodes']) == ['add', 'count']
+    assert state['nodes']['add']['source'] == 'def add(): pass\n'
+
+
+def test_compact(path):
+    """The journal is folded into a snapshot once it grows, without changing the state."""
+    journal = journal_lib.Journal(path, compact_after=3)
+    journal.open()
+    record_session(journal)
+    journal.close()
+    with open(path) as rfile:
+        assert len(rfile.readlines()) < 3
+    state, sequence = journal_lib.replay(path)
+    assert sequence == 7
+    assert list(state['nodes']) == ['subtract', 'Thing']
+
+
+def test_crash_recovery(path):
+    """A partly written record is skipped, and records already in the snapshot aren't applied twice."""
+    journal = journal_lib.Journal(path, compact_after=2)
+    journal.open()
+    journal.append('add', kind='variable', name='count', source='count = 1\n')
+    journal.append('add', kind='variable', name='total', source='total = 2\n')
+    journal.flush(timeout=5)
+    journal.append('remove', name='count')
+    journal.close()
+    # A crash after the snapshot was written, but before the journal was emptied; then part of another record.
+    with open(path, 'w') as wfile:
+        wfile.write('{"op": "add", "kind": "variable", "name": "count", "source": "count = 1\\n", "seq": 1}\n')
+        wfile.write('{"op": "remove", "name": "count", "seq": 3}\n')
+        wfile.write('{"op": "add", "kind": "variable", "na')
+    journal = journal_lib.Journal(path)
+    assert list(journal.open()['nodes']) == ['total']
+    journal.close()
+    with open(path) as rfile:
+        assert rfile.read() == ''
+
+
+def test_discard(path):
+    """A finished session's journal is deleted."""
+    journal = journal_lib.Journal(path, compact_after=1)
+    journal.open()
+    record_session(journal)
+    journal.discard()
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + '.snapshot')
@@ -0,0 +1,192 @@
+# coding=utf-8
+"""Unit tests for lib."""
+
+import io
+import subprocess
+import sys
+import threading
+
+import nltk
+import pytest
+
+import audio_lib
+import cache_lib
+import lib
+import match_lib
+import nlp_lib
+import settings_lib
+import voice_lib
+
+
+def test_import_is_lazy():
+    """Importing lib doesn't parse settings, load corpora or start the voice engine."""
+    code = 'import lib; print(any(item.created for item in lib._LAZY_ATTRIBUTES.values()))'
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=lib.REL_DIR or '.')
+    assert output.strip() == b'False'
+
+
+def test_lazy():
+    """A lazy singleton is created once, on first use, and the startup stage is profiled."""
+    created = []
+    lazy = lib.Lazy('test stage', lambda: created.append(1) or len(created))
+    assert not created
+    assert lazy.get() == 1
+    assert lazy.get() == 1
+    assert 'test stage' in lib.STARTUP_PROFILE
+    assert 'test stage' in lib.report_startup_profile()
+
+
+@pytest.fixture
+def scripted(monkeypatch):
+    """Run prompts headless from a transcript; returns a function which sets the transcript and validation mode."""
+    monkeypatch.setattr(lib, '_SPEAKER', lib.Lazy('speaker', lambda: voice_lib.Speaker(voice_lib.NullBackend())))
+    monkeypatch.setattr(lib, '_YES_NO', lib.Lazy('yes/no vocabulary', lambda: {'yes': {'yes'}, 'no': {'no'}}))
+    monkeypatch.setattr(lib, 'LAST_CONFIDENCE', None)
+    settings = settings_lib.Settings(lib.SETTINGS_FILE)
+    monkeypatch.setattr(lib, '_SETTINGS', lib.Lazy('settings', lambda: settings))
+
+    def script(transcript, validation='True'):
+        settings.set('logic', 'validation', validation, persist=False)
+        settings.set('logic', 'max_retries', 2, persist=False)
+        lib.set_input_source(audio_lib.TranscriptSource(io.StringIO(transcript)))
+    yield script
+    lib.set_input_source(None)
+
+
+@pytest.mark.parametrize('validation, confidence, expected', [['True', 0.99, True], ['False', None, False],
+                                                               ['adaptive', None, True], ['adaptive', 0.5, True],
+                                                               ['adaptive', 0.9, False]])
+def test_needs_confirmation(scripted, validation, confidence, expected):
+    """Adaptive validation only asks when the confidence is unknown or below the threshold."""
+    scripted('', validation=validation)
+    assert lib.needs_confirmation(confidence) is expected
+
+
+def test_simple_prompt_retries(scripted):
+    """Rejected answers are asked for again a bounded number of times; then the last answer is taken as it is."""
+    scripted('first\nno\nsecond\nmaybe\nno\nthird\n')
+    assert lib.simple_prompt('Name?') == 'third'
+
+
+def test_simple_prompt_adaptive(scripted):
+    """A confidently recognized answer isn't confirmed."""
+    scripted('', validation='adaptive')
+    utterances = iter([audio_lib.Utterance('sure thing', 0.95)])
+    lib.set_input_source(audio_lib.TranscriptSource(io.StringIO()))
+    lib.INPUT_SOURCE.get = lambda timeout=None: next(utterances, None)
+    assert lib.simple_prompt('Name?') == 'sure thing'
+    assert lib.LAST_CONFIDENCE == 0.95
+
+
+def test_warm_up(monkeypatch):
+    """Every declared menu is compiled in the background, with the same key as the menu itself."""
+    compiled = []
+    monkeypatch.setattr(lib, 'WARM_UP', None)
+    monkeypatch.setattr(match_lib, 'MATCHERS', {})
+    monkeypatch.setattr(match_lib, 'ChoiceMatcher', lambda choices, language: compiled.append(choices) or choices)
+    monkeypatch.setattr(lib, '_YES_NO', lib.Lazy('yes/no vocabulary', lambda: {}))
+    monkeypatch.setattr(lib, '_PIPELINES', lib.Lazy('language pipelines', lambda: nlp_lib.PipelinePool(factory=str)))
+    # Every keyword is already cached, so WordNet isn't loaded.
+    monkeypatch.setattr(cache_lib, 'get_cache', lambda: cache_lib.WordCache(':memory:'))
+    monkeypatch.setattr(cache_lib.WordCache, 'get', lambda self, kind, language, word: [word])
+    thread = lib.warm_up(['lib.py'])
+    thread.join(timeout=10)
+    assert len(compiled) == 1
+    assert lib.warm_up() is thread
+    menu = {'Add a new line': {'action': None, 'keyword': 'new'}, 'Edit a line': {'action': None, 'keyword': 'edit'},
+            'Delete a line': {'action': None, 'keyword': 'delete'}}
+    assert match_lib.get_matcher(menu) is compiled[0]
+
+
+def test_warm_up_without_wordnet(monkeypatch):
+    """The menus are still compiled when WordNet isn't downloaded."""
+    compiled = []
+    monkeypatch.setattr(lib, 'WARM_UP', None)
+    monkeypatch.setattr(match_lib, 'MATCHERS', {})
+    monkeypatch.setattr(match_lib, 'ChoiceMatcher', lambda choices, language: compiled.append(choices) or choices)
+    monkeypatch.setattr(lib, '_YES_NO', lib.Lazy('yes/no vocabulary', lambda: {}))
+    pipeline = type('Pipeline', (), {'synonyms': lambda self, word: None})()
+    monkeypatch.setattr(lib, '_PIPELINES', lib.Lazy('language pipelines',
+                                                    lambda: nlp_lib.PipelinePool(factory=lambda name: pipeline)))
+    # Nothing is cached, so the warm up looks up synonyms.
+    monkeypatch.setattr(cache_lib, 'get_cache', lambda: cache_lib.WordCache(':memory:'))
+    monkeypatch.setattr(nltk.corpus, 'wordnet', type('Corpus', (), {'synsets': lambda self, word: 1 / 0})())
+    lib.warm_up(['lib.py']).join(timeout=10)
+    assert len(compiled) == 1
+
+
+def test_warm_up_resources(monkeypatch):
+    """Matchers aren't built while the warm up is loading the shared NLP resources."""
+    compiled, loaded = [], threading.Event()
+    monkeypatch.setattr(lib, 'WARM_UP', None)
+    monkeypatch.setattr(match_lib, 'MATCHERS', {})
+    monkeypatch.setattr(match_lib, 'ChoiceMatcher', lambda choices, language: compiled.append(choices) or choices)
+    monkeypatch.setattr(lib, '_YES_NO', lib.Lazy('yes/no vocabulary', lambda: loaded.wait(5) and {}))
+    monkeypatch.setattr(lib, '_PIPELINES', lib.Lazy('language pipelines', lambda: nlp_lib.PipelinePool(factory=str)))
+    monkeypatch.setattr(cache_lib, 'get_cache', lambda: cache_lib.WordCache(':memory:'))
+    warm_up = lib.warm_up(['match_lib.py'])
+    thread = threading.Thread(target=match_lib.get_matcher, args=({'Go': {'keyword': 'go'}}, 'en_US'))
+    thread.start()
+    thread.join(timeout=0.2)
+    assert thread.is_alive() and not compiled
+    loaded.set()
+    thread.join(timeout=5)
+    warm_up.join(timeout=5)
+    assert compiled == [{'Go': {'keyword': 'go'}}]
+
+
+def test_alternative_hypotheses(scripted):
+    """The recognizer's alternatives are tried before asking again."""
+    scripted('yeah sure | yes\nmaybe | perhaps\nno\n')
+    assert lib.get_yes_or_no() is True
+    assert lib.get_yes_or_no() is False
+
+
+def test_yes_or_no_retries(scripted):
+    """Anything but a 'yes' or 'no' is asked again a bounded number of times; then it's taken as a 'no'."""
+    scripted('maybe\nperhaps\nwhat\nyes\n')
+    assert lib.get_yes_or_no() is False
+    # Without a default, it keeps asking.
+    scripted('maybe\nperhaps\nwhat\nyes\n')
+    assert lib.get_yes_or_no(default=None) is True
+
+
+def test_choice_by_index(scripted, monkeypatch):
+    """A choice can be made by its number, but only one which is listed."""
+    scripted('0\n3\n2\n', validation='False')
+    monkeypatch.setattr(match_lib, 'get_matcher', lambda choices: type('Matcher', (), {'choices': sorted(choices)}))
+    assert lib.get_choice('Which?', {'Save': {'keyword': 'save'}, 'Exit': {'keyword': 'exit'}}) == 'Save'
+
+
+def test_choice_adaptive(scripted, monkeypatch):
+    """Without a confidence from the recognizer (e.g. typed input), adaptive validation confirms the choice."""
+    scripted('2\nno\n1\nyes\n', validation='adaptive')
+    monkeypatch.setattr(match_lib, 'get_matcher', lambda choices: type('Matcher', (), {'choices': sorted(choices)}))
+    assert lib.get_choice('Which?', {'Save': {'keyword': 'save'}, 'Exit': {'keyword': 'exit'}}) == 'Exit'
+
+
+def test_keywords_without_wordnet(monkeypatch):
+    """Without a source of synonyms, keywords are only their own stems, and nothing is cached until there is one."""
+    synonyms = {'remove': None}
+    pipeline = type('Pipeline', (), {'synonyms': lambda self, word: synonyms[word],
+                                     'normalizer': nlp_lib.Normalizer(nltk.stem.PorterStemmer(), [])})()
+    cache = cache_lib.WordCache(':memory:')
+    monkeypatch.setattr(cache_lib, 'get_cache', lambda: cache)
+    monkeypatch.setattr(lib, 'get_pipeline', lambda language=None: pipeline)
+    assert lib.generate_keywords(['remove'], language='en_US') == {'remove': ['remov']}
+    assert cache.get('synonyms', 'en_US', 'remove') is None
+    assert cache.get('stems', 'en_US', 'remove') is None
+    synonyms['remove'] = ['remove', 'delete']
+    assert lib.generate_keywords(['remove'], language='en_US') == {'remove': ['delet', 'remov']}
+    assert cache.get('stems', 'en_US', 'remove') == ['delet', 'remov']
+
+
+def test_switch_language(monkeypatch):
+    """Switching the language re-loads the yes/no vocabulary (in the new language) on its next use."""
+    monkeypatch.setattr(lib, '_YES_NO', lib.Lazy('yes/no vocabulary', lambda: {'yes': {lib.get_language()}}))
+    settings = lib._load_settings()
+    monkeypatch.setattr(lib, '_SETTINGS', lib.Lazy('settings', lambda: settings))
+    assert lib._YES_NO.get() == {'yes': {'en_US'}}
+    settings.set('voice', 'language', 'fr_FR', persist=False)
+    assert not lib._YES_NO.created
+    assert lib._YES_NO.get() == {'yes': {'fr_FR'}}
@@ -0,0 +1,65 @@
+# coding=utf-8
+"""Unit tests for log_lib."""
+
+import json
+import logging
+import os
+
+import pytest
+
+import log_lib
+
+
+@pytest.fixture
+def restore_logging():
+    """Restore the root logger's handlers and level after a test."""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    log_lib.stop()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_queued(tmpdir, restore_logging):
+    """Records are queued by the loggers, then written (and rotated) by the listener's thread."""
+    path = str(tmpdir.join('test.log'))
+    log_lib.start(path, level='INFO', max_bytes=1000, backup_count=2)
+    assert [type(handler) for handler in logging.getLogger().handlers] == [logging.handlers.QueueHandler]
+    for index in range(100):
+        log_lib.LOGGER.info('Record {}.'.format(index))
+    log_lib.LOGGER.debug('Below the level.')
+    log_lib.stop()
+    with open(path) as rfile:
+        lines = rfile.read().splitlines()
+    assert lines[-1].endswith('test_queued -> Record 99.')
+    assert os.path.exists(path + '.2') and not os.path.exists(path + '.3')
+    assert os.path.getsize(path) <= 1000
+    with open(path + '.2') as rfile:
+        assert 'Below the level.' not in rfile.read()
+
+
+def test_log_turn(tmpdir, monkeypatch, restore_logging):
+    """Each turn is logged as a JSON record, if enabled."""
+    path = str(tmpdir.join('test.log'))
+    log_lib.start(path, fmt='%(message)s')
+    monkeypatch.setattr(log_lib, 'TURNS', True)
+    log_lib.log_turn('Main Menu', 'Save', 12.345, confidence=0.9)
+    monkeypatch.setattr(log_lib, 'TURNS', False)
+    log_lib.log_turn('Main Menu', 'Exit', 1.0)
+    log_lib.stop()
+    with open(path) as rfile:
+        lines = rfile.read().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0].split('Turn: ')[1]) == {'choice': 'Save', 'confidence': 0.9, 'menu': 'Main Menu',
+                                                        'ms': 12.3}
+
+
+def test_stop_registered_once(tmpdir, monkeypatch, restore_logging):
+    """Starting (e.g. re-configuring) the logging again doesn't register another exit handler."""
+    registered = []
+    monkeypatch.setattr(log_lib.atexit, 'register', registered.append)
+    monkeypatch.setattr(log_lib, '_STOP_REGISTERED', False)
+    log_lib.start(str(tmpdir.join('test.log')))
+    log_lib.start(str(tmpdir.join('test.log')))
+    assert registered == [log_lib.stop]
@@ -0,0 +1,128 @@
+# coding=utf-8
+"""Unit tests for match_lib."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import lib
+import match_lib
+import nlp_lib
+
+SYNONYMS = {
+    'create': ['create', 'make'],
+    'new': ['new', 'fresh'],
+    'delete': ['delete', 'remove'],
+    'edit': ['edit', 'change'],
+}
+
+
+@pytest.fixture(autouse=True)
+def mock_nlp(monkeypatch):
+    """Patch the NLP helpers so matching doesn't require the NLTK corpora."""
+    monkeypatch.setattr(lib, 'generate_keywords',
+                        lambda words, language=None: {word: SYNONYMS.get(word, [word]) for word in words})
+    monkeypatch.setattr(lib, 'parse_text', parse_text)
+    monkeypatch.setattr(match_lib, 'MATCHERS', {})
+
+
+def parse_text(text, ngrams=1, language=None):
+    """Lower case words (less a few stop words) and their n-grams, in place of stems."""
+    words = [word for word in text.lower().split() if word not in ('a', 'an', 'the', 'it')]
+    return ' '.join(words + nlp_lib.get_ngrams(words, ngrams))
+
+
+@pytest.fixture
+def choices():
+    """Menu options similar to the main menu."""
+    return {
+        'Create a new object': {'action': None, 'keyword': ['create', 'new']},
+        'Edit an object': {'action': None, 'keyword': 'edit'},
+        'Delete an object': {'action': None, 'keyword': 'delete'},
+    }
+
+
+@pytest.mark.parametrize('text, expected', [['make something', 'Create a new object'],
+                                            ['please change it', 'Edit an object'],
+                                            ['remove', 'Delete an object'],
+                                            ['nothing relevant', '']])
+def test_match(choices, text, expected):
+    """Test matching a response against the compiled matcher."""
+    assert match_lib.get_matcher(choices).match(text) == expected
+
+
+def test_rank_overlapping_vocabulary():
+    """Words shared by several choices count for less than a distinctive one, and phrases count for more."""
+    matcher = match_lib.ChoiceMatcher({
+        'Change the output file': {'keyword': 'file'},
+        'Change the logging level': {'keyword': 'log'},
+        'Change the output level': {'keyword': 'verbosity'},
+    })
+    ranked = matcher.rank('change the log')
+    assert [match.choice for match in ranked] == ['Change the logging level', 'Change the output file',
+                                                  'Change the output level']
+    assert ranked[0].confidence > 0.5
+    assert match_lib.get_margin(ranked) > 0.25
+    # 'output level' is a phrase of only one choice, even though both of its words are shared.
+    assert matcher.rank('the output level')[0].choice == 'Change the output level'
+
+
+def test_rank_weak_match():
+    """A lone match isn't certain when only a weak word of the choice was said."""
+    matcher = match_lib.ChoiceMatcher({'Save the file': {'keyword': 'save'}, 'Exit': {'keyword': 'exit'}})
+    assert matcher.rank('save')[0].confidence == 1.0
+    assert matcher.rank('file')[0].confidence == 0.5
+
+
+def test_rank_ambiguous(choices):
+    """A response which matches several choices equally is ambiguous; one which matches nothing has no candidates."""
+    ranked = match_lib.get_matcher(choices).rank('make a change')
+    assert match_lib.get_margin(ranked) == 0
+    assert [match.choice for match in match_lib.get_candidates(ranked, 0.25)] == ['Create a new object',
+                                                                                   'Edit an object']
+    assert match_lib.get_matcher(choices).rank('nothing relevant') == []
+    assert match_lib.get_margin([]) == 0
+
+
+def test_get_matcher_cached(choices):
+    """The matcher is compiled once per menu definition and the caller's options are left untouched."""
+    matcher = match_lib.get_matcher(choices)
+    assert match_lib.get_matcher(dict(choices)) is matcher
+    assert all('stems' not in config for config in choices.values())
+
+
+def test_find_menus():
+    """Menus are found in the source without importing it."""
+    menus = match_lib.find_menus(lib.__file__)
+    assert menus['create_logic_lines'] == {'Add a new line': ['new'], 'Edit a line': ['edit'],
+                                           'Delete a line': ['delete']}
+
+
+def test_menu_modules():
+    """Every module which declares a menu is listed, so its menu is warmed up."""
+    paths = [path for path in os.listdir(lib.REL_DIR) if path.endswith('.py') and not path.startswith('test_')]
+    paths = [path for path in paths if match_lib.find_menus(os.path.join(lib.REL_DIR, path))]
+    assert set(paths) <= set(match_lib.MENU_MODULES)
+    assert 'edit_function' in match_lib.get_declared_menus()
+
+
+def test_rank_hypotheses(choices):
+    """The first of the recognizer's hypotheses which clearly matches a choice is taken."""
+    matcher = match_lib.get_matcher(choices)
+    index, ranked = match_lib.rank_hypotheses(matcher, ['crate something', 'make something', 'remove'], 0.25)
+    assert index == 1
+    assert ranked[0].choice == 'Create a new object'
+    # Without a clear match, the first hypothesis which matches anything is taken.
+    index, ranked = match_lib.rank_hypotheses(matcher, ['crate', 'make a change', 'change or remove'], 0.25)
+    assert index == 1
+    assert match_lib.get_margin(ranked) == 0
+    assert match_lib.rank_hypotheses(matcher, ['crate', 'nothing relevant'], 0.25) == (0, [])
+
+
+def test_import_first():
+    """match_lib can be imported before lib (e.g. by the benchmarks), despite importing each other."""
+    process = subprocess.run([sys.executable, '-c', 'import match_lib'], cwd=os.path.dirname(match_lib.__file__),
+                             stderr=subprocess.PIPE, universal_newlines=True, timeout=60)
+    assert process.returncode == 0, process.stderr
@@ -0,0 +1,90 @@
+# coding=utf-8
+"""Unit tests for nlp_lib."""
+
+import nltk
+import pytest
+
+import nlp_lib
+
+
+@pytest.fixture
+def normalizer():
+    """A normalizer with a few stop words, so the stop words corpus isn't required."""
+    return nlp_lib.Normalizer(nltk.stem.PorterStemmer(), ['a', 'the', 'please'])
+
+
+@pytest.mark.parametrize('text, expected', [['Create a new function', ['creat', 'new', 'function']],
+                                            ['Please delete the variables.', ['delet', 'variabl', '.']],
+                                            ['the', []]])
+def test_normalize(normalizer, text, expected):
+    """Test normalizing an utterance into stems."""
+    assert normalizer.normalize(text) == expected
+
+
+def test_normalize_ngrams(normalizer):
+    """N-grams of consecutive stems follow the stems."""
+    assert normalizer.normalize('create a new function', ngrams=3) == [
+        'creat', 'new', 'function', 'creat_new', 'new_function', 'creat_new_function']
+
+
+def test_normalize_all(normalizer):
+    """A batch of utterances is normalized in order, and stems are memoized across it."""
+    texts = (text for text in ['new function', 'new variable', 'new class'])
+    assert list(normalizer.normalize_all(texts)) == [['new', 'function'], ['new', 'variabl'], ['new', 'class']]
+    assert normalizer.stem.cache_info().hits == 2
+
+
+@pytest.mark.parametrize('language, expected', [['en_US', 'english'], ['fr-FR', 'french'], ['pt', 'portuguese'],
+                                                ['german', 'german']])
+def test_get_language_name(language, expected):
+    """Languages are named by their code, with or without a region."""
+    assert nlp_lib.get_language_name(language) == expected
+
+
+def test_get_language_name_unsupported():
+    """Languages without stop words and a stemmer aren't supported."""
+    with pytest.raises(ValueError):
+        nlp_lib.get_language_name('xx_XX')
+
+
+def test_pipeline(monkeypatch):
+    """English keeps the Porter stemmer; other languages use their Snowball stemmer and stop words."""
+    stop_words = {'english': ['the'], 'french': ['le', 'un'], 'german': []}
+    monkeypatch.setattr(nltk.corpus, 'stopwords', type('Corpus', (), {'words': lambda self, name: stop_words[name]})())
+    assert nlp_lib.Pipeline('english').normalizer.normalize('the functions') == ['function']
+    french = nlp_lib.Pipeline('french')
+    assert isinstance(french.stemmer, nltk.stem.SnowballStemmer)
+    assert french.normalizer.normalize('un nouvelles fonctions') == ['nouvel', 'fonction']
+    assert nlp_lib.Pipeline('german').synonyms('neu') == []
+
+
+def test_pipeline_missing_wordnet(monkeypatch):
+    """Without the WordNet data, synonyms can't be looked up (rather than being an error), until it is downloaded."""
+    def synsets(word, lang='eng'):
+        if missing:
+            raise LookupError('Resource omw-1.4 not found.')
+        return []
+
+    missing = True
+    monkeypatch.setattr(nltk.corpus, 'stopwords', type('Corpus', (), {'words': lambda self, name: []})())
+    monkeypatch.setattr(nltk.corpus, 'wordnet', type('Corpus', (), {'synsets': staticmethod(synsets)})())
+    french = nlp_lib.Pipeline('french')
+    assert french.synonyms('nouveau') is None
+    assert french.wordnet_language == 'fra'
+    # Once the data is downloaded, there are synonyms again.
+    missing = False
+    assert french.synonyms('nouveau') == []
+
+
+def test_pipeline_pool():
+    """Pipelines are loaded once, on first use; the least recently used one is dropped once the pool is full."""
+    loaded = []
+    pool = nlp_lib.PipelinePool(size=2, factory=lambda language: loaded.append(language) or language.upper())
+    assert pool.get('english') == 'ENGLISH'
+    assert pool.get('french') == 'FRENCH'
+    # Switching back doesn't re-load it, and makes it the most recently used.
+    assert pool.get('english') == 'ENGLISH'
+    pool.get('spanish')
+    assert 'french' not in pool
+    assert len(pool) == 2
+    assert loaded == ['english', 'french', 'spanish']
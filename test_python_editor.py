@@ -0,0 +1,89 @@
+# coding=utf-8
+"""Unit tests for python_editor."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import python_editor
+
+SESSION = '''
+# Create a function.
+create
+yes
+function
+yes
+add_numbers
+yes
+adds two numbers
+yes
+no
+new
+yes
+return 1
+no
+no
+yes
+# Save and exit.
+save
+yes
+yes
+exit
+yes
+yes
+'''
+
+
+def run_script(tmpdir, script, engine='sync', *args):
+    """Run a scripted session; returns the process and the path of the generated module."""
+    outfile = str(tmpdir.join('generated.py'))
+    process = subprocess.run([sys.executable, python_editor.__file__, '--script', '-', '--outfile', outfile,
+                              '--engine', engine] + list(args),
+                             input=script, universal_newlines=True, stdout=subprocess.PIPE, timeout=60,
+                             cwd=str(tmpdir))
+    return process, outfile
+
+
+@pytest.mark.parametrize('engine', ['sync', 'async'])
+def test_scripted_session(tmpdir, engine):
+    """A whole session runs headless from a transcript, with either dialogue engine."""
+    process, outfile = run_script(tmpdir, SESSION, engine=engine)
+    assert process.returncode == 0
+    with open(outfile) as rfile:
+        assert 'def add_numbers():\n    """adds two numbers"""\n    return 1' in rfile.read()
+
+
+def test_scripted_session_ends_early(tmpdir):
+    """A transcript which ends before the session is finished is an error."""
+    process, outfile = run_script(tmpdir, 'create\nyes\n')
+    assert process.returncode == 1
+    assert not os.path.exists(outfile)
+
+
+def test_scripted_session_resumed(tmpdir):
+    """An unfinished session is resumed from its journal; a finished session isn't."""
+    created, finished = SESSION.split('# Save and exit.')
+    process, outfile = run_script(tmpdir, created)
+    assert process.returncode == 1
+    assert os.path.exists(outfile + '.journal')
+    process, outfile = run_script(tmpdir, finished)
+    assert process.returncode == 0
+    assert 'Resumed 1 objects from the last session.' in process.stdout
+    with open(outfile) as rfile:
+        assert 'def add_numbers():' in rfile.read()
+    assert not os.path.exists(outfile + '.journal')
+    # A new session doesn't resume anything.
+    process, outfile = run_script(tmpdir, created, 'sync', '--new-session')
+    assert 'Resumed' not in process.stdout
+
+
+def test_scripted_session_invalid(tmpdir):
+    """Code with a syntax error is reported, and isn't saved."""
+    session = SESSION.replace('return 1', 'return (').rsplit('yes', 1)[0] + 'no\n'
+    process, outfile = run_script(tmpdir, session, 'sync', '--new-session')
+    assert process.returncode == 0
+    assert '"add_numbers" has a syntax error' in process.stdout
+    assert 'Not saving, as the generated code has errors.' in process.stdout
+    assert not os.path.exists(outfile)
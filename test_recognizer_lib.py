@@ -0,0 +1,65 @@
+# coding=utf-8
+"""Unit tests for recognizer_lib."""
+
+import json
+
+import pytest
+import speech_recognition
+
+import recognizer_lib
+from test_audio_lib import write_wav
+
+
+@pytest.fixture
+def recordings(tmpdir):
+    """A directory of recorded prompts, each with a transcript next to it."""
+    for index, text in enumerate(['create a new function', 'save', '', 'safe\nsave']):
+        write_wav(tmpdir.join('{}.wav'.format(index)), seconds=0.1 * (index + 1))
+        if text:
+            tmpdir.join('{}.txt'.format(index)).write(text)
+    return str(tmpdir)
+
+
+def test_get_recognizer():
+    """Recognizers are created by name."""
+    assert isinstance(recognizer_lib.get_recognizer('sphinx'), recognizer_lib.SphinxRecognizer)
+    with pytest.raises(ValueError):
+        recognizer_lib.get_recognizer('unknown')
+
+
+def test_stub_recognizer(recordings):
+    """The stub returns the known transcript of each recording, and fails to understand anything else."""
+    recognizer = recognizer_lib.StubRecognizer.from_directory(recordings)
+    assert recognizer.recognize(recognizer_lib._read_wav(recordings + '/1.wav')) == 'save'
+    # Each line of a transcript is a hypothesis, best first.
+    hypotheses = recognizer.recognize(recognizer_lib._read_wav(recordings + '/3.wav'))
+    assert hypotheses == 'safe'
+    assert hypotheses.alternatives == ['save']
+    with pytest.raises(speech_recognition.UnknownValueError):
+        recognizer.recognize(recognizer_lib._read_wav(recordings + '/2.wav'))
+
+
+def test_transcribe_directory(recordings, tmpdir):
+    """A directory of recordings is transcribed, interpreted and matched into JSONL records."""
+    output = str(tmpdir.join('results.jsonl'))
+    menu = {'Save': {'keyword': 'save'}, 'Create a new function': {'keyword': 'create'}}
+    assert recognizer_lib.transcribe_directory(recordings, output, backend='stub', menu=menu, processes=2) == 4
+    with open(output) as rfile:
+        records = [json.loads(line) for line in rfile]
+    assert [record['text'] for record in records] == ['create a new function', 'save', '', 'safe']
+    assert [record['choice'] for record in records] == ['Create a new function', 'Save', None, 'Save']
+    assert records[0]['interpreted'] == 'creat new function'
+    assert records[2]['error'] == 'not understood'
+
+
+def test_transcribe_directory_unreadable(recordings, tmpdir):
+    """A file which can't be read gets an error record, rather than failing the whole directory."""
+    with open(recordings + '/4.wav', 'wb') as wfile:
+        wfile.write(b'RIFF')
+    output = str(tmpdir.join('results.jsonl'))
+    assert recognizer_lib.transcribe_directory(recordings, output, backend='stub', processes=2) == 5
+    with open(output) as rfile:
+        records = [json.loads(line) for line in rfile]
+    assert [record['text'] for record in records] == ['create a new function', 'save', '', 'safe', '']
+    assert records[4]['file'] == '4.wav'
+    assert records[4]['error'].startswith('unreadable')
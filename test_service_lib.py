@@ -0,0 +1,68 @@
+# coding=utf-8
+"""Unit tests for service_lib."""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import service_lib
+from test_python_editor import SESSION
+
+
+@pytest.fixture
+def pool(tmpdir):
+    """A pool of sessions which save to a temporary directory."""
+    sessions = service_lib.SessionPool(str(tmpdir), max_sessions=2, timeout=30)
+    yield sessions
+    sessions.close()
+
+
+def test_sessions(pool, tmpdir):
+    """Concurrent sessions are isolated from each other; each one saves its own code."""
+    first, second = pool.create('first'), pool.create('second', new_session=True)
+    assert 'Welcome to Parsel Tongue' in first['output'] and first['session'] != second['session']
+    with pytest.raises(service_lib.ServiceError) as error:
+        pool.create('third')
+    assert error.value.status == 503
+    utterances = [line for line in SESSION.splitlines() if line and not line.startswith('#')]
+    for text in utterances:
+        reply = pool.say(first['session'], {'text': text})
+    assert reply['finished'] and 'Good bye.' in reply['output']
+    assert 'def add_numbers():' in reply['code']
+    assert first['session'] not in pool.sessions
+    with open(str(tmpdir.join('first.py'))) as rfile:
+        assert 'def add_numbers():' in rfile.read()
+    reply = pool.say(second['session'], {'text': 'save'})
+    assert 'add_numbers' not in reply['code'] and not reply['finished']
+    assert pool.close(second['session'])['finished']
+
+
+def test_http(pool):
+    """Sessions are served as JSON over HTTP."""
+    server = service_lib.create_server(('127.0.0.1', 0), pool)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/sessions'.format(server.server_address[1])
+
+    def request(method, path='', body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url + path, data=data, method=method)) as response:
+                return response.status, json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as error:
+            return error.code, json.loads(error.read().decode('utf-8'))
+
+    try:
+        status, reply = request('POST', body={'name': 'module', 'new_session': True})
+        assert status == 201 and 'Main Menu' in reply['output']
+        path = '/' + reply['session']
+        assert request('POST', path, {'text': 'create'})[1]['output'].startswith('You selected')
+        assert request('POST', path, {'nothing': 'said'})[0] == 400
+        assert request('GET')[1] == {'sessions': [reply['session']]}
+        assert request('DELETE', path)[1]['finished']
+        assert request('GET', path)[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
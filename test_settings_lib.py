@@ -0,0 +1,98 @@
+# coding=utf-8
+"""Unit tests for settings_lib."""
+
+import os
+import time
+
+import pytest
+
+import settings_lib
+
+SETTINGS = '''# Global settings:
+
+[logic]
+# Confirm what was heard.
+validation: True
+max_retries: 3
+
+[voice]
+wake_word:
+'''
+
+
+@pytest.fixture
+def path(tmpdir):
+    """A settings file."""
+    path = tmpdir.join('settings.ini')
+    path.write(SETTINGS)
+    return str(path)
+
+
+def test_typed(path):
+    """Settings are converted to their types, with fallbacks for missing (or blank) settings."""
+    settings = settings_lib.Settings(path)
+    assert settings.get_bool('logic', 'validation') is True
+    assert settings.get_int('logic', 'max_retries') == 3
+    assert settings.get_float('logic', 'match_margin', 0.25) == 0.25
+    assert settings.get('voice', 'wake_word') == ''
+    assert settings.get_int('voice', 'wake_word', 7) == 7
+    assert settings['logic']['validation'] == 'True'
+    with pytest.raises(KeyError):
+        settings['logic']['missing']
+
+
+def test_set(path):
+    """Changes are written back in place, keeping the comments, and the subscribers are notified."""
+    settings = settings_lib.Settings(path)
+    changes = []
+    settings.subscribe(lambda *change: changes.append(change), section='logic')
+    settings.set('logic', 'validation', False)
+    settings.set('logic', 'match_margin', 0.5)
+    settings.set('cache', 'path', 'words.sqlite')
+    assert settings.get_bool('logic', 'validation') is False
+    assert changes == [('logic', 'validation', 'False'), ('logic', 'match_margin', '0.5')]
+    with open(path) as rfile:
+        assert rfile.read() == SETTINGS.replace('validation: True\nmax_retries: 3\n',
+                                                'validation: False\nmax_retries: 3\nmatch_margin: 0.5\n') + \
+            '\n[cache]\npath: words.sqlite\n'
+    assert settings_lib.Settings(path).get_float('logic', 'match_margin') == 0.5
+
+
+def test_set_not_persisted(path):
+    """A change which isn't persisted lasts for the process, even when the file is reloaded, but isn't saved."""
+    settings = settings_lib.Settings(path)
+    settings['voice']['backend'] = 'null'
+    assert settings.get('voice', 'backend') == 'null'
+    assert settings_lib.Settings(path).get('voice', 'backend') is None
+
+
+def test_local(path):
+    """Local settings never write back to the file, and aren't watched."""
+    settings = settings_lib.Settings(path)
+    settings.local = True
+    settings.set('logic', 'validation', False)
+    assert settings.get_bool('logic', 'validation') is False
+    assert settings_lib.Settings(path).get_bool('logic', 'validation') is True
+    settings.watch()
+    assert settings._watcher is None
+
+
+def test_watch(path):
+    """Changes made to the file by something else are picked up, and the subscribers are notified."""
+    settings = settings_lib.Settings(path)
+    changes = []
+    settings.subscribe(lambda *change: changes.append(change))
+    assert settings.get_int('logic', 'max_retries') == 3
+    settings.watch(interval=0.01)
+    try:
+        with open(path, 'w') as wfile:
+            wfile.write(SETTINGS.replace('max_retries: 3', 'max_retries: 5'))
+        # Make sure the modification time changes, however coarse the file system's timestamps are.
+        os.utime(path, ns=(settings.mtime + 10 ** 9, settings.mtime + 10 ** 9))
+        deadline = time.time() + 5
+        while not changes and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        settings.stop()
+    assert changes == [('logic', 'max_retries', '5')]
+    assert settings.get_int('logic', 'max_retries') == 5
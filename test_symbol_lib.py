@@ -0,0 +1,100 @@
+# coding=utf-8
+"""Unit tests for symbol_lib."""
+
+import time
+
+import pytest
+
+import doc_lib
+import symbol_lib
+
+THING = '''
+class Thing(object):
+    """A thing."""
+    kind = 'thing'
+
+    def __init__(self, name):
+        self.name = name
+
+    def describe(self, verbose=False):
+        text = self.name
+        return text
+'''
+
+
+@pytest.fixture
+def table():
+    """A symbol table of a function, a class and a variable."""
+    symbols = symbol_lib.SymbolTable()
+    symbols.add_node(doc_lib.Node(doc_lib.FUNCTION, 'get_help', '\ndef get_help(options, *args):\n    total = 1\n'))
+    symbols.add_node(doc_lib.Node(doc_lib.CLASS, 'Thing', THING))
+    symbols.add_node(doc_lib.Node(doc_lib.VARIABLE, 'write_file', 'write_file = None  # type: None'))
+    return symbols
+
+
+def test_scopes(table):
+    """Parameters, methods, attributes and local variables are in the scope of their function/class."""
+    assert table.get('get_help') == symbol_lib.Symbol('get_help', doc_lib.FUNCTION, '', ('options', 'args'))
+    assert sorted(table.variables['get_help']) == ['args', 'options', 'total']
+    assert table.get('describe', 'Thing').parameters == ('verbose',)
+    assert sorted(table.variables['Thing']) == ['kind', 'name']
+    assert sorted(table.variables['Thing.describe']) == ['text', 'verbose']
+
+
+@pytest.mark.parametrize('spoken, expected', [['get help', 'get_help'], ['GetHelp', 'get_help'],
+                                              ['right file', 'write_file'], ['get helps', 'get_help'],
+                                              ['thing', 'Thing']])
+def test_lookup(table, spoken, expected):
+    """Spoken names are found exactly, by how they sound, and despite small differences."""
+    assert table.lookup(spoken)[0].symbol.name == expected
+
+
+def test_lookup_scope(table):
+    """Only the symbols which are visible from a scope are found, optionally only those of some kinds."""
+    assert not table.lookup('verbose')
+    assert table.lookup('verbose', scope='Thing.describe')[0].symbol.kind == symbol_lib.PARAMETER
+    assert table.lookup('name', scope='Thing.describe', kinds=[symbol_lib.ATTRIBUTE])[0].symbol.scope == 'Thing'
+    assert not table.lookup('get help', kinds=[doc_lib.VARIABLE])
+
+
+def test_remove_node(table):
+    """Removing a node removes its symbols, including those of its own scopes, from the index."""
+    table.remove_node('Thing')
+    assert 'Thing' not in table
+    assert not table.lookup('describe', scope='Thing.describe')
+    assert 'Thing.describe' not in table.scopes
+    assert len(table) == 5
+    assert table._trie.root.keys() == {'g', 'o', 'a', 't', 'w'}
+
+
+def test_lookup_speed():
+    """A spoken name is found among thousands of symbols in well under a millisecond."""
+    symbols = symbol_lib.SymbolTable()
+    for index in range(5000):
+        symbols.add(symbol_lib.Symbol('{}_{}_number_{}'.format(['get', 'set', 'add'][index % 3], 'value', index),
+                                      doc_lib.FUNCTION, '', ()))
+    symbols.add(symbol_lib.Symbol('get_help', doc_lib.FUNCTION, '', ()))
+    start = time.perf_counter()
+    for _ in range(100):
+        matches = symbols.lookup('get helps')
+    assert (time.perf_counter() - start) / 100 < 0.001
+    assert matches[0].symbol.name == 'get_help'
+
+
+def test_rename():
+    """Only the definition is renamed."""
+    node = symbol_lib.rename(doc_lib.Node(doc_lib.FUNCTION, 'count', '\ndef count(n):\n    return count(n - 1)\n'),
+                             'total')
+    assert (node.name, node.source) == ('total', '\ndef total(n):\n    return count(n - 1)\n')
+    assert symbol_lib.rename(doc_lib.Node(doc_lib.VARIABLE, 'a', 'a = ('), 'b').source == 'b = ('
+
+
+def test_rename_spoken():
+    """Spoken names are made into identifiers, and used literally."""
+    node = doc_lib.Node(doc_lib.VARIABLE, 'count', 'count = 1')
+    assert symbol_lib.rename(node, 'Total Count').source == 'total_count = 1'
+    assert symbol_lib.rename(node, r'back\\1 slash').source == 'back_1_slash = 1'
+    assert symbol_lib.rename(doc_lib.Node(doc_lib.CLASS, 'Thing', 'class Thing: pass'), 'big thing').name == 'BigThing'
+    for name in ['class', '2 things', '']:
+        with pytest.raises(ValueError):
+            symbol_lib.rename(node, name)
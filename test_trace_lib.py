@@ -0,0 +1,61 @@
+# coding=utf-8
+"""Unit tests for trace_lib."""
+
+import json
+
+import pytest
+
+import trace_lib
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    """Enable tracing for a test."""
+    monkeypatch.setattr(trace_lib, 'TRACER', trace_lib.Tracer(summary=False))
+    return trace_lib.TRACER
+
+
+def test_histogram():
+    """Percentiles are estimated from the buckets."""
+    histogram = trace_lib.Histogram()
+    for milliseconds in [1.5] * 90 + [300] * 10:
+        histogram.record(milliseconds)
+    assert histogram.percentile(50) == 2
+    assert histogram.percentile(99) == 300
+    assert histogram.to_dict()['count'] == 100
+
+
+def test_span(tracer, tmpdir):
+    """Spans are aggregated per stage, and per stage of each turn's tags."""
+    with trace_lib.turn(menu='Main Menu'):
+        with trace_lib.span('match') as span:
+            span.tag(choice='Save')
+    with trace_lib.span('match'):
+        pass
+    path = str(tmpdir.join('trace.json'))
+    tracer.export(path)
+    with open(path) as rfile:
+        results = json.load(rfile)
+    assert results['match']['']['count'] == 2
+    assert results['match']['choice=Save, menu=Main Menu']['count'] == 1
+    assert 'match [choice=Save, menu=Main Menu]' in tracer.report()
+
+
+def test_span_disabled(monkeypatch):
+    """Spans are no-ops when tracing is disabled."""
+    monkeypatch.setattr(trace_lib, 'TRACER', None)
+    with trace_lib.turn(menu='Main Menu'):
+        with trace_lib.span('match') as span:
+            span.tag(choice='Save')
+
+
+def test_configure_registers_once(monkeypatch):
+    """Re-configuring tracing doesn't register another exit handler; the current tracer is finished at exit."""
+    registered = []
+    monkeypatch.setattr(trace_lib.atexit, 'register', registered.append)
+    monkeypatch.setattr(trace_lib, '_FINISH_REGISTERED', False)
+    monkeypatch.setattr(trace_lib, 'TRACER', None)
+    trace_lib.configure(summary=False)
+    tracer = trace_lib.configure(summary=False)
+    assert registered == [trace_lib._finish]
+    assert trace_lib.TRACER is tracer
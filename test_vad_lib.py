@@ -0,0 +1,76 @@
+# coding=utf-8
+"""Unit tests for vad_lib."""
+
+import wave
+
+import numpy
+import pytest
+import speech_recognition
+
+import vad_lib
+
+
+def write_wav(path, samples, rate):
+    """Write 16-bit mono samples to a WAV file."""
+    with wave.open(str(path), 'wb') as wfile:
+        wfile.setnchannels(1)
+        wfile.setsampwidth(2)
+        wfile.setframerate(rate)
+        wfile.writeframes(numpy.asarray(samples, dtype='<i2').tobytes())
+    return str(path)
+
+
+def read_wav(path) -> speech_recognition.AudioData:
+    """Read a WAV file the same way audio_lib.WavFileSource does."""
+    with speech_recognition.AudioFile(path) as source:
+        return speech_recognition.Recognizer().record(source)
+
+
+def noise(seconds, rate, level=20):
+    """Quiet background noise."""
+    return numpy.random.RandomState(0).normal(0, level, int(seconds * rate))
+
+
+def tone(seconds, rate, level=5000):
+    """A loud tone, standing in for speech."""
+    return level * numpy.sin(2 * numpy.pi * 220 * numpy.arange(int(seconds * rate)) / rate)
+
+
+@pytest.mark.parametrize('rate, target_rate', [[44100, 16000], [16000, 16000], [8000, None]])
+def test_trim(tmpdir, rate, target_rate):
+    """The silence either side of the speech is trimmed (less the padding) and the audio is downsampled."""
+    samples = numpy.concatenate([noise(1.0, rate), tone(0.5, rate), noise(1.0, rate)])
+    audio = read_wav(write_wav(tmpdir.join('speech.wav'), samples, rate))
+    trimmed = vad_lib.VoiceFrontEnd(target_rate=target_rate).process(audio)
+    assert trimmed.sample_rate == min(rate, target_rate or rate)
+    assert trimmed.sample_width == 2
+    duration = len(trimmed.get_raw_data()) / 2 / trimmed.sample_rate
+    assert 0.85 <= duration <= 0.95
+
+
+def test_false_start(tmpdir):
+    """A phrase without any speech (only noise, or a click) is dropped."""
+    rate = 16000
+    front_end = vad_lib.VoiceFrontEnd()
+    assert front_end.process(read_wav(write_wav(tmpdir.join('noise.wav'), noise(1.0, rate), rate))) is None
+    click = numpy.concatenate([noise(0.5, rate), tone(0.02, rate), noise(0.5, rate)])
+    assert front_end.process(read_wav(write_wav(tmpdir.join('click.wav'), click, rate))) is None
+    # The background noise is remembered for the next phrase.
+    assert len(front_end.noise) > 0
+
+
+def test_segments():
+    """Runs of True values are found."""
+    assert vad_lib.segments([True, True, False, True, False, False, True]) == [(0, 2), (3, 4), (6, 7)]
+    assert vad_lib.segments([False, False]) == []
+
+
+def test_ring_buffer():
+    """The oldest values are overwritten once the buffer is full."""
+    ring = vad_lib.RingBuffer(4)
+    ring.extend([1, 2, 3])
+    assert sorted(ring.get()) == [1, 2, 3]
+    ring.extend([4, 5, 6])
+    assert sorted(ring.get()) == [3, 4, 5, 6]
+    ring.extend(range(10))
+    assert sorted(ring.get()) == [6, 7, 8, 9]
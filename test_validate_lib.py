@@ -0,0 +1,40 @@
+# coding=utf-8
+"""Unit tests for validate_lib."""
+
+import pytest
+
+import lib
+import validate_lib
+
+
+@pytest.fixture
+def validator(monkeypatch):
+    """A validator whose reports are collected instead of spoken."""
+    reported = []
+    monkeypatch.setattr(lib, 'status_update', reported.append)
+    validator = validate_lib.Validator()
+    validator.reported = reported
+    yield validator
+    validator.stop()
+
+
+def test_check():
+    """Objects are compiled, so errors which only the compiler finds are caught too."""
+    assert validate_lib.check('x = 1') is None
+    assert validate_lib.check('def f():\n    return 1\n') is None
+    assert validate_lib.check('class A(object:\n    pass\n').endswith('on line 1')
+    assert validate_lib.check('x = 1\nreturn 1') == "'return' outside function on line 2"
+
+
+def test_validator(validator):
+    """Objects are checked in the background, and only once per version of their source."""
+    first = validator.submit('count', 'count = 1')
+    assert validator.submit('total', 'count = 1') is first
+    validator.submit('broken', 'return 1')
+    assert validator.errors() == {'broken': "'return' outside function on line 1"}
+    # Each error is only reported once.
+    assert validator.report() == {'broken': "'return' outside function on line 1"}
+    assert validator.report() == {}
+    assert len(validator.reported) == 1
+    validator.forget('broken')
+    assert validator.errors() == {}
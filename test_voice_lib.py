@@ -0,0 +1,103 @@
+# coding=utf-8
+"""Unit tests for voice_lib."""
+
+import threading
+
+import voice_lib
+
+
+class BlockingBackend(voice_lib.RecordingBackend):
+    """Records what is said, but blocks on each utterance until it is released."""
+
+    def __init__(self):
+        super(BlockingBackend, self).__init__()
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def say(self, text):
+        self.started.set()
+        self.release.wait(5)
+        super(BlockingBackend, self).say(text)
+
+
+def test_say():
+    """Messages are spoken in order, without blocking the caller."""
+    backend = voice_lib.RecordingBackend()
+    speaker = voice_lib.Speaker(backend)
+    speaker.say('Okay.')
+    assert speaker.wait(5)
+    assert backend.spoken == ['Okay.']
+
+
+def test_merge():
+    """Messages queued while speaking are merged into one utterance."""
+    backend = BlockingBackend()
+    speaker = voice_lib.Speaker(backend)
+    speaker.say('Main Menu.')
+    backend.started.wait(5)
+    speaker.say('1) Create.')
+    speaker.say('2) Exit.')
+    backend.release.set()
+    assert speaker.wait(5)
+    assert backend.spoken == ['Main Menu.', '1) Create.\n2) Exit.']
+
+
+def test_prompt_drops_stale_status():
+    """Status messages from an earlier turn are dropped when the next prompt is queued."""
+    backend = BlockingBackend()
+    speaker = voice_lib.Speaker(backend)
+    speaker.say('Please choose one of the following:', priority=voice_lib.PRIORITY_PROMPT)
+    backend.started.wait(5)
+    speaker.say('1) Create.')
+    speaker.heard()
+    speaker.say('You selected "Create".')
+    speaker.say('Is that correct?', priority=voice_lib.PRIORITY_PROMPT)
+    backend.release.set()
+    assert speaker.wait(5)
+    assert backend.spoken == ['Please choose one of the following:', 'You selected "Create".\nIs that correct?']
+
+
+class FakeEngine(object):
+    """A pyttsx3 engine which says each word of the text in turn, calling back as it starts each one."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.callbacks = {}
+        self.spoken = []
+        self.stopped_by = []
+
+    def connect(self, topic, callback):
+        self.callbacks.setdefault(topic, []).append(callback)
+
+    def say(self, text):
+        self.text = text
+
+    def runAndWait(self):
+        self.stopped_by = []
+        for callback in self.callbacks['started-utterance']:
+            callback(None)
+        for index, word in enumerate(self.text.split()):
+            for callback in self.callbacks['started-word']:
+                callback(None, index, len(word))
+            if self.stopped_by:
+                break
+            self.spoken.append(word)
+            if word == 'and':
+                # The user talks over the rest, from another thread.
+                thread = threading.Thread(target=self.backend.stop)
+                thread.start()
+                thread.join()
+
+    def stop(self):
+        self.stopped_by.append(threading.current_thread())
+
+
+def test_pyttsx3_stop():
+    """The engine is only ever stopped by the thread which is speaking, when the user talks over it."""
+    backend = voice_lib.Pyttsx3Backend(lambda: engine)
+    engine = FakeEngine(backend)
+    backend.say('one and two')
+    assert engine.spoken == ['one', 'and']
+    assert engine.stopped_by == [threading.current_thread()]
+    backend.say('three four')
+    assert engine.spoken == ['one', 'and', 'three', 'four']
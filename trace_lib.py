@@ -0,0 +1,186 @@
+# coding=utf-8
+"""Latency tracing for each stage of a dialogue turn: listen -> recognize -> interpret -> match -> speak -> action."""
+
+import atexit
+import bisect
+import contextlib
+import json
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger('parsel_tongue')
+# Upper bounds (in milliseconds) of the histogram buckets; the last bucket is everything slower.
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 60000]
+TRACER = None
+# Whether the current tracer is finished at exit; see configure.
+_FINISH_REGISTERED = False
+
+
+class Histogram(object):
+    """A latency histogram, with fixed buckets."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def percentile(self, percent: float) -> float:
+        """Estimate a percentile in milliseconds, as the upper bound of the bucket it falls in."""
+        target = self.count * percent / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(BUCKETS[index], self.maximum) if index < len(BUCKETS) else self.maximum
+        return 0.0
+
+    def record(self, milliseconds: float):
+        """Record a duration."""
+        self.counts[bisect.bisect_left(BUCKETS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.minimum = milliseconds if self.minimum is None else min(self.minimum, milliseconds)
+        self.maximum = milliseconds if self.maximum is None else max(self.maximum, milliseconds)
+
+    def to_dict(self) -> dict:
+        """Summarize the histogram."""
+        return {'count': self.count, 'mean': self.total / self.count if self.count else 0.0, 'min': self.minimum,
+                'max': self.maximum, 'p50': self.percentile(50), 'p90': self.percentile(90),
+                'p99': self.percentile(99), 'buckets': dict(zip([str(bound) for bound in BUCKETS] + ['inf'],
+                                                               self.counts))}
+
+
+class Tracer(object):
+    """Aggregates spans into a histogram per stage, and per stage of each menu and choice.
+
+    The tags of the current turn (i.e. the menu) are shared by every thread, so stages which run in the background, such
+    as recognition and speech, are tagged with the turn they belong to.
+    """
+
+    def __init__(self, path=None, summary=True):
+        """
+        Arguments:
+            path (str): Optional JSON file to export the histograms to at exit.
+            summary (bool): Whether to print a summary at exit.
+        """
+        self.path = path
+        self.summary = summary
+        self.histograms = {}
+        self.tags = {}
+        self._lock = threading.Lock()
+
+    def export(self, path=None) -> dict:
+        """Export the histograms, keyed by stage then tags, e.g. {'match': {'': {...}, 'menu=Main Menu': {...}}}."""
+        with self._lock:
+            results = {}
+            for (stage, tags), histogram in sorted(self.histograms.items()):
+                results.setdefault(stage, {})[', '.join('{}={}'.format(*tag) for tag in tags)] = histogram.to_dict()
+        if path:
+            with open(path, 'w') as wfile:
+                json.dump(results, wfile, indent=2)
+        return results
+
+    def record(self, stage: str, milliseconds: float, tags: dict):
+        """Record the duration of a stage, overall and for its tags."""
+        keys = [(stage, ())]
+        if tags:
+            keys.append((stage, tuple(sorted(tags.items()))))
+        with self._lock:
+            for key in keys:
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram()
+                self.histograms[key].record(milliseconds)
+
+    def report(self) -> str:
+        """Summarize the latency of each stage."""
+        lines = ['{:<64} {:>6} {:>9} {:>9} {:>9} {:>9}'.format('Stage', 'count', 'mean ms', 'p50 ms', 'p90 ms',
+                                                                'max ms')]
+        for stage, by_tags in self.export().items():
+            for tags, summary in by_tags.items():
+                lines.append('{:<64} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}'.format(
+                    '{} [{}]'.format(stage, tags) if tags else stage, summary['count'], summary['mean'],
+                    summary['p50'], summary['p90'], summary['max']))
+        return '\n'.join(lines)
+
+    def finish(self):
+        """Export and/or print the summary; run at exit."""
+        if self.path:
+            self.export(self.path)
+            LOGGER.info('Exported latency traces to "{}".'.format(self.path))
+        if self.summary:
+            print(self.report())
+
+
+class _Span(object):
+    """A timed stage; tags can be added while it is running, e.g. the choice once it has been matched."""
+
+    def __init__(self, stage: str, tags: dict):
+        self.stage = stage
+        self.tags = tags
+        self.start = time.perf_counter()
+
+    def tag(self, **tags):
+        """Add tags to the span."""
+        self.tags.update(tags)
+
+
+class _NullSpan(object):
+    """Stands in for a span when tracing is disabled."""
+
+    def tag(self, **tags):
+        """Ignore the tags."""
+        pass
+
+
+def configure(enabled=True, path=None, summary=True) -> Tracer:
+    """Enable (or disable) tracing.
+
+    Arguments:
+        enabled (bool): Whether to trace.
+        path (str): Optional JSON file to export the histograms to at exit.
+        summary (bool): Whether to print a summary at exit.
+    """
+    global TRACER, _FINISH_REGISTERED
+    TRACER = Tracer(path=path, summary=summary) if enabled else None
+    if TRACER and not _FINISH_REGISTERED:
+        atexit.register(_finish)
+        _FINISH_REGISTERED = True
+    return TRACER
+
+
+def _finish():
+    """Finish the current tracer, if any; run at exit."""
+    if TRACER:
+        TRACER.finish()
+
+
+@contextlib.contextmanager
+def span(stage: str, **tags):
+    """Time a stage of the dialogue; tagged with the current turn's tags (e.g. the menu) and any given tags."""
+    tracer = TRACER
+    if not tracer:
+        yield _NullSpan()
+        return
+    timed = _Span(stage, dict(tracer.tags, **tags))
+    try:
+        yield timed
+    finally:
+        tracer.record(stage, (time.perf_counter() - timed.start) * 1000, timed.tags)
+
+
+@contextlib.contextmanager
+def turn(**tags):
+    """Tag every span of the enclosed turn(s), e.g. turn(menu='Main Menu'); the previous tags are restored after."""
+    tracer = TRACER
+    if not tracer:
+        yield
+        return
+    previous = tracer.tags
+    tracer.tags = dict(previous, **tags)
+    try:
+        yield
+    finally:
+        tracer.tags = previous
@@ -0,0 +1,130 @@
+# coding=utf-8
+"""An audio front end between capture and recognition; voice activity detection, silence trimming and downsampling."""
+
+import logging
+
+import numpy
+import speech_recognition
+
+LOGGER = logging.getLogger('parsel_tongue')
+
+
+class RingBuffer(object):
+    """A fixed size buffer of the most recent values; the oldest values are overwritten once it is full."""
+
+    def __init__(self, capacity: int):
+        self.values = numpy.zeros(capacity)
+        self.count = 0
+        self._index = 0
+
+    def __len__(self):
+        return min(self.count, len(self.values))
+
+    def extend(self, values):
+        """Add values, overwriting the oldest ones."""
+        values = numpy.asarray(values, dtype=float)[-len(self.values):]
+        end = self._index + len(values)
+        if end <= len(self.values):
+            self.values[self._index:end] = values
+        else:
+            split = len(self.values) - self._index
+            self.values[self._index:] = values[:split]
+            self.values[:end - len(self.values)] = values[split:]
+        self._index = end % len(self.values)
+        self.count += len(values)
+
+    def get(self):
+        """Get the values currently in the buffer (not in order)."""
+        return self.values[:len(self)]
+
+
+class VoiceFrontEnd(object):
+    """Trims each captured phrase down to the speech in it, before it is sent to the recognizer.
+
+    The phrase is split into short frames, and frames which are louder than the background noise are speech.  Runs of
+    speech which are too short to be a word (e.g. a click) are ignored, and a phrase with no speech at all (a false
+    start) is dropped.  The level of the background noise is tracked across phrases, in a ring buffer of the energy of
+    recent non-speech frames.  The trimmed audio is optionally downsampled, as recognition doesn't need more than 16kHz.
+    """
+
+    def __init__(self, frame_ms=20, padding_ms=200, min_speech_ms=60, threshold_ratio=3.0, min_energy=50.0,
+                 noise_frames=500, target_rate=16000):
+        """
+        Arguments:
+            frame_ms (int): The length of a frame in milliseconds.
+            padding_ms (int): Silence to keep either side of the speech, so the start and end of words aren't cut off.
+            min_speech_ms (int): The shortest run of speech which is kept.
+            threshold_ratio (float): How much louder than the background noise speech is.
+            min_energy (float): The quietest RMS energy (of 16-bit samples) which can be speech.
+            noise_frames (int): How many non-speech frames to estimate the level of the background noise from.
+            target_rate (int): Downsample to this sample rate; None to keep the original rate.
+        """
+        self.frame_ms = frame_ms
+        self.padding_ms = padding_ms
+        self.min_speech_ms = min_speech_ms
+        self.threshold_ratio = threshold_ratio
+        self.min_energy = min_energy
+        self.target_rate = target_rate
+        self.noise = RingBuffer(noise_frames)
+
+    def detect(self, energies) -> numpy.ndarray:
+        """Get which frames are speech, from the RMS energy of each frame."""
+        noise = self.noise.get()
+        # Until there is some history, the quietest frames of the phrase itself are the background noise.
+        floor = numpy.median(noise) if len(noise) else numpy.percentile(energies, 10)
+        speech = energies > max(self.min_energy, floor * self.threshold_ratio)
+        min_frames = max(1, self.min_speech_ms // self.frame_ms)
+        for start, end in segments(speech):
+            if end - start < min_frames:
+                speech[start:end] = False
+        return speech
+
+    def process(self, audio: speech_recognition.AudioData):
+        """Trim a captured phrase down to its speech.
+
+        Returns:
+            audio (speech_recognition.AudioData): The trimmed (and downsampled) 16-bit audio; None without any speech.
+        """
+        samples = numpy.frombuffer(audio.get_raw_data(convert_width=2), dtype='<i2')
+        frame_length = max(1, audio.sample_rate * self.frame_ms // 1000)
+        energies = frame_energies(samples, frame_length)
+        if not len(energies):
+            return None
+        speech = self.detect(energies)
+        self.noise.extend(energies[~speech])
+        if not speech.any():
+            duration = len(samples) / audio.sample_rate
+            LOGGER.debug('Dropping {:.2f} seconds of audio without any speech.'.format(duration))
+            return None
+        frames = numpy.flatnonzero(speech)
+        padding = self.padding_ms // self.frame_ms
+        start = max(0, frames[0] - padding) * frame_length
+        end = min(len(energies), frames[-1] + 1 + padding) * frame_length
+        trimmed, rate = samples[start:end], audio.sample_rate
+        if self.target_rate and rate > self.target_rate:
+            trimmed, rate = resample(trimmed, rate, self.target_rate), self.target_rate
+        LOGGER.debug('Trimmed {:.2f} seconds of audio to {:.2f} seconds.'.format(len(samples) / audio.sample_rate,
+                                                                                 len(trimmed) / rate))
+        return speech_recognition.AudioData(trimmed.astype('<i2').tobytes(), rate, 2)
+
+
+def frame_energies(samples, frame_length: int) -> numpy.ndarray:
+    """Get the RMS energy of each whole frame of samples."""
+    count = len(samples) // frame_length
+    frames = numpy.asarray(samples[:count * frame_length], dtype=float).reshape(count, frame_length)
+    return numpy.sqrt(numpy.mean(frames ** 2, axis=1))
+
+
+def resample(samples, rate: int, target_rate: int) -> numpy.ndarray:
+    """Downsample audio; it is low-pass filtered (a moving average) first, so it doesn't alias."""
+    width = int(numpy.ceil(rate / target_rate))
+    if width > 1:
+        samples = numpy.convolve(samples, numpy.ones(width) / width, mode='same')
+    times = numpy.arange(int(len(samples) * target_rate / rate)) * rate / target_rate
+    return numpy.round(numpy.interp(times, numpy.arange(len(samples)), samples)).astype('<i2')
+
+
+def segments(mask) -> list:
+    """Get the (start, end) indexes of each run of True values."""
+    edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], numpy.asarray(mask, dtype=int), [0]))))
+    return list(zip(edges[::2], edges[1::2]))
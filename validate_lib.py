@@ -0,0 +1,144 @@
+# coding=utf-8
+"""Background syntax validation of the generated code; each object is compiled on a worker thread once it is created."""
+
+import collections
+import concurrent.futures
+import hashlib
+import logging
+import threading
+
+import lib
+
+LOGGER = logging.getLogger('parsel_tongue')
+VALIDATOR = None
+VALIDATOR_LOCK = threading.Lock()
+
+
+class Validator(object):
+    """Compiles each generated object (a function, class or variable) on a worker thread, as soon as it is created.
+
+    Results are cached by the hash of the source, so an object is only compiled again once it has changed (e.g. an
+    unchanged object which was removed and added back isn't).  Errors are reported at the start of the next turn rather
+    than interrupting the current one; see report.
+    """
+
+    def __init__(self, workers=1, cache_size=4096):
+        """
+        Arguments:
+            workers (int): The number of worker threads.
+            cache_size (int): The number of results to cache.
+        """
+        self.cache_size = cache_size
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='validate')
+        self._checks = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._objects = {}
+        self._reported = set()
+
+    def errors(self, timeout=None) -> dict:
+        """Get the syntax errors of the current objects, waiting for any which are still being checked.
+
+        Returns:
+            errors (dict): The error message of each invalid object, keyed by name.
+        """
+        with self._lock:
+            objects = dict(self._objects)
+        errors = {}
+        for name, (digest, future) in objects.items():
+            error = future.result(timeout)
+            if error:
+                errors[name] = error
+        return errors
+
+    def forget(self, name: str):
+        """Stop tracking an object, e.g. once it has been removed."""
+        with self._lock:
+            self._objects.pop(name, None)
+
+    def report(self) -> dict:
+        """Report the errors which have been found since the last report (without waiting for any checks).
+
+        Returns:
+            errors (dict): The error message of each newly found invalid object, keyed by name.
+        """
+        errors = {}
+        with self._lock:
+            for name, (digest, future) in self._objects.items():
+                if future.done() and future.result() and (name, digest) not in self._reported:
+                    self._reported.add((name, digest))
+                    errors[name] = future.result()
+        for name, error in errors.items():
+            lib.status_update('"{}" has a syntax error: {}.'.format(name, error))
+        return errors
+
+    def stop(self):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=True)
+
+    def submit(self, name: str, source: str) -> concurrent.futures.Future:
+        """Check an object in the background; an object which hasn't changed since it was last checked isn't checked
+        again.
+
+        Arguments:
+            name (str): The name of the object, e.g. 'get_help'.
+            source (str): Its Python source.
+
+        Returns:
+            future (concurrent.futures.Future): Resolves to the error message; None if the source is valid.
+        """
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        with self._lock:
+            future = self._checks.get(digest)
+            if future is None:
+                future = self._executor.submit(check, source, name)
+                self._checks[digest] = future
+                while len(self._checks) > self.cache_size:
+                    self._checks.popitem(last=False)
+            else:
+                self._checks.move_to_end(digest)
+            self._objects[name] = (digest, future)
+        return future
+
+
+def check(source: str, name='<generated>'):
+    """Compile an object's source.
+
+    Returns:
+        error (str): A description of the syntax error; None if the source is valid.
+    """
+    try:
+        compile(source, name, 'exec', dont_inherit=True)
+    except SyntaxError as error:
+        LOGGER.debug('"{}" is invalid: {}.'.format(name, error))
+        return '{} on line {}'.format(error.msg, error.lineno)
+    except ValueError as error:  # e.g. a null byte.
+        return str(error)
+    return None
+
+
+def get_validator() -> Validator:
+    """Get the running validator; None unless it has been started."""
+    return VALIDATOR
+
+
+def report() -> dict:
+    """Report any newly found errors; called at the start of each turn."""
+    return VALIDATOR.report() if VALIDATOR else {}
+
+
+def start(workers=1) -> Validator:
+    """Start validating the generated code in the background."""
+    global VALIDATOR
+    with VALIDATOR_LOCK:
+        if VALIDATOR is None:
+            VALIDATOR = Validator(workers)
+    return VALIDATOR
+
+
+def stop():
+    """Stop validating the generated code."""
+    global VALIDATOR
+    with VALIDATOR_LOCK:
+        validator, VALIDATOR = VALIDATOR, None
+    if validator:
+        validator.stop()
@@ -1,7 +1,12 @@
 # coding=utf-8
 """Helpers for working with variables."""
 
+import ast
+
+import codegen_lib
+import doc_lib
 import lib
+import symbol_lib
 
 TEMPLATE = '''{name} = {value}  # type: {type}'''
 
@@ -13,7 +18,8 @@ def create_variables(as_input_vars=False) -> dict:
         print('\nVariables:')
         for new_var in variables.values():
             print(new_var)
-        variable, name = create_variable()
+        node = create_variable()
+        variable, name = node.source, node.name
         if as_input_vars:
             # 'name = value  # type: type' -> 'name=value'
             name, value = variable.split(' = ')
@@ -34,29 +40,47 @@ def create_variable():
         'decimal': {'action': lambda v: float(v), 'keyword': 'decimal', 'type': float},
         'text': {'action': lambda v: '"{}"'.format(str(v)), 'keyword': 'text', 'type': str},
         'list': {'action': lambda v: v.split(), 'keyword': ['list', 'array', 'multiple'], 'type': list},
-        'dictionary': {'action': lambda v: dict(eval(v)), 'keyword': ['dict', 'dictionary'], 'type': dict},
+        'dictionary': {'action': lambda v: dict(ast.literal_eval(v)), 'keyword': ['dict', 'dictionary'], 'type': dict},
     }
     var_type = lib.get_choice('What type should this variable be?', choices=choices)
     try:
         value = choices[var_type]['action'](value)
-    except (TypeError, ValueError):
+    except (SyntaxError, TypeError, ValueError):
         lib.status_update('Failed to cast "{}" to a "{}".'.format(value, var_type))
     # Now set this to a structure like: 'name = value  # type: type'
-    variable = TEMPLATE.format(name=name, value=value, type=choices[var_type]['type'])
-    return variable, name
+    var_type = choices[var_type]['type']
+    spec = codegen_lib.VariableSpec(name, value=value, type=getattr(var_type, '__name__', var_type))
+    return doc_lib.Node.from_spec(spec)
+
+
+def delete_variable(document: doc_lib.Document, name: str) -> doc_lib.Node:
+    """Delete an existing variable, once the user has confirmed it.
 
+    Returns:
+        node (doc_lib.Node): The deleted variable; None if it wasn't deleted.
+    """
+    if not lib.get_yes_or_no('Are you sure you want to delete the variable "{}"?'.format(name)):
+        return None
+    lib.status_update('Deleted "{}".'.format(name))
+    return document.remove(name)
 
-@lib.not_implemented
-def delete_variable(funct):
-    """Delete an existing variable."""
-    options = {}
-    # TODO: How do we return things properly from the menu?  Yield?
-    lib.run_menu('Delete a Function', options, display=funct)
 
+def edit_variable(document: doc_lib.Document, name: str) -> doc_lib.Node:
+    """Edit an existing variable; it is either renamed, or re-created (i.e. given a new value) in place.
 
-@lib.not_implemented
-def edit_variable(funct):
-    """Edit an existing variable."""
-    options = {}
-    # TODO: How do we return things properly from the menu?  Yield?
-    lib.run_menu('Edit a Function', options, display=funct)
+    Returns:
+        node (doc_lib.Node): The edited variable; None if it wasn't changed.
+    """
+    choices = {
+        'Rename the variable': {'keyword': ['rename', 'name']},
+        'Change the value': {'keyword': ['value', 'change', 'recreate', 'replace']},
+    }
+    if lib.get_choice('Do you want to rename "{}" or change its value?'.format(name), choices) == 'Rename the variable':
+        try:
+            node = symbol_lib.rename(document.get(name), lib.simple_prompt('What do you want to rename it to?'))
+        except ValueError as error:
+            lib.status_update(str(error))
+            return None
+    else:
+        node = create_variable()
+    return node if lib.replace_node(document, name, node) else None
@@ -0,0 +1,151 @@
+# coding=utf-8
+"""Helpers for speaking to the user; speech runs on a worker thread so it never blocks the menus."""
+
+import logging
+import threading
+
+import trace_lib
+
+LOGGER = logging.getLogger('parsel_tongue')
+# Status messages (e.g. 'Okay.' or help text) can be dropped once they're stale; prompts are always spoken.
+PRIORITY_STATUS = 0
+PRIORITY_PROMPT = 1
+
+
+class NullBackend(object):
+    """Doesn't say anything; for headless use."""
+
+    def say(self, text: str):
+        """Say nothing."""
+        pass
+
+    def stop(self):
+        """Nothing to stop."""
+        pass
+
+
+class RecordingBackend(NullBackend):
+    """Records everything which would have been said; for tests."""
+
+    def __init__(self):
+        self.spoken = []
+
+    def say(self, text: str):
+        """Record the text."""
+        self.spoken.append(text)
+
+
+class Pyttsx3Backend(object):
+    """Speaks through a pyttsx3 engine.  The engine is created by the worker thread, which is the only one to use it;
+    even stopping is only requested by other threads, and is done by the worker the next time the engine calls back.
+    """
+
+    def __init__(self, engine_factory):
+        """
+        Arguments:
+            engine_factory (callable): Creates the pyttsx3 engine, i.e. lib.get_voice_engine.
+        """
+        self.engine_factory = engine_factory
+        self._engine = None
+        self._stopping = threading.Event()
+
+    def say(self, text: str):
+        """Speak the text and wait until it is finished (or stopped)."""
+        engine = self.engine_factory()
+        if engine is not self._engine:
+            # The engine calls back (on this thread) as it starts each utterance and word.
+            engine.connect('started-utterance', self._on_progress)
+            engine.connect('started-word', self._on_progress)
+            self._engine = engine
+        self._stopping.clear()
+        engine.say(text)
+        engine.runAndWait()
+
+    def stop(self):
+        """Stop speaking; called from any thread, e.g. the listener's when the user talks over a status message."""
+        self._stopping.set()
+
+    def _on_progress(self, name, *args):
+        """Stop the engine from the worker thread, if stopping was requested."""
+        if self._stopping.is_set():
+            self._stopping.clear()
+            self._engine.stop()
+
+
+class Speaker(object):
+    """Speaks queued messages on a worker thread.
+
+    Everything which is queued while the previous utterance is being spoken is merged into a single utterance.  Each
+    time the user is heard a new turn begins: status messages from earlier turns are stale and are dropped when the next
+    prompt is queued, or straight away if the user talks over them (barge-in).
+    """
+
+    def __init__(self, backend):
+        """
+        Arguments:
+            backend (Pyttsx3Backend|NullBackend|RecordingBackend): What actually speaks.
+        """
+        self.backend = backend
+        self.turn = 0
+        self._messages = []
+        self._speaking = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='speaker', daemon=True)
+        self._thread.start()
+
+    def heard(self, interrupt=False):
+        """The user said something, which starts a new turn.
+
+        Arguments:
+            interrupt (bool): Stop speaking stale status messages now, rather than when the next prompt is queued.
+        """
+        with self._condition:
+            self.turn += 1
+            if interrupt:
+                self._drop_stale()
+                if self._speaking and self._speaking[0] == PRIORITY_STATUS:
+                    LOGGER.debug('The user talked over: "{}".'.format(self._speaking[2]))
+                    self.backend.stop()
+
+    def say(self, text: str, priority=PRIORITY_STATUS):
+        """Queue text to be spoken.
+
+        Arguments:
+            text (str): Text to vocalize.
+            priority (int): PRIORITY_STATUS or PRIORITY_PROMPT.
+        """
+        with self._condition:
+            if priority >= PRIORITY_PROMPT:
+                self._drop_stale()
+            self._messages.append((priority, self.turn, text))
+            self._condition.notify_all()
+
+    def wait(self, timeout=None) -> bool:
+        """Wait until everything queued has been spoken; returns False on a timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._messages and not self._speaking, timeout=timeout)
+
+    def _drop_stale(self):
+        """Drop queued status messages from earlier turns."""
+        stale = [message for message in self._messages if message[0] == PRIORITY_STATUS and message[1] < self.turn]
+        if stale:
+            LOGGER.debug('Dropping {} stale status message(s).'.format(len(stale)))
+            self._messages = [message for message in self._messages if message not in stale]
+
+    def _run(self):
+        """Speak queued messages until the process exits."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._messages)
+                messages, self._messages = self._messages, []
+                # The merged utterance is as important as its most important message.
+                self._speaking = (max(message[0] for message in messages), messages[-1][1],
+                                  '\n'.join(message[2] for message in messages))
+            try:
+                with trace_lib.span('speak'):
+                    self.backend.say(self._speaking[2])
+            except Exception as error:  # The speaker must outlive a broken voice engine.
+                LOGGER.error('Failed to speak "{}": {}.'.format(self._speaking[2], error))
+            with self._condition:
+                self._speaking = None
+                self._condition.notify_all()